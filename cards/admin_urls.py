@@ -1,6 +1,13 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# JSON-автокомплиты: async-версии под ASGI (см. cards/urls.py)
+if settings.CARDS_ASYNC_VIEWS:
+    logos_search, showcases_suggest = views.logos_search_async, views.showcases_suggest_async
+else:
+    logos_search, showcases_suggest = views.logos_search, views.showcases_suggest
+
 urlpatterns = [
     path("", views.showcases_admin, name="showcases_admin"),
     path("add/", views.showcase_add, name="showcase_add"),
@@ -11,14 +18,24 @@ urlpatterns = [
     path("<int:pk>/edit/", views.showcase_edit, name="showcase_edit"),
     path("<int:pk>/delete/", views.showcase_delete, name="showcase_delete"),
     path("<int:pk>/duplicate/", views.showcase_duplicate, name="showcase_duplicate"),
+    path("clone/", views.showcases_clone, name="showcases_clone"),
+    path("data/export/", views.data_export, name="data_export"),
+    path("data/import/", views.data_import, name="data_import"),
 
     path("<int:pk>/cards/", views.cards_admin, name="cards_admin"),
     path("<int:pk>/cards/add/", views.card_add, name="card_add"),
     path("<int:pk>/cards/<int:cid>/edit/", views.card_edit, name="card_edit"),
     path("<int:pk>/cards/<int:cid>/delete/", views.card_delete, name="card_delete"),
     path("<int:pk>/cards/<int:cid>/toggle/", views.card_toggle, name="card_toggle"),
+    path("<int:pk>/cards/bulk/", views.cards_bulk, name="cards_bulk"),
+    path("<int:pk>/cards/reorder/", views.cards_reorder, name="cards_reorder"),
+
+    path("logos/search/", logos_search, name="logos_search"),
+    path("logos/index.json", views.logos_index, name="logos_index"),
 
-    path("logos/search/", views.logos_search, name="logos_search"),
+    path("showcases/suggest/", showcases_suggest, name="showcases_suggest"),
 
-    path("showcases/suggest/", views.showcases_suggest, name="showcases_suggest"),
+    path("profiles/", views.profiles_admin, name="profiles_admin"),
+    path("profiles/<slug:name>/", views.profile_detail, name="profile_detail"),
+    path("profiles/<slug:name>.<str:kind>", views.profile_download, name="profile_download"),
 ]
@@ -1,5 +1,28 @@
-
 from django.apps import AppConfig
 class CardsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "cards"
+
+    def ready(self):
+        from django.core import checks
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+        from django.utils.autoreload import file_changed
+
+        from . import signals  # noqa: F401  (подключаем сброс кэша по save/delete)
+        from .utils import host, search, themes
+        from .utils.timing import install_db_wrapper
+
+        # время SQL для Server-Timing и /metrics (cards/middleware.py)
+        connection_created.connect(install_db_wrapper, dispatch_uid="cards-db-timing")
+
+        # темы витрин: обход каталога и компиляция шаблонов — один раз при старте
+        themes.registry.reload()
+        checks.register(themes.check_themes, checks.Tags.templates)
+        file_changed.connect(themes.reload_on_change, dispatch_uid="cards-themes-reload")
+
+        # FTS-индекс поиска в SQLite: триггеры теряются при пересоздании таблицы миграцией
+        post_migrate.connect(search.ensure_sqlite_triggers, sender=self, dispatch_uid="cards-search-triggers")
+
+        # punycode/unicode для разрешённых доменов — до первого запроса
+        host.warm()
@@ -1,8 +1,11 @@
 import re
-from pathlib import Path
 from django import forms
 from django.conf import settings
 from .models import Showcase, Card, Logo
+from .utils import host as hostnames
+from .utils import logoindex
+from .utils.media import file_sha256
+from .utils.themes import registry as theme_registry
 from django.urls import reverse
 
 
@@ -24,11 +27,6 @@ def build_domain_choices():
     raw = getattr(settings, "DOMAINS_ALLOWED", []) or []
     uniq = {}  # ascii_host -> label
 
-    try:
-        import idna
-    except ImportError:
-        idna = None
-
     for d in raw:
         d = (d or "").strip().lower()
         if not d:
@@ -40,19 +38,8 @@ def build_domain_choices():
         if re.match(r"^\d{1,3}(\.\d{1,3}){3}$", d):
             continue
 
-        # нормализуем к punycode для value
-        ascii_host = d
-        label = d
-        if idna:
-            try:
-                ascii_host = idna.encode(d, uts46=True).decode("ascii")
-            except Exception:
-                ascii_host = d
-            try:
-                label = idna.decode(ascii_host)
-            except Exception:
-                label = d
-
+        # punycode для value, unicode для label (cards/utils/host.py, с кэшем)
+        ascii_host, label = hostnames.normalize(d)
         uniq[ascii_host] = label
 
     # вернём отсортированные пары (punycode, unicode)
@@ -68,16 +55,29 @@ def normalize_domain_lines(value: str) -> str:
     return "\n".join(sorted(set(lines)))
 
 
+def normalize_slug(slug, name=""):
+    """slug витрины: латиница/цифры/дефис; пустой — из названия."""
+    slug = (slug or "").strip().lower()
+    if not slug:
+        base = (name or "").strip().lower()
+        base = re.sub(r"[^a-z0-9-_]+", "-", base).strip("-_")
+        return base
+    return re.sub(r"[^a-z0-9-_]+", "-", slug).strip("-_")
+
+
+def normalize_btn_url(u):
+    """Ссылка партнёра: без схемы — дописываем https://."""
+    u = (u or "").strip()
+    if not u:
+        return u
+    if not re.match(r"^https?://", u, re.I):
+        u = "https://" + u.lstrip("/")
+    return u
+
+
 def get_theme_choices():
-    base = Path(settings.BASE_DIR) / "cards" / "templates" / "themes" 
-    label_map = {"green": "Зелёный", "blue": "Синий"}
-    items = []
-    if base.exists():
-        for d in sorted(base.iterdir()):
-            if d.is_dir() and not d.name.startswith("_"):
-                label = label_map.get(d.name, d.name)
-                items.append((d.name, label))
-    return [("", "Авто (общий шаблон)")] + items
+    """Темы из реестра (cards/utils/themes.py), собранного при старте."""
+    return theme_registry.choices()
 
 
 # ---------------- forms ----------------
@@ -144,12 +144,7 @@ class ShowcaseForm(forms.ModelForm):
         self.fields["domains"].label = "Домены"
 
     def clean_slug(self):
-        slug = (self.cleaned_data.get("slug") or "").strip().lower()
-        if not slug:
-            base = (self.cleaned_data.get("name") or "").strip().lower()
-            base = re.sub(r"[^a-z0-9-_]+", "-", base).strip("-_")
-            return base
-        return re.sub(r"[^a-z0-9-_]+", "-", slug).strip("-_")
+        return normalize_slug(self.cleaned_data.get("slug"), self.cleaned_data.get("name"))
 
     def save(self, commit=True):
         sc = super().save(commit=False)
@@ -161,10 +156,23 @@ class ShowcaseForm(forms.ModelForm):
             sc.domains = normalize_domain_lines(self.cleaned_data.get("domains") or "")
 
         if commit:
-            sc.save()
+            sc.save()  # ShowcaseDomain синхронизирует Showcase.save()
         return sc
 
 
+class _SelectedLogoChoices:
+    """choices для виджета logo: пустая опция и выбранный логотип, без запроса списка."""
+
+    def __init__(self, form):
+        self.form = form
+
+    def __iter__(self):
+        yield "", "---------"
+        logo = self.form.selected_logo()
+        if logo is not None:
+            yield logo.pk, str(logo)
+
+
 class CardForm(forms.ModelForm):
     class Meta:
         model = Card
@@ -178,7 +186,7 @@ class CardForm(forms.ModelForm):
             "logo": forms.Select(attrs={
                 "id": "id_logo",
                 "data-placeholder": "Найти логотип…",
-                # data-search-url добавим ниже, когда reverse доступен
+                # data-index-url добавим ниже, когда reverse доступен
             }),
         }
         help_texts = { "btn_url": "" }
@@ -190,49 +198,75 @@ class CardForm(forms.ModelForm):
             self.fields["showcase"].initial = showcase
             self.fields["showcase"].widget = forms.HiddenInput()
 
-        # --- ПРЕДЗАГРУЗКА: первые 50 логотипов по имени ---
-        preload_ids = list(
-            Logo.objects.order_by("name").values_list("pk", flat=True)[:50]
-        )
-
-        # учтём уже выбранный логотип (при редактировании) или присланный в POST
-        selected_id = None
-        if getattr(self.instance, "logo_id", None):
-            selected_id = self.instance.logo_id
-        elif self.data.get("logo"):
-            selected_id = self.data.get("logo")
-
-        if selected_id:
-            try:
-                selected_id = int(selected_id)
-                if selected_id not in preload_ids:
-                    preload_ids.append(selected_id)
-            except (TypeError, ValueError):
-                pass
-
-        # финальный queryset БЕЗ distinct() и БЕЗ среза
-        self.fields["logo"].queryset = (
-            Logo.objects.filter(pk__in=preload_ids).order_by("name")
-        )
+        # Логотипы не грузим: список и поиск — из logos_index на клиенте.
+        # queryset нужен только для проверки выбора (один get по pk),
+        # в <select> рендерится лишь выбранная опция.
+        self.fields["logo"].queryset = Logo.objects.all()
+        self.fields["logo"].widget.choices = _SelectedLogoChoices(self)
 
         # атрибуты для JS-поиска
         self.fields["logo"].widget.attrs.update({
             "id": "id_logo",
             "data-placeholder": "Найти логотип…",
-            "data-search-url": reverse("logos_search"),
+            "data-index-url": f"{reverse('logos_index')}?v={logoindex.index_version()}",
             "data-showcase": str(getattr(showcase, "pk", "")) or "",
         })
 
+    def selected_logo(self):
+        """Выбранный логотип: после проверки — из cleaned_data, иначе — у карточки."""
+        if self.is_bound:
+            return getattr(self, "cleaned_data", {}).get("logo")
+        return self.instance.logo if self.instance.logo_id else None
+
     def clean_btn_url(self):
-        u = (self.cleaned_data.get("btn_url") or "").strip()
-        if not u:
-            return u
-        if not re.match(r"^https?://", u, re.I):
-            u = "https://" + u.lstrip("/")
-        return u
+        return normalize_btn_url(self.cleaned_data.get("btn_url"))
 
 
 class LogoForm(forms.ModelForm):
     class Meta:
         model = Logo
-        fields = ["name", "image"]
\ No newline at end of file
+        fields = ["name", "image"]
+
+    duplicate = None  # уже загруженный логотип с тем же файлом
+
+    def clean_image(self):
+        image = self.cleaned_data.get("image")
+        if image and "image" in self.changed_data:
+            digest = file_sha256(image)
+            self.duplicate = Logo.objects.filter(sha256=digest).exclude(pk=self.instance.pk).first()
+        return image
+
+    def save(self, commit=True):
+        if self.duplicate is not None and self.instance.pk is None:
+            # тот же файл уже есть — новый Logo не создаём, отдаём существующий
+            return self.duplicate
+        logo = super().save(commit=commit)
+        if commit and "image" in self.changed_data:
+            logo.build_variants()
+        return logo
+
+class ShowcaseCloneForm(forms.Form):
+    """Раскатка витрин на домены: по копии каждой отмеченной витрины на каждый домен."""
+    showcases = forms.ModelMultipleChoiceField(
+        queryset=Showcase.objects.all(),
+        widget=forms.MultipleHiddenInput,
+        error_messages={"required": "Не выбраны витрины."},
+    )
+    domains = forms.MultipleChoiceField(
+        label="Домены",
+        choices=build_domain_choices,
+        widget=forms.CheckboxSelectMultiple,
+        error_messages={"required": "Выберите хотя бы один домен."},
+    )
+
+
+class DataImportForm(forms.Form):
+    """Загрузка витрин и карточек из CSV/JSON (см. cards/utils/dataio.py)."""
+    file = forms.FileField(label="Файл CSV или JSON")
+    dry_run = forms.BooleanField(label="Только показать изменения (dry-run)", required=False, initial=True)
+
+    def clean_file(self):
+        f = self.cleaned_data["file"]
+        if not f.name.lower().endswith((".csv", ".json")):
+            raise forms.ValidationError("Нужен файл .csv или .json")
+        return f
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from cards.models import Logo
+
+
+class Command(BaseCommand):
+    help = "Создаёт WebP/AVIF-варианты для логотипов, загруженных до их появления."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true",
+                            help="Пересоздать варианты и у логотипов, где они уже есть.")
+
+    def handle(self, *args, **opts):
+        qs = Logo.objects.order_by("pk")
+        if not opts["all"]:
+            qs = qs.filter(width__isnull=True)
+        done = failed = 0
+        for logo in qs.iterator():
+            try:
+                logo.build_variants()
+                done += 1
+            except Exception as e:  # битый/отсутствующий файл не должен останавливать прогон
+                failed += 1
+                self.stderr.write(f"#{logo.pk} {logo.image.name}: {e}")
+        self.stdout.write(self.style.SUCCESS(f"готово: {done}, ошибок: {failed}"))
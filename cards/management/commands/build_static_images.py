@@ -0,0 +1,95 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from cards.utils.images import (
+    RESPONSIVE_DIR, RESPONSIVE_MANIFEST, VARIANT_FORMATS,
+    encode, open_image, resize_to_width, variant_formats,
+)
+
+SOURCE_EXT = {".jpg": "jpeg", ".jpeg": "jpeg", ".png": "png"}
+FALLBACK_PARAMS = {
+    "jpeg": {"quality": 80, "optimize": True, "progressive": True},
+    "png": {"optimize": True},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует уменьшенные варианты (AVIF/WebP + JPEG/PNG) картинок из static/img "
+        "и static/themes/* и пишет манифест для тега {% responsive_img %}."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--widths", default="320,640,960,1440",
+                            help="Ширины вариантов через запятую (по умолчанию 320,640,960,1440).")
+        parser.add_argument("--force", action="store_true",
+                            help="Пересоздать все варианты, даже если исходник не менялся.")
+
+    def handle(self, *args, widths, force, **opts):
+        if not settings.STATICFILES_DIRS:
+            raise CommandError("STATICFILES_DIRS пуст — не знаю, где лежат исходные картинки.")
+        root = Path(settings.STATICFILES_DIRS[0])
+        out_dir = root / RESPONSIVE_DIR
+        manifest_path = root / RESPONSIVE_MANIFEST
+        widths = sorted({int(w) for w in widths.split(",") if w.strip()})
+
+        old = {}
+        if manifest_path.exists() and not force:
+            old = json.loads(manifest_path.read_text(encoding="utf-8"))
+
+        sources = []
+        for sub in ("img", "themes"):
+            base = root / sub
+            if base.exists():
+                sources += [p for p in sorted(base.rglob("*")) if p.suffix.lower() in SOURCE_EXT]
+
+        manifest, built, skipped = {}, 0, 0
+        for src in sources:
+            rel = src.relative_to(root).as_posix()
+            stat = src.stat()
+            prev = old.get(rel)
+            if prev and prev.get("mtime") == int(stat.st_mtime) and prev.get("size") == stat.st_size \
+                    and all((root / v["path"]).exists() for v in prev["variants"]):
+                manifest[rel] = prev
+                skipped += 1
+                continue
+
+            with src.open("rb") as fp:
+                img = open_image(fp)
+            width, height = img.size
+            fallback = SOURCE_EXT[src.suffix.lower()]
+            stem = Path(rel).with_suffix("").as_posix()
+
+            variants = []
+            for w in [w for w in widths if w < width] + [width]:
+                resized = resize_to_width(img, w)
+                for fmt in variant_formats() + [fallback]:
+                    ext = VARIANT_FORMATS[fmt][0] if fmt in VARIANT_FORMATS else src.suffix.lower().lstrip(".")
+                    path = f"{RESPONSIVE_DIR}/{stem}-{w}.{ext}"
+                    target = root / path
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    target.write_bytes(encode(resized, fmt, **FALLBACK_PARAMS.get(fmt, {})))
+                    variants.append({"w": w, "fmt": fmt, "path": path})
+
+            manifest[rel] = {
+                "width": width, "height": height,
+                "mtime": int(stat.st_mtime), "size": stat.st_size,
+                "variants": variants,
+            }
+            built += 1
+            self.stdout.write(f"{rel}: {width}x{height}, вариантов {len(variants)}")
+
+        # подчищаем варианты исходников, которых больше нет
+        keep = {v["path"] for entry in manifest.values() for v in entry["variants"]}
+        if out_dir.exists():
+            for f in out_dir.rglob("*"):
+                rel = f.relative_to(root).as_posix()
+                if f.is_file() and rel != RESPONSIVE_MANIFEST and rel not in keep:
+                    f.unlink()
+
+        out_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding="utf-8")
+        self.stdout.write(self.style.SUCCESS(f"собрано: {built}, без изменений: {skipped}"))
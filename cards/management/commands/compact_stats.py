@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+
+from cards.models import StatBucket
+from cards.routers import primary_only
+from cards.utils.stats import add_to_bucket, hour_start
+
+
+class Command(BaseCommand):
+    help = "Сворачивает старые часовые корзины статистики в дневные и удаляет лишнее."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=int, default=48,
+                            help="Сколько последних часов хранить почасово (по умолчанию 48).")
+        parser.add_argument("--keep-days", type=int, default=0,
+                            help="Удалять дневные корзины старше N дней (0 — хранить всё).")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Только показать, что будет сделано.")
+
+    def handle(self, *args, **opts):
+        # свёртка читает и переписывает корзины — только на primary
+        with primary_only():
+            self.compact(**opts)
+
+    def compact(self, hours, keep_days, dry_run, **opts):
+        cutoff = hour_start(timezone.now() - timedelta(hours=hours))
+        old_hours = StatBucket.objects.filter(period=StatBucket.HOUR, bucket__lt=cutoff)
+        # фиксируем верхнюю границу id, чтобы не задеть строки, вставленные во время работы
+        max_id = old_hours.aggregate(m=Max("id"))["m"]
+
+        compacted = deleted = 0
+        if max_id is not None:
+            old_hours = old_hours.filter(id__lte=max_id)
+            rows = (old_hours
+                    .annotate(day=TruncDay("bucket"))
+                    .values("day", "showcase_id", "card_id", "domain")
+                    .annotate(impressions=Sum("impressions"), clicks=Sum("clicks"))
+                    .order_by())
+            if dry_run:
+                compacted = rows.count()
+                deleted = old_hours.count()
+            else:
+                with transaction.atomic():
+                    for r in rows.iterator():
+                        add_to_bucket(StatBucket.DAY, r["day"], r["showcase_id"], r["card_id"],
+                                      r["domain"], r["impressions"] or 0, r["clicks"] or 0)
+                        compacted += 1
+                    deleted, _ = old_hours.delete()
+
+        pruned = 0
+        if keep_days > 0:
+            day_cutoff = timezone.now() - timedelta(days=keep_days)
+            old_days = StatBucket.objects.filter(period=StatBucket.DAY, bucket__lt=day_cutoff)
+            if dry_run:
+                pruned = old_days.count()
+            else:
+                pruned, _ = old_days.delete()
+
+        prefix = "[dry-run] " if dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}часовых корзин до {cutoff:%Y-%m-%d %H:%M}: {deleted} → дневных ключей: {compacted}; "
+            f"удалено дневных: {pruned}"
+        ))
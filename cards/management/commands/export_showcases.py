@@ -0,0 +1,26 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cards.utils.export import export_all, export_root
+
+
+class Command(BaseCommand):
+    help = (
+        "Рендерит витрины в статический HTML для каждой пары (домен, slug) — "
+        "nginx отдаёт их через try_files. Перерисовываются только изменившиеся."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--root", help="Каталог экспорта (по умолчанию settings.STATIC_EXPORT_ROOT).")
+        parser.add_argument("--force", action="store_true", help="Перерисовать всё.")
+
+    def handle(self, *args, root=None, force=False, **opts):
+        root = Path(root) if root else export_root()
+        if root is None:
+            raise CommandError("Не задан STATIC_EXPORT_ROOT.")
+        log = self.stdout.write if opts["verbosity"] > 1 else None
+        rendered, skipped, removed = export_all(root, force=force, log=log)
+        self.stdout.write(self.style.SUCCESS(
+            f"{root}: перерисовано витрин {rendered}, без изменений {skipped}, удалено файлов {removed}"
+        ))
@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cards.utils import media
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет из media/ файлы логотипов, на которые не ссылается ни один Logo "
+        "(оригиналы и варианты). Каталог обходится потоково, ссылки берутся одним проходом по БД."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Только показать, что будет удалено.")
+        parser.add_argument("--prefix", default=media.LOGO_DIR,
+                            help=f"Каталог внутри MEDIA_ROOT (по умолчанию {media.LOGO_DIR}).")
+        parser.add_argument("--min-age", type=int, default=3600,
+                            help="Не трогать файлы моложе N секунд: их строка в БД может быть ещё не закоммичена.")
+
+    def handle(self, *args, **opts):
+        storage = default_storage
+        referenced = media.referenced_names()
+        cutoff = timezone.now() - timedelta(seconds=opts["min_age"])
+        found = kept = 0
+        candidates = {}
+        for name in media.walk(opts["prefix"], storage):
+            found += 1
+            if name in referenced:
+                kept += 1
+                continue
+            try:
+                if storage.get_modified_time(name) > cutoff:
+                    kept += 1
+                    continue
+                candidates[name] = storage.size(name)
+            except FileNotFoundError:
+                continue
+
+        # пока шёл обход, новый Logo мог закоммититься со ссылкой на старый файл
+        if candidates:
+            referenced = media.referenced_names()
+        orphans = size = 0
+        for name, file_size in candidates.items():
+            if name in referenced:
+                kept += 1
+                continue
+            orphans += 1
+            size += file_size
+            if opts["verbosity"] > 1 or opts["dry_run"]:
+                self.stdout.write(f"{name}\t{file_size}")
+            if not opts["dry_run"]:
+                storage.delete(name)
+
+        verb = "к удалению" if opts["dry_run"] else "удалено"
+        self.stdout.write(self.style.SUCCESS(
+            f"файлов: {found}, используется: {kept}, {verb}: {orphans} ({size / 1024:.1f} КБ)"
+        ))
@@ -0,0 +1,38 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cards.utils import dataio
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает витрины и карточки из CSV/JSON (формат выгрузки /admin/data/export/). "
+        "Строка с id обновляет запись, без id — создаёт; запись — пачками в одной транзакции."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл .csv или .json.")
+        parser.add_argument("--format", choices=["csv", "json"],
+                            help="Формат файла (по умолчанию — по расширению).")
+        parser.add_argument("--dry-run", action="store_true", help="Только показать изменения.")
+
+    def handle(self, *args, **opts):
+        fmt = opts["format"] or ("json" if opts["path"].lower().endswith(".json") else "csv")
+        try:
+            with open(opts["path"], encoding="utf-8-sig", newline="") as f:
+                plan = dataio.plan_import(dataio.read_rows(f, fmt))
+        except (OSError, ValueError, csv.Error) as e:
+            raise CommandError(f"Не удалось прочитать {opts['path']}: {e}")
+
+        if opts["verbosity"] > 0:
+            for line in plan.diff:
+                self.stdout.write(line)
+        for line in plan.errors:
+            self.stderr.write(line)
+        if not plan.ok:
+            raise CommandError(f"ошибок: {len(plan.errors)}, ничего не записано")
+        if opts["dry_run"]:
+            self.stdout.write(f"dry-run: {plan.summary()}")
+            return
+        self.stdout.write(self.style.SUCCESS(dataio.apply_import(plan)))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cards.utils import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный прогон публички и админки на данных loadtest_seed: "
+        "запросы/с, p50/p95/p99 и SQL-запросов на запрос по каждому сценарию."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url",
+                            help="Адрес запущенного сервера (http://127.0.0.1:8000). "
+                                 "Без него — в процессе через django.test.Client.")
+        parser.add_argument("--scenarios",
+                            help="Через запятую: index, detail, admin_list, admin_cards, admin_logos, "
+                                 "suggest, logos_search (по умолчанию все).")
+        parser.add_argument("--duration", type=float, default=10, help="Секунд на сценарий (по умолчанию 10).")
+        parser.add_argument("--warmup", type=float, default=1, help="Секунд прогрева без замера (по умолчанию 1).")
+        parser.add_argument("--concurrency", type=int, default=16, help="Параллельных клиентов (по умолчанию 16).")
+        parser.add_argument("--sample", type=int, default=10,
+                            help="Сколько адресов сценария использовать для подсчёта SQL (по умолчанию 10).")
+        parser.add_argument("--seed", type=int, default=0, help="Зерно выбора адресов.")
+
+    def handle(self, *args, **opts):
+        try:
+            scenarios = loadtest.build_scenarios()
+        except ValueError as e:
+            raise CommandError(str(e))
+        if opts["scenarios"]:
+            wanted = [s.strip() for s in opts["scenarios"].split(",") if s.strip()]
+            unknown = set(wanted) - scenarios.keys()
+            if unknown:
+                raise CommandError(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+            scenarios = {name: scenarios[name] for name in wanted}
+
+        user = loadtest.loadtest_user()
+        if opts["url"]:
+            cookie = loadtest.session_cookie(user)
+            make_sender = lambda: loadtest.http_sender(opts["url"], cookie)
+        else:
+            make_sender = lambda: loadtest.client_sender(user)
+
+        self.stdout.write(
+            f"{'сценарий':<14}{'запросов':>9}{'запр/с':>9}{'p50 мс':>9}{'p95 мс':>9}{'p99 мс':>9}"
+            f"{'ошибок':>8}{'SQL хол.':>10}{'SQL тёпл.':>10}"
+        )
+        for name, targets in scenarios.items():
+            if opts["warmup"] > 0:
+                loadtest.run_load(name, targets, make_sender, opts["warmup"], opts["concurrency"], opts["seed"])
+            result = loadtest.run_load(name, targets, make_sender, opts["duration"], opts["concurrency"], opts["seed"])
+            result.sql_cold, result.sql_warm = loadtest.count_queries(targets, user, opts["sample"])
+            self.stdout.write(
+                f"{name:<14}{result.requests:>9}{result.rps:>9.1f}{result.ms(50):>9.1f}{result.ms(95):>9.1f}"
+                f"{result.ms(99):>9.1f}{result.errors:>8}{result.sql_cold:>10.1f}{result.sql_warm:>10.1f}"
+            )
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cards.utils import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        "Засевает синтетические данные для нагрузочного прогона (manage.py loadtest): "
+        "N витрин × M карточек на K доменах из DOMAINS_ALLOWED плюс логотипы."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--showcases", type=int, default=100, help="Витрин (по умолчанию 100).")
+        parser.add_argument("--cards", type=int, default=12, help="Карточек на витрину (по умолчанию 12).")
+        parser.add_argument("--domains", type=int, default=4, help="Доменов из DOMAINS_ALLOWED (по умолчанию 4).")
+        parser.add_argument("--logos", type=int, default=40, help="Логотипов (по умолчанию 40).")
+        parser.add_argument("--variants", action="store_true",
+                            help="Собрать WebP/AVIF-варианты логотипов (медленно).")
+        parser.add_argument("--seed", type=int, default=0, help="Зерно генератора случайных чисел.")
+        parser.add_argument("--clear", action="store_true", help="Удалить прошлый засев перед новым.")
+        parser.add_argument("--clear-only", action="store_true", help="Только удалить прошлый засев.")
+
+    def handle(self, *args, **opts):
+        if opts["clear"] or opts["clear_only"]:
+            showcases, logos = loadtest.clear_seed()
+            self.stdout.write(f"удалено: витрин {showcases}, логотипов {logos}")
+            if opts["clear_only"]:
+                return
+        try:
+            summary = loadtest.seed(
+                opts["showcases"], opts["cards"], opts["domains"], opts["logos"],
+                variants=opts["variants"], seed_value=opts["seed"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"витрин {summary['showcases']}, карточек {summary['cards']}, логотипов {summary['logos']}; "
+            f"домены: {', '.join(summary['domains'])}"
+        ))
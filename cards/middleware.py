@@ -0,0 +1,213 @@
+"""
+- TimingMiddleware — замер времени запросов: Server-Timing для персонала
+  (всем — при CARDS_SERVER_TIMING) и гистограммы для /metrics (по вьюхе и домену). Фазы собирает cards/utils/timing.py.
+- ProfilerMiddleware — профилирование запроса по X-Profile / ?_profile= от персонала
+  (cards/utils/profiling.py).
+- ReplicaMiddleware — какие запросы читают с реплик БД (cards/routers.py).
+"""
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import DisallowedHost
+
+from . import routers
+from .utils import profiling
+from .utils.cache import bypass_reads, seconds_since_write
+from .utils.host import canonical_host
+from .utils.metrics import registry
+from .utils.timing import finish_request, start_request
+
+SERVER_TIMING_PHASES = ("host", "resolve", "db", "render")
+STICKY_COOKIE = "cards_db_primary"
+
+
+def _known_domains():
+    return {canonical_host(d) for d in getattr(settings, "DOMAINS_ALLOWED", [])}
+
+
+class TimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # метка domain — только из DOMAINS_ALLOWED, чтобы чужие Host не раздували метрики
+        self.domains = _known_domains()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        timings, token = start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request(token)
+        user = getattr(request, "user", None)
+        self.finish(request, response, timings, time.perf_counter() - started,
+                    bool(user and user.is_staff))
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        timings, token = start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request(token)
+        is_staff = False
+        if hasattr(request, "auser"):
+            is_staff = (await request.auser()).is_staff
+        self.finish(request, response, timings, time.perf_counter() - started, is_staff)
+        return response
+
+    def finish(self, request, response, timings, total, is_staff):
+        view = _view_name(request)
+        try:
+            host = canonical_host(request)
+        except DisallowedHost:
+            host = ""
+        domain = host if host in self.domains else "other"
+
+        labels = {"view": view, "domain": domain}
+        registry.observe("cards_request_duration_seconds", labels, total)
+        for phase, seconds in timings.phases.items():
+            registry.observe("cards_request_phase_seconds", {**labels, "phase": phase}, seconds)
+        if timings.queries:
+            registry.inc("cards_db_queries_total", labels, timings.queries)
+
+        if is_staff or getattr(settings, "CARDS_SERVER_TIMING", False):
+            parts = []
+            for phase in SERVER_TIMING_PHASES:
+                if phase in timings.phases:
+                    part = f"{phase};dur={timings.phases[phase] * 1000:.2f}"
+                    if phase == "db":
+                        part += f';desc="{timings.queries} SQL"'
+                    parts.append(part)
+            parts.append(f"total;dur={total * 1000:.2f}")
+            response["Server-Timing"] = ", ".join(parts)
+
+
+def _view_name(request):
+    match = request.resolver_match
+    return (match.url_name or match.view_name) if match else "unmatched"
+
+
+class ProfilerMiddleware:
+    """Ставится после AuthenticationMiddleware: флаг учитывается только у staff."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        mode = profiling.requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+        user = request.user
+        if not user.is_staff or not profiling._active.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            profile = profiling.RequestProfile()
+            profile.start()
+            try:
+                if mode == "cold":
+                    with bypass_reads():
+                        response = self.get_response(request)
+                else:
+                    response = self.get_response(request)
+            finally:
+                profile.stop()
+            response["X-Profile-Id"] = profile.save(request, response, _view_name(request), user)
+            return response
+        finally:
+            profiling._active.release()
+
+    async def __acall__(self, request):
+        mode = profiling.requested_mode(request)
+        if mode is None:
+            return await self.get_response(request)
+        user = await request.auser()
+        if not user.is_staff or not profiling._active.acquire(blocking=False):
+            return await self.get_response(request)
+        # под ASGI профилируется поток event loop: параллельные запросы тоже попадут в отчёт
+        try:
+            profile = profiling.RequestProfile()
+            profile.start()
+            try:
+                if mode == "cold":
+                    with bypass_reads():
+                        response = await self.get_response(request)
+                else:
+                    response = await self.get_response(request)
+            finally:
+                profile.stop()
+            response["X-Profile-Id"] = profile.save(request, response, _view_name(request), user)
+            return response
+        finally:
+            profiling._active.release()
+
+
+class ReplicaMiddleware:
+    """
+    Разрешает чтение с реплик БД публичным вьюхам (cards/routers.py).
+    После POST ставит cookie, с которой клиент CARDS_DB_STICKY_SECONDS читает с primary.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.enabled = bool(routers.replicas())
+        self.views = set(getattr(settings, "CARDS_DB_REPLICA_VIEWS", ()))
+        self.lag = getattr(settings, "CARDS_DB_REPLICA_LAG", 5)
+        self.sticky = getattr(settings, "CARDS_DB_STICKY_SECONDS", 10)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = routers.begin_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.end_request(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = routers.begin_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.end_request(token)
+        return self.finish(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not self.enabled or _view_name(request) not in self.views:
+            return None
+        if request.COOKIES.get(STICKY_COOKIE):
+            return None
+        since = seconds_since_write()
+        if since is not None and since < self.lag:
+            return None
+        routers.allow_replica()
+        return None
+
+    def finish(self, request, response):
+        if self.enabled and request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+            response.set_cookie(STICKY_COOKIE, "1", max_age=self.sticky, httponly=True, samesite="Lax")
+        return response
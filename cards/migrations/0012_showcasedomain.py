@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+import idna
+
+
+def fill_domain_rows(apps, schema_editor):
+    Showcase = apps.get_model("cards", "Showcase")
+    ShowcaseDomain = apps.get_model("cards", "ShowcaseDomain")
+    rows = []
+    for sc in Showcase.objects.all().only("pk", "domains"):
+        hosts = set()
+        for line in (sc.domains or "").replace(",", "\n").splitlines():
+            h = line.strip()
+            if not h:
+                continue
+            try:
+                hosts.add(idna.encode(h, uts46=True).decode("ascii").lower())
+            except Exception:
+                hosts.add(h.lower())
+        rows.extend(ShowcaseDomain(showcase_id=sc.pk, host=h) for h in sorted(hosts))
+    ShowcaseDomain.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0011_alter_card_logo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShowcaseDomain',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host', models.CharField(max_length=253, verbose_name='Домен (punycode)')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='showcase',
+            constraint=models.UniqueConstraint(fields=('domains', 'slug'), name='uniq_showcase_per_domain'),
+        ),
+        migrations.AddField(
+            model_name='showcasedomain',
+            name='showcase',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='domain_rows', to='cards.showcase'),
+        ),
+        migrations.AddConstraint(
+            model_name='showcasedomain',
+            constraint=models.UniqueConstraint(fields=('host', 'showcase'), name='uniq_showcase_domain_host'),
+        ),
+        migrations.RunPython(fill_domain_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:33
+
+from django.db import migrations, models
+
+from cards.utils.urls import build_partner_url
+
+
+def fill_full_btn_url(apps, schema_editor):
+    Card = apps.get_model("cards", "Card")
+    cards = list(Card.objects.select_related("showcase").only("pk", "btn_url", "showcase__extra_params"))
+    for c in cards:
+        c.full_btn_url = build_partner_url(c.btn_url, c.showcase.extra_params if c.showcase_id else "")
+    Card.objects.bulk_update(cards, ["full_btn_url"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0012_showcasedomain'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='full_btn_url',
+            field=models.CharField(blank=True, default='', editable=False, help_text='btn_url + extra_params витрины; пересчитывается при сохранении', max_length=1000, verbose_name='Итоговая ссылка'),
+        ),
+        migrations.RunPython(fill_full_btn_url, migrations.RunPython.noop),
+    ]
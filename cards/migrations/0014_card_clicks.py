@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0013_card_full_btn_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='clicks',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Переходы'),
+        ),
+    ]
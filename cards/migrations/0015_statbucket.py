@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0014_card_clicks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('h', 'Час'), ('d', 'День')], default='h', max_length=1, verbose_name='Период')),
+                ('bucket', models.DateTimeField(verbose_name='Начало периода')),
+                ('domain', models.CharField(blank=True, default='', max_length=253, verbose_name='Домен (punycode)')),
+                ('impressions', models.PositiveIntegerField(default=0, verbose_name='Показы')),
+                ('clicks', models.PositiveIntegerField(default=0, verbose_name='Клики')),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stat_buckets', to='cards.card')),
+                ('showcase', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stat_buckets', to='cards.showcase')),
+            ],
+            options={
+                'verbose_name': 'Статистика',
+                'verbose_name_plural': 'Статистика',
+                'indexes': [models.Index(fields=['showcase', 'card'], name='stat_showcase_card_idx')],
+                'constraints': [models.UniqueConstraint(fields=('period', 'bucket', 'showcase', 'card', 'domain'), name='uniq_stat_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0015_statbucket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logo',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота'),
+        ),
+        migrations.AddField(
+            model_name='logo',
+            name='variants',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='Варианты'),
+        ),
+        migrations.AddField(
+            model_name='logo',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+"""
+Индексы для поиска в автокомплитах (см. cards/utils/search.py):
+- Postgres: pg_trgm + GIN по тем же выражениям, что в search.SEARCH_SQL;
+- SQLite: FTS5-таблицы с trigram-токенизатором и триггеры синхронизации.
+На SQLite без trigram-токенизатора (< 3.34) ничего не создаётся — поиск
+остаётся на icontains.
+"""
+from django.db import migrations
+
+PG_INDEXES = {
+    "cards_showcase_search_trgm": (
+        "cards_showcase", "translate(lower(name || ' ' || coalesce(slug, '')), 'ё', 'е')"),
+    "cards_logo_search_trgm": ("cards_logo", "translate(lower(name), 'ё', 'е')"),
+}
+
+SQLITE_TEXT = {
+    "cards_showcase": "replace(replace({row}.name || ' ' || coalesce({row}.slug, ''), 'ё', 'е'), 'Ё', 'Е')",
+    "cards_logo": "replace(replace({row}.name, 'ё', 'е'), 'Ё', 'Е')",
+}
+SQLITE_WATCH = {"cards_showcase": "name, slug", "cards_logo": "name"}
+
+
+def forwards(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for name, (table, expr) in PG_INDEXES.items():
+            schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin (({expr}) gin_trgm_ops)")
+    elif vendor == "sqlite":
+        with schema_editor.connection.cursor() as cur:
+            try:
+                cur.execute("CREATE VIRTUAL TABLE cards_logo_fts USING fts5(text, tokenize='trigram')")
+            except Exception:
+                return  # нет trigram-токенизатора
+            cur.execute("CREATE VIRTUAL TABLE cards_showcase_fts USING fts5(text, tokenize='trigram')")
+        for table, text in SQLITE_TEXT.items():
+            fts = f"{table}_fts"
+            new = text.format(row="new")
+            schema_editor.execute(f"INSERT INTO {fts} (rowid, text) SELECT id, {text.format(row=table)} FROM {table}")
+            schema_editor.execute(
+                f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts} (rowid, text) VALUES (new.id, {new}); END"
+            )
+            schema_editor.execute(
+                f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {SQLITE_WATCH[table]} ON {table} BEGIN "
+                f"UPDATE {fts} SET text = {new} WHERE rowid = old.id; END"
+            )
+            schema_editor.execute(
+                f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"DELETE FROM {fts} WHERE rowid = old.id; END"
+            )
+
+
+def backwards(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        for name in PG_INDEXES:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+    elif vendor == "sqlite":
+        for table in SQLITE_TEXT:
+            fts = f"{table}_fts"
+            for suffix in ("ai", "au", "ad"):
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+            schema_editor.execute(f"DROP TABLE IF EXISTS {fts}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0016_logo_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
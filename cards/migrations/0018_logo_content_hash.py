@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:20
+
+import hashlib
+
+import cards.utils.media
+from django.db import migrations, models
+
+
+def fill_sha256(apps, schema_editor):
+    # хэши старых файлов — чтобы повторная загрузка нашла их как дубликат;
+    # сами файлы остаются под прежними именами
+    Logo = apps.get_model("cards", "Logo")
+    for logo in Logo.objects.filter(sha256="").exclude(image=""):
+        digest = hashlib.sha256()
+        try:
+            with logo.image.open("rb") as f:
+                for chunk in f.chunks():
+                    digest.update(chunk)
+        except OSError:
+            continue  # файла нет — пропускаем
+        logo.sha256 = digest.hexdigest()
+        logo.save(update_fields=["sha256"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cards', '0017_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logo',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, verbose_name='SHA-256 файла'),
+        ),
+        migrations.AlterField(
+            model_name='logo',
+            name='image',
+            field=models.ImageField(upload_to=cards.utils.media.logo_upload_to, verbose_name='Файл'),
+        ),
+        migrations.RunPython(fill_sha256, migrations.RunPython.noop),
+    ]
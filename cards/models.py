@@ -1,9 +1,13 @@
 # cards/models.py
-from django.db import models
+from django.db import models, transaction
 from django.utils.text import slugify
-from urllib.parse import urlencode, urlparse, urlunparse, parse_qsl
 import re
-import idna
+
+from .utils import host as hostnames
+from .utils.cache import bump_version
+from .utils.media import file_sha256, hashed_name, logo_upload_to, touch
+from .utils.themes import registry as theme_registry
+from .utils.urls import build_partner_url
 
 class Showcase(models.Model):
     name = models.CharField(max_length=255, verbose_name="Название витрины")
@@ -39,67 +43,68 @@ class Showcase(models.Model):
 
     def __str__(self):
         return self.name or f"Витрина {self.pk}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # запоминаем исходные метки и домены, чтобы в save() понять, менялись ли они
+        instance._loaded_extra_params = instance.__dict__.get("extra_params")
+        instance._loaded_domains = instance.__dict__.get("domains")
+        return instance
+
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, "_loaded_extra_params", None)
+        changed = self._state.adding is False and loaded is not None and loaded != self.extra_params
+        # таблица роутинга ShowcaseDomain — при любом save(), не только из ShowcaseForm
+        domains_changed = self._state.adding or getattr(self, "_loaded_domains", None) != self.domains
+        if domains_changed:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                self.sync_domain_rows()
+        else:
+            super().save(*args, **kwargs)
+        if changed:
+            self.recompute_card_urls()
+        self._loaded_extra_params = self.extra_params
+        self._loaded_domains = self.domains
+
+    def recompute_card_urls(self):
+        """Пересчитывает full_btn_url у всех карточек витрины одним bulk_update."""
+        cards = list(self.cards.only("pk", "btn_url", "full_btn_url"))
+        changed = []
+        for c in cards:
+            url = c.compute_full_btn_url(self.extra_params)
+            if url != c.full_btn_url:
+                c.full_btn_url = url
+                changed.append(c)
+        if changed:
+            Card.objects.bulk_update(changed, ["full_btn_url"], batch_size=500)
+        return len(changed)
     
+    @property
+    def theme(self):
+        """Тема из реестра (cards/utils/themes.py); неизвестная — общий шаблон."""
+        return theme_registry.get(self.template)
+
+    @property
+    def theme_template(self):
+        """Шаблон страницы витрины: тема из cards/templates/themes/<template>/ или общий."""
+        return self.theme.template_name
+
     def domains_list(self):
-        """Список доменов из поля domains (через запятую/пробел/переносы)."""
-        out = []
-        for line in (self.domains or "").splitlines():
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                out.append(idna.decode(line))
-            except Exception:
-                out.append(line)
-        return out
-    
+        """Список доменов из поля domains (через запятую/пробел/переносы), в unicode."""
+        return [hostnames.to_unicode(h) for h in hostnames.split_domains(self.domains)]
+
     def domains_pairs(self):
         """
         Возвращает список кортежей (ascii_host_for_link, human_label) для каждого домена.
         В БД может быть как punycode, так и юникод — тут нормализуем оба случая.
         """
-        pairs = []
-        try:
-            import idna
-        except Exception:
-            idna = None
-
-        for raw in self.domains_list():
-            ascii_host = raw
-            label = raw
-            if idna:
-                # приводим к ascii (punycode) для href
-                try:
-                    ascii_host = idna.encode(raw, uts46=True).decode("ascii")
-                except Exception:
-                    ascii_host = raw
-                # и получаем красивую метку для текста
-                try:
-                    label = idna.decode(ascii_host)
-                except Exception:
-                    label = raw
-            pairs.append((ascii_host, label))
-        return pairs
-    
+        return [hostnames.normalize(h) for h in hostnames.split_domains(self.domains)]
+
     def domains_ascii_set(self):
-        """
-        Возвращает множество доменов витрины в ascii (punycode), lower.
-        Разбирает по переносам/запятым/пробелам и нормализует.
-        """
-        raw = (self.domains or "")
-        # Разрешим запятые тоже как разделители
-        raw = raw.replace(",", "\n")
-        hosts = set()
-        for line in raw.splitlines():
-            h = line.strip()
-            if not h:
-                continue
-            try:
-                h_ascii = idna.encode(h, uts46=True).decode("ascii").lower()
-            except Exception:
-                h_ascii = h.lower()
-            hosts.add(h_ascii)
-        return hosts
+        """Множество доменов витрины в ascii (punycode), lower."""
+        return hostnames.ascii_set(self.domains)
 
     def matches_host(self, ascii_host: str) -> bool:
         """
@@ -108,34 +113,98 @@ class Showcase(models.Model):
         """
         if not ascii_host:
             return False
-        ascii_host = ascii_host.lower()
-        # человекочитаемый вариант (на случай кириллицы в БД)
-        try:
-            human = idna.decode(ascii_host).lower()
-        except Exception:
-            human = ascii_host
-
-        for d in self.domains_list():  # уже нормализует строки/декодирует
-            dl = d.lower()
-            if dl == ascii_host or dl == human:
-                return True
-            # на случай если в domains_list вернулась кириллица — сравним в punycode
-            try:
-                if idna.encode(dl, uts46=True).decode("ascii").lower() == ascii_host:
-                    return True
-            except Exception:
-                pass
-        return False
+        return hostnames.to_ascii(ascii_host) in self.domains_ascii_set()
+
+    def sync_domain_rows(self):
+        """
+        Синхронизирует таблицу ShowcaseDomain с полем domains:
+        по одной punycode-строке на каждый домен витрины.
+        """
+        wanted = self.domains_ascii_set()
+        existing = set(self.domain_rows.values_list("host", flat=True))
+        stale = existing - wanted
+        if stale:
+            self.domain_rows.filter(host__in=stale).delete()
+        missing = wanted - existing
+        if missing:
+            ShowcaseDomain.objects.bulk_create(
+                [ShowcaseDomain(showcase=self, host=h) for h in sorted(missing)]
+            )
+            # bulk_create не шлёт post_save — кэш роутинга сбрасываем сами
+            transaction.on_commit(bump_version)
+
+
+class ShowcaseDomain(models.Model):
+    """
+    Нормализованная связка «витрина ↔ домен» для роутинга по индексу.
+    host всегда хранится в punycode (ascii), lower — как его отдаёт canonical_host.
+    """
+    showcase = models.ForeignKey(
+        Showcase,
+        on_delete=models.CASCADE,
+        related_name="domain_rows",
+    )
+    host = models.CharField("Домен (punycode)", max_length=253)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["host", "showcase"],
+                name="uniq_showcase_domain_host",
+            ),
+        ]
+
+    def __str__(self):
+        return self.host
 
 
 
 class Logo(models.Model):
     name = models.CharField("Название", max_length=255)
-    image = models.ImageField("Файл", upload_to="logos/")
+    # файл лежит под sha256 содержимого (cards/utils/media.py)
+    image = models.ImageField("Файл", upload_to=logo_upload_to)
+    sha256 = models.CharField("SHA-256 файла", max_length=64, blank=True, db_index=True, editable=False)
+    width = models.PositiveIntegerField("Ширина", null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField("Высота", null=True, blank=True, editable=False)
+    # [{"w": 160, "fmt": "webp", "name": "logos/variants/..."}] — см. cards/utils/images.py
+    variants = models.JSONField("Варианты", default=list, blank=True, editable=False)
 
     def __str__(self):
         return self.name or f"Логотип {self.pk}"
 
+    def save(self, *args, **kwargs):
+        if self.image and not self.image._committed:
+            self.sha256 = file_sha256(self.image)
+            name = hashed_name(self.sha256, self.image.name)
+            if self.image.storage.exists(name):
+                # такой файл уже лежит — ссылаемся на него, копию не пишем
+                touch(name, self.image.storage)
+                self.image.name = name
+                self.image._committed = True
+        super().save(*args, **kwargs)
+
+    def build_variants(self):
+        """
+        Пересоздаёт уменьшенные WebP/AVIF-варианты и запоминает размеры оригинала.
+        Старые файлы не удаляются: их может использовать другой Logo с тем же
+        содержимым, осиротевшие убирает gc_media.
+        """
+        from .utils.images import make_variants
+
+        if not self.image:
+            return
+        self.width, self.height, self.variants = make_variants(self.image)
+        self.save(update_fields=["width", "height", "variants"])
+
+    def variant_srcset(self, fmt):
+        """srcset для указанного формата: 'url 80w, url 160w'."""
+        storage = self.image.storage
+        return ", ".join(
+            f"{storage.url(v['name'])} {v['w']}w"
+            for v in sorted(self.variants or [], key=lambda v: v["w"])
+            if v["fmt"] == fmt
+        )
+
 
 class Card(models.Model):
     showcase = models.ForeignKey(
@@ -165,6 +234,15 @@ class Card(models.Model):
         blank=True
     )
     logo = models.ImageField("Логотип", upload_to="logos/", blank=True, null=True)
+    full_btn_url = models.CharField(
+        "Итоговая ссылка",
+        max_length=1000,
+        blank=True,
+        default="",
+        editable=False,
+        help_text="btn_url + extra_params витрины; пересчитывается при сохранении",
+    )
+    clicks = models.PositiveIntegerField("Переходы", default=0, editable=False)
     order_index = models.IntegerField("Порядок", default=0)
     active = models.BooleanField("Активна", default=True)
     created_at = models.DateTimeField("Дата создания", auto_now_add=True)
@@ -186,38 +264,72 @@ class Card(models.Model):
     def __str__(self):
         return self.title
     
+    def compute_full_btn_url(self, extra_params=None):
+        """Собирает итоговую ссылку из btn_url и extra_params витрины."""
+        if extra_params is None:
+            extra_params = self.showcase.extra_params if self.showcase_id else ""
+        return build_partner_url(self.btn_url, extra_params)
+
     @property
     def get_full_btn_url(self):
-            """
-            Возвращает полную ссылку:
-            - если схема отсутствует — добавляем https://
-            - приклеиваем параметры из showcase.extra_params
-            """
-            raw = (self.btn_url or "").strip()
-            if not raw:
-                return ""
-
-            # если пользователь вводит partner.ru/path — добавим схему
-            p = urlparse(raw)
-            if not p.scheme:
-                raw = "https://" + raw.lstrip("/")
-                p = urlparse(raw)
-
-            # если всё ещё нет netloc (например, '/path') — считаем, что ссылка некорректна
-            if not p.netloc:
-                return raw  # можно вернуть "" если хочешь скрывать кнопку
-
-            # текущие query-параметры из ссылки
-            query = dict(parse_qsl(p.query, keep_blank_values=True))
-
-            # приклеим доп. метки из витрины
-            extra = (self.showcase.extra_params or "").strip().lstrip("?&")
-            if extra:
-                extra_qs = dict(parse_qsl(extra, keep_blank_values=True))
-                query.update(extra_qs)
-
-            # соберём назад
-            p = p._replace(query=urlencode(query, doseq=True))
-            return urlunparse(p)
-        
+        """Итоговая ссылка; хранится в full_btn_url и пересчитывается при сохранении."""
+        return self.full_btn_url
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # исходные поля ссылки: save() пересчитывает full_btn_url, только если они менялись
+        instance._loaded_url_key = (instance.__dict__.get("btn_url"), instance.__dict__.get("showcase_id"))
+        return instance
+
+    def _url_changed(self, update_fields):
+        if update_fields is not None:
+            return bool({"btn_url", "showcase", "showcase_id"} & set(update_fields))
+        if self._state.adding:
+            return True
+        return getattr(self, "_loaded_url_key", None) != (self.btn_url, self.showcase_id)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        # переключение/сортировка не трогают ссылку — и не тянут витрину ради extra_params
+        if self._url_changed(update_fields):
+            self.full_btn_url = self.compute_full_btn_url()
+            if update_fields is not None and "full_btn_url" not in update_fields:
+                kwargs["update_fields"] = {*update_fields, "full_btn_url"}
+        super().save(*args, **kwargs)
+        self._loaded_url_key = (self.btn_url, self.showcase_id)
+
 
+class StatBucket(models.Model):
+    """
+    Свёртка показов/кликов по (витрина, карточка, домен) за час или за день.
+    Часовые корзины пишет буфер из cards/utils/stats.py,
+    команда compact_stats сворачивает старые часы в дни.
+    """
+    HOUR = "h"
+    DAY = "d"
+    PERIOD_CHOICES = [(HOUR, "Час"), (DAY, "День")]
+
+    period = models.CharField("Период", max_length=1, choices=PERIOD_CHOICES, default=HOUR)
+    bucket = models.DateTimeField("Начало периода")
+    showcase = models.ForeignKey(Showcase, on_delete=models.CASCADE, related_name="stat_buckets")
+    card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name="stat_buckets")
+    domain = models.CharField("Домен (punycode)", max_length=253, blank=True, default="")
+    impressions = models.PositiveIntegerField("Показы", default=0)
+    clicks = models.PositiveIntegerField("Клики", default=0)
+
+    class Meta:
+        verbose_name = "Статистика"
+        verbose_name_plural = "Статистика"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["period", "bucket", "showcase", "card", "domain"],
+                name="uniq_stat_bucket",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["showcase", "card"], name="stat_showcase_card_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_period_display()} {self.bucket:%Y-%m-%d %H:00} #{self.card_id}"
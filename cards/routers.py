@@ -0,0 +1,80 @@
+# cards/routers.py
+"""
+Чтение с реплик БД (settings.CARDS_DB_REPLICAS — алиасы из DATABASES).
+
+Запись и по умолчанию чтение — всегда "default" (primary). На реплику уходит
+только чтение внутри запроса, который ReplicaMiddleware (cards/middleware.py)
+пометил как публичное чтение: вьюхи из CARDS_DB_REPLICA_VIEWS, и только если
+- у клиента нет cookie «читать с primary» — её ставит любой POST (админка),
+  чтобы автор сразу видел свои правки (read-your-writes);
+- последняя запись в контент была раньше CARDS_DB_REPLICA_LAG секунд:
+  иначе отстающая реплика положила бы старые данные в кэш публички
+  под уже новой версией (cards/utils/cache.py).
+Без реплик роутер ничего не меняет.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# состояние текущего запроса: {"replica": bool}; dict — чтобы отметка из
+# process_view была видна и в __call__ под ASGI
+_state = ContextVar("cards_db_state", default=None)
+
+
+def replicas():
+    return list(getattr(settings, "CARDS_DB_REPLICAS", []) or [])
+
+
+def begin_request():
+    return _state.set({"replica": False})
+
+
+def end_request(token):
+    _state.reset(token)
+
+
+def allow_replica():
+    state = _state.get()
+    if state is not None:
+        state["replica"] = True
+
+
+@contextmanager
+def primary_only():
+    """
+    Все чтения внутри блока — с primary, даже в запросе публички:
+    для read-modify-write (буфер статистики, compact_stats), где отставшая
+    реплика потеряла бы инкременты.
+    """
+    token = _state.set({"replica": False})
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+def replica_allowed():
+    state = _state.get()
+    return bool(state and state["replica"])
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        aliases = replicas()
+        if aliases and replica_allowed():
+            return random.choice(aliases)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики — копии primary: связи между объектами с разных алиасов допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # схему реплик обновляет репликация, не migrate
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,59 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Card, Logo, Showcase, ShowcaseDomain
+from .utils import export
+from .utils.logoindex import bump_index_version
+from .utils.cache import bump_version
+
+
+@receiver(post_save, sender=Showcase)
+@receiver(post_delete, sender=Showcase)
+@receiver(post_save, sender=ShowcaseDomain)
+@receiver(post_delete, sender=ShowcaseDomain)
+@receiver(post_save, sender=Card)
+@receiver(post_delete, sender=Card)
+@receiver(post_save, sender=Logo)
+@receiver(post_delete, sender=Logo)
+def invalidate_public_cache(sender, **kwargs):
+    # после коммита, чтобы другой воркер не успел закэшировать
+    # старые данные под новой версией
+    transaction.on_commit(bump_version)
+
+
+@receiver(post_save, sender=Logo)
+@receiver(post_delete, sender=Logo)
+def invalidate_logo_index(sender, **kwargs):
+    # индекс для выбора логотипа в форме карточки (cards/utils/logoindex.py)
+    transaction.on_commit(bump_index_version)
+
+
+def _affected_showcases(sender, instance):
+    if sender is Showcase:
+        # та же пара (домен, slug) могла достаться другой витрине
+        ids = {instance.pk}
+        if instance.slug:
+            ids.update(Showcase.objects.filter(slug=instance.slug).values_list("pk", flat=True))
+        return ids
+    if sender in (Card, ShowcaseDomain):
+        return {instance.showcase_id} if instance.showcase_id else set()
+    if sender is Logo:
+        return set(Card.objects.filter(logo_id=instance.pk).values_list("showcase_id", flat=True))
+    return set()
+
+
+@receiver(post_save, sender=Showcase)
+@receiver(post_delete, sender=Showcase)
+@receiver(post_save, sender=ShowcaseDomain)
+@receiver(post_delete, sender=ShowcaseDomain)
+@receiver(post_save, sender=Card)
+@receiver(post_delete, sender=Card)
+@receiver(post_save, sender=Logo)
+@receiver(post_delete, sender=Logo)
+def invalidate_static_export(sender, instance, **kwargs):
+    if not export.is_enabled():
+        return
+    ids = _affected_showcases(sender, instance)
+    if ids:
+        transaction.on_commit(lambda: export.changed(ids))
@@ -0,0 +1,71 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import brotli
+except ImportError:  # brotli — необязательная зависимость
+    brotli = None
+
+# что имеет смысл сжимать заранее (картинки/шрифты woff2 и так сжаты)
+COMPRESSIBLE_EXTENSIONS = (
+    ".css", ".js", ".mjs", ".map", ".json", ".svg", ".txt", ".xml", ".html", ".ico",
+    ".ttf", ".otf", ".eot",
+)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    collectstatic: файлы с хэшем в имени (style.3f2a9c1b7d4e.css) + манифест,
+    плюс рядом с каждым текстовым файлом .gz и .br — nginx отдаёт их через
+    gzip_static/brotli_static, не сжимая ничего на лету.
+    """
+
+    # нет записи в манифесте — отдаём исходное имя, а не 500 на всю страницу
+    manifest_strict = False
+    min_compress_size = 256
+
+    def url(self, name, force=False):
+        # хэшированные имена и при DEBUG, если манифест уже собран collectstatic'ом
+        try:
+            return super().url(name, force=force or bool(self.hashed_files))
+        except ValueError:
+            # файла нет ни в манифесте, ни на диске — отдаём как есть
+            return FileSystemStorage.url(self, name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        final = {}
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            yield name, hashed_name, processed
+            if not isinstance(processed, Exception) and hashed_name:
+                final[name] = hashed_name
+
+        if dry_run:
+            return
+        for name, hashed_name in final.items():
+            for target in {name, hashed_name}:
+                if target.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+                    self._write_compressed(target)
+
+    def _write_compressed(self, name):
+        path = self.path(name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        if len(data) < self.min_compress_size:
+            return
+
+        variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", brotli.compress(data, mode=brotli.MODE_TEXT)))
+        for suffix, body in variants:
+            if len(body) >= len(data):
+                continue
+            with open(path + suffix, "wb") as f:
+                f.write(body)
+            st = os.stat(path)
+            os.utime(path + suffix, (st.st_atime, st.st_mtime))
@@ -0,0 +1,83 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from cards.utils.images import responsive_manifest
+
+register = template.Library()
+
+
+def _attrs(**attrs):
+    return format_html_join(" ", '{}="{}"', ((k.replace("_", "-"), v) for k, v in attrs.items() if v not in (None, "")))
+
+
+@register.simple_tag
+def logo_img(logo, sizes="160px", alt="", css_class="", loading="lazy"):
+    """
+    <img> логотипа с srcset/sizes/width/height/loading по вариантам из Logo.variants.
+    Если есть AVIF — оборачиваем в <picture> (display:contents, чтобы не ломать вёрстку).
+    Без вариантов (старые логотипы) — обычный <img> на оригинал.
+    """
+    if not logo or not logo.image:
+        return ""
+
+    variants = logo.variants or []
+    webp_srcset = logo.variant_srcset("webp") if variants else ""
+    avif_srcset = logo.variant_srcset("avif") if variants else ""
+
+    img = format_html(
+        "<img {}>",
+        _attrs(
+            src=logo.image.url,
+            srcset=webp_srcset,
+            sizes=sizes if webp_srcset else "",
+            width=logo.width,
+            height=logo.height,
+            alt=alt or logo.name,
+            loading=loading,
+            decoding="async",
+            **{"class": css_class},
+        ),
+    )
+    if not avif_srcset:
+        return img
+    source = format_html('<source type="image/avif" {}>', _attrs(srcset=avif_srcset, sizes=sizes))
+    return format_html('<picture style="display:contents">{}{}</picture>', source, img)
+
+
+@register.simple_tag
+def responsive_img(path, sizes="100vw", alt="", css_class="", loading="lazy", **attrs):
+    """
+    <picture> для картинки из static/ по манифесту build_static_images:
+    AVIF/WebP-источники + <img> с srcset из JPEG/PNG того же размера.
+    Если манифеста или записи нет — обычный <img src="{% static path %}">.
+    """
+    entry = responsive_manifest().get(path)
+    if not entry:
+        return format_html("<img {}>", _attrs(src=static(path), alt=alt, loading=loading,
+                                               **{"class": css_class}, **attrs))
+
+    by_fmt, by_fmt_paths = {}, {}
+    for v in sorted(entry["variants"], key=lambda v: v["w"]):
+        by_fmt.setdefault(v["fmt"], []).append(f"{static(v['path'])} {v['w']}w")
+        by_fmt_paths.setdefault(v["fmt"], []).append(v["path"])
+
+    sources = format_html_join(
+        "", '<source type="image/{}" srcset="{}" sizes="{}">',
+        ((fmt, ", ".join(by_fmt[fmt]), sizes) for fmt in ("avif", "webp") if fmt in by_fmt),
+    )
+    fallback = [v for v in by_fmt if v not in ("avif", "webp")]
+    fallback_srcset = ", ".join(by_fmt[fallback[0]]) if fallback else ""
+    img = format_html("<img {}>", _attrs(
+        src=static(by_fmt_paths[fallback[0]][-1]) if fallback else static(path),
+        srcset=fallback_srcset,
+        sizes=sizes if fallback_srcset else "",
+        width=entry["width"],
+        height=entry["height"],
+        alt=alt,
+        loading=loading,
+        decoding="async",
+        **{"class": css_class},
+        **attrs,
+    ))
+    return format_html('<picture style="display:contents">{}{}</picture>', sources, img)
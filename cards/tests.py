@@ -0,0 +1,1051 @@
+"""
+Бюджеты SQL-запросов и времени для каждого URL из cards/urls.py и cards/admin_urls.py.
+
+Каждый адрес открывается на нескольких размерах данных (n витрин × n карточек,
+n логотипов). Тест падает, если:
+- у адреса нет бюджета в BUDGETS (новый URL — добавьте бюджет);
+- запросов больше бюджета или их число растёт вместе с n (N+1);
+- запрос на самом большом наборе дольше бюджета по времени.
+Публичные страницы меряются на холодном кэше — это худший случай.
+"""
+import csv
+import io
+import tempfile
+import time
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from cards import admin_urls, urls
+from cards.models import Card, Logo, Showcase, ShowcaseDomain
+from cards.utils.cache import local_cache
+from cards.utils.stats import stats_buffer
+from cards.utils.urls import build_partner_url
+
+SIZES = (1, 5, 25)
+HOST = "xn--d1asbcbidu0b.xn--p1ai"
+
+# имя URL → (макс. SQL-запросов, макс. секунд на запрос на наборе SIZES[-1]).
+# В админке 2 запроса — сессия и пользователь.
+BUDGETS = {
+    # публичка
+    "index": (1, 0.5),
+    "card_go": (1, 0.5),
+    "showcase_detail": (2, 1.0),
+    "metrics": (0, 0.5),
+    "impression": (0, 0.5),
+    # админка: списки
+    "showcases_admin": (4, 0.5),
+    "cards_admin": (5, 0.5),
+    "logos_admin": (4, 0.5),
+    "logos_search": (3, 0.5),
+    "logos_index": (3, 0.5),
+    "showcases_suggest": (3, 0.5),
+    # админка: формы
+    "showcase_add": (2, 0.5),
+    "showcase_edit": (3, 0.5),
+    "card_add": (3, 0.5),
+    "card_edit": (4, 0.5),
+    "logo_add": (2, 0.5),
+    # админка: действия
+    "showcase_duplicate": (10, 0.5),
+    "showcases_clone": (10, 0.5),
+    "data_export": (4, 1.0),
+    "data_import": (8, 1.0),
+    "showcase_delete": (10, 0.5),
+    "card_toggle": (5, 0.5),
+    "card_delete": (6, 0.5),
+    "cards_bulk": (9, 0.5),
+    "cards_reorder": (7, 0.5),
+    "logo_delete": (5, 0.5),
+    # админка: профили запросов
+    "profiles_admin": (2, 0.5),
+    "profile_detail": (2, 0.5),
+    "profile_download": (2, 0.5),
+}
+
+POST_VIEWS = {"showcase_duplicate", "showcase_delete", "card_toggle", "card_delete",
+              "cards_bulk", "cards_reorder", "showcases_clone", "data_import"}
+
+
+def make_dataset(n, tag):
+    """n витрин по n карточек на домене HOST и n логотипов; возвращает (витрина, логотип)."""
+    logos = Logo.objects.bulk_create(
+        [Logo(name=f"{tag}-logo-{i}", image=f"logos/{tag}-{i}.png", width=320, height=120)
+         for i in range(n)]
+    )
+    showcases = Showcase.objects.bulk_create(
+        [Showcase(name=f"{tag} {i}", slug=f"{tag}-{i}", domains=HOST, template="loanpath",
+                  extra_params="aff_id=1")
+         for i in range(n)]
+    )
+    ShowcaseDomain.objects.bulk_create([ShowcaseDomain(showcase=sc, host=HOST) for sc in showcases])
+    Card.objects.bulk_create([
+        Card(showcase=sc, title=f"Карточка {j}", price=1000 + j, btn_url="https://partner.example/apply",
+             full_btn_url=build_partner_url("https://partner.example/apply", sc.extra_params),
+             logo=logos[j % n], order_index=j + 1)
+        for sc in showcases for j in range(n)
+    ])
+    return showcases[0], logos[0]
+
+
+def url_kwargs(name, pattern, showcase, logo, profile=None):
+    card = showcase.cards.order_by("pk").first()
+    values = {
+        "name": profile,
+        "kind": "pstats",
+        "pk": logo.pk if name.startswith("logo_") else showcase.pk,
+        "cid": card.pk,
+        "card_id": card.pk,
+        "slug": showcase.slug,
+    }
+    return {key: values[key] for key in pattern.pattern.converters}
+
+
+def post_data(name, showcase):
+    ids = list(showcase.cards.order_by("pk").values_list("pk", flat=True))
+    if name == "cards_bulk":
+        # самое тяжёлое действие: копия всех карточек (INSERT пачкой)
+        return {"action": "copy", "ids": ids, "target": showcase.pk}
+    if name == "data_import":
+        # правка заголовков всех карточек витрины — одним bulk_update
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(["showcase_id", "card_id", "title"])
+        writer.writerows([showcase.pk, pk, f"Карточка {pk} (ред.)"] for pk in ids)
+        return {"file": SimpleUploadedFile("cards.csv", out.getvalue().encode()), "dry_run": ""}
+    if name == "showcases_clone":
+        return {"showcases": [showcase.pk], "domains": [HOST, "xn--80aatfbqgidf6l.xn--p1ai"]}
+    if name == "cards_reorder":
+        # order_index в наборе с 1 — нормализация к 0..n-1 меняет все строки при любом n
+        return {"order": ",".join(map(str, reversed(ids)))}
+    return {}
+
+
+def use_profile_dir(cls):
+    """Временный CARDS_PROFILE_DIR на время класса тестов; удаляется после него."""
+    tmp = tempfile.TemporaryDirectory(prefix="cards-tests-profiles-")
+    cls.addClassCleanup(tmp.cleanup)
+    overrides = override_settings(CARDS_PROFILE_DIR=tmp.name)
+    overrides.enable()
+    cls.addClassCleanup(overrides.disable)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    STATIC_EXPORT_ROOT=tempfile.gettempdir() + "/cards-tests-no-export",
+)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        use_profile_dir(cls)
+        # буфер статистики не должен сбрасываться посреди замера
+        cls._buffer_limits = stats_buffer.max_pending, stats_buffer.interval
+        stats_buffer.max_pending, stats_buffer.interval = 10 ** 9, 10 ** 9
+
+    @classmethod
+    def tearDownClass(cls):
+        stats_buffer._take()
+        stats_buffer.max_pending, stats_buffer.interval = cls._buffer_limits
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("budget", password="x", is_staff=True)
+
+    def measure(self, name, pattern, prefix, size):
+        from django.core.cache import cache
+        from django.urls import reverse
+
+        showcase, logo = make_dataset(size, f"s{size}")
+        if prefix == "admin":
+            self.client.force_login(self.user)
+        else:
+            self.client.logout()
+        profile = None
+        if "name" in pattern.pattern.converters:
+            profile = self.client.get(reverse("showcases_admin"), {"_profile": "1"})["X-Profile-Id"]
+        path = reverse(name, kwargs=url_kwargs(name, pattern, showcase, logo, profile))
+        data = post_data(name, showcase)
+        cache.clear()
+        local_cache.clear()
+
+        method = self.client.post if name in POST_VIEWS else self.client.get
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            response = method(path, data, HTTP_HOST=HOST)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        self.assertLess(response.status_code, 400, f"{name} {path}: {response.status_code}")
+        return len(ctx.captured_queries), elapsed, ctx.captured_queries
+
+    def check_budget(self, name, pattern, prefix):
+        self.assertIn(name, BUDGETS, f"нет бюджета для URL {name!r}")
+        max_queries, max_seconds = BUDGETS[name]
+        counts = {}
+        for size in SIZES:
+            with self.subTest(url=name, size=size):
+                n, elapsed, queries = self.measure(name, pattern, prefix, size)
+                counts[size] = n
+                sql = "\n".join(q["sql"] for q in queries)
+                self.assertLessEqual(n, max_queries, f"{name} при n={size}: {n} запросов\n{sql}")
+                if size == SIZES[-1]:
+                    self.assertLessEqual(elapsed, max_seconds, f"{name} при n={size}: {elapsed:.3f} с")
+        self.assertEqual(len(set(counts.values())), 1, f"{name}: число запросов растёт с данными {counts}")
+
+    def test_every_url_has_budget(self):
+        names = {p.name for p in urls.urlpatterns + admin_urls.urlpatterns}
+        self.assertEqual(names - BUDGETS.keys(), set())
+        self.assertEqual(BUDGETS.keys() - names, set())
+
+
+@override_settings(CARDS_PROFILE_KEEP=2)
+class ProfilerTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        use_profile_dir(cls)
+
+    def setUp(self):
+        self.staff = get_user_model().objects.create_user("staff", password="x", is_staff=True)
+        self.user = get_user_model().objects.create_user("user", password="x")
+
+    def test_staff_request_is_profiled_and_rotated(self):
+        from cards.utils import profiling
+
+        self.client.force_login(self.staff)
+        names = [self.client.get("/admin/", {"_profile": "1"})["X-Profile-Id"] for _ in range(3)]
+        self.assertEqual([m["name"] for m in profiling.list_profiles()], names[:0:-1])
+        self.assertIsNotNone(profiling.profile_path(names[-1], ".collapsed"))
+        self.assertIn("function calls", profiling.stats_text(names[-1]))
+
+    def test_flag_ignored_for_non_staff(self):
+        self.client.force_login(self.user)
+        response = self.client.get("/admin/", {"_profile": "1"}, HTTP_X_PROFILE="1")
+        self.assertNotIn("X-Profile-Id", response)
+
+
+class LoadtestScenarioTests(TestCase):
+    def test_admin_list_pages_follow_cursor(self):
+        from cards.utils import loadtest
+
+        loadtest.seed(25, 1, 1, 0)
+        targets = loadtest.build_scenarios()["admin_list"]
+        self.assertEqual(len(targets), 3)
+        self.client.force_login(loadtest.loadtest_user())
+        pages = [[sc.pk for sc in self.client.get(t.path).context["page_obj"]] for t in targets]
+        self.assertEqual(sum(pages, []), list(Showcase.objects.order_by("-created_at", "-id")
+                                              .values_list("pk", flat=True)))
+
+
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        make_dataset(1, "t")
+
+    def test_only_staff_or_setting(self):
+        self.assertNotIn("Server-Timing", self.client.get("/", HTTP_HOST=HOST))
+        with override_settings(CARDS_SERVER_TIMING=True):
+            self.assertIn("total;dur=", self.client.get("/", HTTP_HOST=HOST)["Server-Timing"])
+        self.client.force_login(get_user_model().objects.create_user("t", password="x"))
+        self.assertNotIn("Server-Timing", self.client.get("/", HTTP_HOST=HOST))
+        self.client.force_login(get_user_model().objects.create_user("ts", password="x", is_staff=True))
+        self.assertIn("total;dur=", self.client.get("/", HTTP_HOST=HOST)["Server-Timing"])
+
+
+class MetricsAccessTests(TestCase):
+    def test_docker_network_is_not_trusted_by_default(self):
+        # за nginx в compose REMOTE_ADDR — docker-адрес nginx
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="172.18.0.3").status_code, 404)
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+
+class StatsBufferTests(TestCase):
+    def setUp(self):
+        from cards.utils.stats import StatsBuffer
+
+        self.showcase, _logo = make_dataset(2, "st")
+        self.cards = list(self.showcase.cards.order_by("pk"))
+        self.buffer = StatsBuffer(max_pending=10 ** 9, interval=10 ** 9, max_requeue=1)
+
+    def test_card_deleted_between_add_and_flush(self):
+        from cards.models import StatBucket
+
+        self.buffer.add(self.showcase.pk, [c.pk for c in self.cards], HOST, impressions=1)
+        self.cards[1].delete()
+        with self.assertLogs("cards.utils.stats", "WARNING"):
+            self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(list(StatBucket.objects.values_list("card_id", flat=True)), [self.cards[0].pk])
+        self.assertEqual(self.buffer._take(), {})
+
+    def test_requeue_is_capped(self):
+        from unittest import mock
+
+        self.buffer.add(self.showcase.pk, [c.pk for c in self.cards], HOST, impressions=1)
+        with mock.patch("cards.utils.stats.write_stats", side_effect=RuntimeError), \
+                self.assertLogs("cards.utils.stats", "ERROR"):
+            self.assertEqual(self.buffer.flush(), 0)
+        self.assertEqual(len(self.buffer._take()), 1)
+
+
+class BulkCardsTests(TestCase):
+    def setUp(self):
+        self.showcase, _logo = make_dataset(5, "b")
+        self.target = Showcase.objects.create(name="target", slug="target", extra_params="aff_id=2")
+        self.client.force_login(get_user_model().objects.create_user("bulk", password="x", is_staff=True))
+        self.ids = list(self.showcase.cards.order_by("order_index").values_list("pk", flat=True))
+
+    def test_reorder_keeps_cards_outside_the_page(self):
+        from django.urls import reverse
+
+        page = self.ids[1:3]
+        self.client.post(reverse("cards_reorder", kwargs={"pk": self.showcase.pk}),
+                         {"order": f"{page[1]},{page[0]}"})
+        order = list(self.showcase.cards.order_by("order_index").values_list("pk", flat=True))
+        self.assertEqual(order, [self.ids[0], page[1], page[0], *self.ids[3:]])
+
+    def test_move_recomputes_links(self):
+        from django.urls import reverse
+
+        self.client.post(reverse("cards_bulk", kwargs={"pk": self.showcase.pk}),
+                         {"action": "move", "ids": self.ids[:2], "target": self.target.pk})
+        moved = Card.objects.filter(pk__in=self.ids[:2])
+        self.assertEqual({c.showcase_id for c in moved}, {self.target.pk})
+        self.assertEqual({c.full_btn_url for c in moved}, {"https://partner.example/apply?aff_id=2"})
+        self.assertEqual(self.showcase.cards.count(), 3)
+
+    def test_move_keeps_card_stats(self):
+        from django.urls import reverse
+
+        from cards.utils.stats import StatsBuffer, card_stats
+
+        buffer = StatsBuffer(max_pending=10 ** 9, interval=10 ** 9)
+        buffer.add(self.showcase.pk, self.ids[:1], HOST, impressions=1)
+        buffer.add(self.showcase.pk, self.ids[:1], HOST, clicks=1)
+        buffer.flush()
+        self.client.post(reverse("cards_bulk", kwargs={"pk": self.showcase.pk}),
+                         {"action": "move", "ids": self.ids[:1], "target": self.target.pk})
+        self.assertEqual(card_stats(self.target.pk),
+                         {self.ids[0]: {"impressions": 1, "clicks": 1, "ctr": 100.0}})
+        self.assertNotIn(self.ids[0], card_stats(self.showcase.pk))
+
+
+class CloneShowcasesTests(TestCase):
+    def setUp(self):
+        self.showcase, _logo = make_dataset(3, "c")
+
+    def test_clone_resolves_slug_collisions(self):
+        from cards.utils.bulk import clone_showcases
+
+        other = "xn--80aatfbqgidf6l.xn--p1ai"
+        first = clone_showcases([self.showcase], [HOST, other])
+        second = clone_showcases([self.showcase], [HOST])
+        self.assertEqual([c.slug for c in first], ["c-0-2", "c-0"])
+        self.assertEqual([c.slug for c in second], ["c-0-3"])
+        self.assertEqual(set(first[1].domain_rows.values_list("host", flat=True)), {other})
+        self.assertEqual(first[1].cards.count(), 3)
+
+    def test_duplicate_twice(self):
+        from cards.utils.bulk import clone_showcases
+
+        slugs = [clone_showcases([self.showcase], slug_suffix="-copy")[0].slug for _ in range(2)]
+        self.assertEqual(slugs, ["c-0-copy", "c-0-copy-2"])
+
+
+class DataIOTests(TestCase):
+    def setUp(self):
+        self.showcase, self.logo = make_dataset(3, "d")
+
+    def export(self, fmt):
+        from cards.utils import dataio
+
+        text = "".join(dataio.stream_csv() if fmt == "csv" else dataio.stream_json())
+        return list(dataio.read_rows(io.StringIO(text.lstrip("\ufeff")), fmt))
+
+    def test_round_trip_has_no_changes(self):
+        from cards.utils import dataio
+
+        for fmt in ("csv", "json"):
+            plan = dataio.plan_import(self.export(fmt))
+            self.assertEqual((plan.errors, plan.diff), ([], []), fmt)
+
+    def test_import_updates_and_creates(self):
+        from cards.utils import dataio
+
+        rows = self.export("csv")
+        rows[0]["price"] = "777"
+        rows.append({**rows[0], "card_id": "", "title": "Новая", "_line": "строка X"})
+        plan = dataio.plan_import(rows)
+        self.assertTrue(plan.ok, plan.errors)
+        self.assertEqual((len(plan.changed_cards), len(plan.new_cards)), (1, 1))
+        dataio.apply_import(plan)
+        self.assertEqual(Card.objects.get(pk=rows[0]["card_id"]).price, 777)
+        self.assertEqual(self.showcase.cards.filter(title="Новая").count(), 1)
+
+    def test_async_export_matches_sync(self):
+        from asgiref.sync import async_to_sync
+
+        from cards.utils import dataio
+
+        async def collect():
+            return "".join([chunk async for chunk in dataio.aiter_chunks(dataio.stream_csv(), batch=2)])
+
+        self.assertEqual(async_to_sync(collect)(), "".join(dataio.stream_csv()))
+
+    def test_upload_with_multiline_field(self):
+        from django.urls import reverse
+
+        from cards.utils import dataio
+
+        self.showcase.cards.update(fine_print="первая строка\r\nвторая строка")
+        body = "".join(dataio.stream_csv()).encode()
+        self.client.force_login(get_user_model().objects.create_user("io", password="x", is_staff=True))
+        response = self.client.post(reverse("data_import"),
+                                    {"file": SimpleUploadedFile("cards.csv", body), "dry_run": "1"})
+        plan = response.context["plan"]
+        self.assertEqual((plan.errors, plan.diff), ([], []))
+
+    def test_invalid_rows_are_reported(self):
+        from cards.utils import dataio
+
+        rows = self.export("csv")
+        rows[0]["btn_url"] = "not a url"
+        rows[1]["logo_name"], rows[1]["logo_id"] = "нет такого", ""
+        plan = dataio.plan_import(rows)
+        self.assertEqual(len(plan.errors), 2, plan.errors)
+
+
+class StaticExportTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        overrides = override_settings(STATIC_EXPORT_ROOT=self.root.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.showcase, _logo = make_dataset(2, "e")
+        self.page = Path(self.root.name, HOST, self.showcase.slug, "index.html")
+
+    def test_edit_is_reexported(self):
+        from unittest import mock
+
+        from cards.utils import export
+
+        export.export_all(Path(self.root.name))
+        self.assertIn("Карточка 0", self.page.read_text())
+        card = self.showcase.cards.get(title="Карточка 0")
+        card.title = "Новый заголовок"
+        with mock.patch.object(export.scheduler, "delay", 3600), \
+                self.captureOnCommitCallbacks(execute=True):
+            card.save()
+        self.assertFalse(self.page.exists())  # до перерисовки страницу отдаёт Django
+        export.scheduler._timer.cancel()
+        export.scheduler.run()
+        self.assertIn("Новый заголовок", self.page.read_text())
+
+    def test_clone_is_exported(self):
+        from unittest import mock
+
+        from cards.utils import export
+        from cards.utils.bulk import clone_showcases
+
+        other = "xn--80aatfbqgidf6l.xn--p1ai"
+        export.export_all(Path(self.root.name))
+        with mock.patch.object(export.scheduler, "delay", 3600), \
+                self.captureOnCommitCallbacks(execute=True):
+            clone, = clone_showcases([self.showcase], [other])
+        export.scheduler._timer.cancel()
+        export.scheduler.run()
+        self.assertIn("Карточка 0", Path(self.root.name, other, clone.slug, "index.html").read_text())
+
+    def test_beacon_counts_impressions(self):
+        import re
+
+        from django.urls import reverse
+
+        from cards.utils import export
+
+        export.export_all(Path(self.root.name))
+        src = re.search(rf'<img src="({reverse("impression")}[^"]+)"', self.page.read_text()).group(1)
+        stats_buffer._take()
+        self.assertEqual(self.client.get(src.replace("&amp;", "&"), HTTP_HOST=HOST).status_code, 204)
+        self.assertEqual({key[1] for key in stats_buffer._take()},
+                         set(self.showcase.cards.values_list("pk", flat=True)))
+        self.client.get(reverse("impression"), {"t": "forged"}, HTTP_HOST=HOST)
+        self.assertEqual(stats_buffer._take(), {})
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        Showcase.objects.bulk_create([
+            Showcase(name="Микрозаймы онлайн", slug="zaimy-online", domains=HOST),
+            Showcase(name="Кредитные карты", slug="cards", domains=HOST),
+        ])
+        Logo.objects.bulk_create([Logo(name="Тинькофф"), Logo(name="Ёлка Банк"), Logo(name="Альфа")])
+
+    def names(self, model, q):
+        from cards.utils import search
+
+        return [obj.name for obj in search.search(model, q, 10)]
+
+    def test_translit_and_yo(self):
+        self.assertEqual(self.names(Showcase, "займ"), ["Микрозаймы онлайн"])
+        self.assertEqual(self.names(Showcase, "ZAIMY"), ["Микрозаймы онлайн"])
+        self.assertEqual(self.names(Logo, "елка"), ["Ёлка Банк"])
+
+    def test_typo_is_found(self):
+        self.assertEqual(self.names(Logo, "тинькоф банк"), ["Тинькофф"])
+
+    def test_index_follows_bulk_update(self):
+        Logo.objects.filter(name="Альфа").update(name="Сбер")
+        self.assertEqual(self.names(Logo, "сбер"), ["Сбер"])
+        self.assertEqual(self.names(Logo, "альф"), [])
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.showcase, _logo = make_dataset(7, "p")
+        # одинаковый order_index у соседей — порядок добирается по id
+        Card.objects.filter(showcase=self.showcase, order_index__in=(3, 4)).update(order_index=3)
+        self.expected = list(self.showcase.cards.order_by("order_index", "id").values_list("pk", flat=True))
+
+    def walk(self, cursor, attr):
+        from cards.utils.pagination import paginate
+
+        pages = []
+        while True:
+            page = paginate(self.showcase.cards.all(), ("order_index", "id"), 3, cursor)
+            pages.append([c.pk for c in page])
+            cursor = getattr(page, attr)
+            if cursor is None:
+                return pages, page
+
+    def test_forward_and_back(self):
+        pages, last = self.walk(None, "next_cursor")
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertEqual([len(p) for p in pages], [3, 3, 1])
+        back, first = self.walk(last.prev_cursor, "prev_cursor")
+        self.assertEqual(sum(reversed(back), []), self.expected[:6])
+        self.assertIsNotNone(first.next_cursor)
+
+    def test_bad_cursor_gives_first_page(self):
+        from cards.utils.pagination import encode_cursor, paginate
+
+        foreign = encode_cursor(Logo, ("-id",), "n", Logo.objects.first())
+        for cursor in ("garbage", foreign):
+            page = paginate(self.showcase.cards.all(), ("order_index", "id"), 3, cursor)
+            self.assertEqual([c.pk for c in page], self.expected[:3])
+
+    def test_logos_search_scroll(self):
+        self.client.force_login(get_user_model().objects.create_user("p", password="x", is_staff=True))
+        from django.urls import reverse
+
+        Logo.objects.bulk_create([Logo(name=f"extra-{i:02}") for i in range(30)])
+        seen, cursor = [], None
+        while True:
+            data = self.client.get(reverse("logos_search"), {"cursor": cursor} if cursor else {}).json()
+            seen += [r["text"] for r in data["results"]]
+            cursor = data["pagination"]["cursor"]
+            if not data["pagination"]["more"]:
+                break
+        self.assertEqual(seen, list(Logo.objects.order_by("name", "id").values_list("name", flat=True)))
+
+
+class LogoMediaTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        overrides = override_settings(MEDIA_ROOT=self.media.name, LOGO_VARIANT_FORMATS=("webp",))
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def upload(self, name):
+        from PIL import Image
+
+        from cards.forms import LogoForm
+
+        buf = io.BytesIO()
+        Image.new("RGB", (200, 80), "#5A7BFF").save(buf, format="PNG")
+        form = LogoForm({"name": name}, {"image": SimpleUploadedFile(f"{name}.png", buf.getvalue())})
+        self.assertTrue(form.is_valid(), form.errors)
+        return form.save()
+
+    def files(self):
+        return sorted(str(p.relative_to(self.media.name)) for p in Path(self.media.name).rglob("*") if p.is_file())
+
+    def test_duplicate_upload_reuses_logo(self):
+        first, second = self.upload("a"), self.upload("b")
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(first.image.name, f"logos/{first.sha256}.png")
+        self.assertEqual(len(self.files()), 1 + len(first.variants))
+
+    def test_rebuild_keeps_files_shared_with_another_logo(self):
+        first = self.upload("a")
+        second = Logo.objects.create(name="b", image=first.image.name, sha256=first.sha256,
+                                     variants=first.variants)
+        with override_settings(LOGO_VARIANT_WIDTHS=(80,)):
+            first.build_variants()
+        self.assertLess(len(first.variants), len(second.variants))
+        for v in second.variants:
+            self.assertTrue(Path(self.media.name, v["name"]).exists(), v["name"])
+
+    def test_loadtest_seed_with_logos(self):
+        from django.core.management import call_command
+
+        call_command("loadtest_seed", "--showcases=2", "--cards=2", "--domains=1", "--logos=2",
+                     stdout=io.StringIO())
+        logos = list(Logo.objects.filter(name__startswith="lt-"))
+        self.assertEqual(len(logos), 2)
+        for logo in logos:
+            self.assertEqual(logo.image.name, f"logos/{logo.sha256}.png")
+            self.assertEqual((logo.width, logo.height), (320, 120))
+            self.assertTrue(Path(self.media.name, logo.image.name).exists())
+
+    def test_gc_removes_only_orphans(self):
+        from django.core.management import call_command
+
+        logo = self.upload("a")
+        orphan = Path(self.media.name, "logos", "old.png")
+        orphan.write_bytes(b"x")
+        before = self.files()
+
+        out = io.StringIO()
+        call_command("gc_media", "--dry-run", "--min-age=0", stdout=out)
+        self.assertIn("logos/old.png", out.getvalue())
+        self.assertEqual(self.files(), before)
+
+        call_command("gc_media", "--min-age=0", stdout=io.StringIO())
+        self.assertEqual(self.files(), sorted([logo.image.name, *(v["name"] for v in logo.variants)]))
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class LogoIndexTests(TestCase):
+    def setUp(self):
+        from django.urls import reverse
+
+        self.showcase, self.logo = make_dataset(3, "i")
+        self.client.force_login(get_user_model().objects.create_user("i", password="x", is_staff=True))
+        self.url = reverse("logos_index")
+
+    def test_etag_and_rebuild_on_logo_change(self):
+        first = self.client.get(self.url)
+        names = [row[1] for row in first.json()["logos"]]
+        self.assertEqual(names, ["i-logo-0", "i-logo-1", "i-logo-2"])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Logo.objects.create(name="a-new", image="logos/new.png")
+        second = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()["logos"][0][1], "a-new")
+
+    def test_versioned_url_is_immutable(self):
+        from cards.utils.logoindex import index_version
+
+        response = self.client.get(self.url, {"v": index_version()})
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn("no-cache", self.client.get(self.url)["Cache-Control"])
+
+    def test_card_form_renders_only_selected_logo(self):
+        from cards.forms import CardForm
+
+        card = self.showcase.cards.select_related("logo").first()
+        with self.assertNumQueries(0):
+            html = str(CardForm(instance=card, showcase=self.showcase)["logo"])
+        self.assertEqual(html.count("<option"), 2)
+        self.assertIn(card.logo.name, html)
+
+        other = Logo.objects.exclude(pk=card.logo_id).first()
+        form = CardForm({"title": "x", "price": 1, "logo": other.pk, "order_index": 0,
+                         "showcase": self.showcase.pk}, instance=card, showcase=self.showcase)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data["logo"], other)
+
+
+@override_settings(
+    CARDS_DB_REPLICAS=["replica1"],
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+)
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()  # отметка о последней записи от соседних тестов
+
+    def request(self, method="get", view="index", **extra):
+        """Проходит ReplicaMiddleware; возвращает ответ, в теле — алиас БД для чтения Showcase."""
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from django.urls import ResolverMatch
+
+        from cards.middleware import ReplicaMiddleware
+        from cards.routers import ReplicaRouter
+
+        def view_func(request):
+            middleware.process_view(request, None, (), {})
+            return HttpResponse(ReplicaRouter().db_for_read(Showcase))
+
+        middleware = ReplicaMiddleware(view_func)
+        request = getattr(RequestFactory(), method)("/", **extra)
+        request.resolver_match = ResolverMatch(view_func, (), {}, url_name=view)
+        return middleware(request)
+
+    def test_public_reads_go_to_replica(self):
+        from cards.routers import ReplicaRouter
+
+        self.assertEqual(self.request().content, b"replica1")
+        self.assertEqual(self.request(view="showcases_admin").content, b"default")
+        self.assertEqual(ReplicaRouter().db_for_read(Showcase), "default")  # вне запроса
+        self.assertEqual(ReplicaRouter().db_for_write(Showcase), "default")
+
+    def test_read_your_writes(self):
+        from cards.middleware import STICKY_COOKIE
+        from cards.utils.cache import bump_version
+
+        response = self.request(method="post", view="card_toggle")
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        self.assertEqual(self.request(HTTP_COOKIE=f"{STICKY_COOKIE}=1").content, b"default")
+        # сразу после правки контента реплика могла не догнать primary
+        bump_version()
+        self.assertEqual(self.request().content, b"default")
+
+    def test_stats_flush_reads_primary(self):
+        from django.core.management import call_command
+
+        from cards.routers import ReplicaRouter, allow_replica, begin_request, end_request
+        from cards.utils.stats import StatsBuffer
+
+        showcase, _ = make_dataset(1, "rr")
+        card = showcase.cards.first()
+        buffer = StatsBuffer(max_pending=10 ** 9, interval=10 ** 9)
+        buffer.add(showcase.pk, [card.pk], "example.com", clicks=1, flush=False)
+        token = begin_request()
+        try:
+            allow_replica()  # flush из запроса публички
+            # алиаса replica1 в тестовой DATABASES нет: чтение с реплики упало бы
+            self.assertEqual(buffer.flush(), 1)
+            call_command("compact_stats", hours=0, stdout=io.StringIO())
+            self.assertEqual(ReplicaRouter().db_for_read(Showcase), "replica1")
+        finally:
+            end_request(token)
+        card.refresh_from_db()
+        self.assertEqual(card.clicks, 1)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CacheVersionTests(TestCase):
+    def setUp(self):
+        self.showcase, self.logo = make_dataset(1, "v")
+        self.card = self.showcase.cards.first()
+
+    def assertBumps(self, action):
+        from cards.utils.cache import content_version
+
+        before = content_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            action()
+        self.assertNotEqual(content_version(), before)
+
+    def test_save_and_delete_bump_version(self):
+        for obj in (self.card, self.showcase, self.logo):
+            with self.subTest(model=type(obj).__name__):
+                self.assertBumps(obj.save)
+        for obj in (self.card, self.logo, self.showcase):
+            with self.subTest(model=type(obj).__name__, action="delete"):
+                self.assertBumps(obj.delete)
+
+    def test_cached_lookup_is_rebuilt_after_bump(self):
+        from cards.utils.cache import bump_version, get_or_build
+
+        calls = []
+
+        def build():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual([get_or_build("t", build), get_or_build("t", build)], [1, 1])
+        bump_version()
+        self.assertEqual(get_or_build("t", build), 2)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class PageCacheTests(TestCase):
+    def setUp(self):
+        from unittest import mock
+
+        from django.core.cache import cache
+
+        cache.clear()
+        local_cache.clear()
+        self.showcase, _logo = make_dataset(2, "pc")
+        self.url = f"/{self.showcase.slug}/"
+        patcher = mock.patch("cards.views.record_impressions")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_utm_params_share_one_entry(self):
+        first = self.client.get(self.url, {"utm_source": "a"}, HTTP_HOST=HOST)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url, {"utm_source": "b", "utm_campaign": "c"}, HTTP_HOST=HOST)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first["ETag"], second["ETag"])
+
+    def test_encoding_negotiation(self):
+        import gzip
+
+        from cards.utils.pagecache import brotli
+
+        plain = self.client.get(self.url, HTTP_HOST=HOST)
+        self.assertNotIn("Content-Encoding", plain)
+        gz = self.client.get(self.url, HTTP_HOST=HOST, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(gz["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(gz.content), plain.content)
+        no_br = self.client.get(self.url, HTTP_HOST=HOST, HTTP_ACCEPT_ENCODING="br;q=0, gzip")
+        self.assertEqual(no_br["Content-Encoding"], "gzip")
+        if brotli is not None:  # brotli — необязательная зависимость
+            br = self.client.get(self.url, HTTP_HOST=HOST, HTTP_ACCEPT_ENCODING="gzip, br")
+            self.assertEqual(br["Content-Encoding"], "br")
+            self.assertEqual(brotli.decompress(br.content), plain.content)
+        for response in (plain, gz, no_br):
+            self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(self.client.get(self.url, HTTP_HOST=HOST,
+                                         HTTP_IF_NONE_MATCH=plain["ETag"]).status_code, 304)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CardGoTests(TestCase):
+    def setUp(self):
+        from unittest import mock
+
+        from django.core.cache import cache
+
+        cache.clear()
+        local_cache.clear()
+        self.showcase, _logo = make_dataset(2, "go")
+        self.card = self.showcase.cards.order_by("pk").first()
+        for attr in ("max_pending", "interval"):
+            patcher = mock.patch.object(stats_buffer, attr, 10 ** 9)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        stats_buffer._take()
+        self.addCleanup(stats_buffer._take)
+
+    def test_redirect_and_buffered_click(self):
+        from django.urls import reverse
+
+        url = reverse("card_go", args=[self.card.pk])
+        for _ in range(2):
+            response = self.client.get(url, HTTP_HOST=HOST)
+            self.assertRedirects(response, self.card.full_btn_url, fetch_redirect_response=False)
+        self.assertEqual(Card.objects.get(pk=self.card.pk).clicks, 0)  # пока только в буфере
+        counts = stats_buffer._take()
+        self.assertEqual([(key[:3], value) for key, value in counts.items()],
+                         [((self.showcase.pk, self.card.pk, HOST), [0, 2])])
+
+    def test_inactive_card_is_404(self):
+        from django.urls import reverse
+
+        Card.objects.filter(pk=self.card.pk).update(active=False)
+        self.assertEqual(self.client.get(reverse("card_go", args=[self.card.pk])).status_code, 404)
+        self.assertEqual(stats_buffer._take(), {})
+
+
+class LogoImgTagTests(TestCase):
+    def render(self, logo):
+        from django.template import Context, Template
+
+        return Template('{% load cards_media %}{% logo_img logo sizes="80px" %}').render(Context({"logo": logo}))
+
+    def test_variants_give_srcset_and_picture(self):
+        variants = [{"w": w, "fmt": fmt, "name": f"logos/variants/x-{w}.{fmt}"}
+                    for fmt in ("webp", "avif") for w in (160, 80)]
+        html = self.render(Logo(name="Банк", image="logos/x.png", width=320, height=120, variants=variants))
+        self.assertTrue(html.startswith('<picture style="display:contents"><source type="image/avif"'))
+        self.assertIn('srcset="/media/logos/variants/x-80.webp 80w, /media/logos/variants/x-160.webp 160w"', html)
+        self.assertIn('srcset="/media/logos/variants/x-80.avif 80w, /media/logos/variants/x-160.avif 160w"', html)
+        self.assertIn('sizes="80px"', html)
+        self.assertIn('width="320" height="120"', html)
+
+    def test_without_variants_plain_img(self):
+        html = self.render(Logo(name="Банк", image="logos/x.png"))
+        self.assertEqual(html, '<img src="/media/logos/x.png" alt="Банк" loading="lazy" decoding="async">')
+        self.assertEqual(self.render(Logo(name="пусто")), "")
+
+
+class CompressedStorageTests(TestCase):
+    def test_post_process_writes_compressed_siblings(self):
+        from cards.storage import CompressedManifestStaticFilesStorage, brotli
+
+        with tempfile.TemporaryDirectory() as root:
+            storage = CompressedManifestStaticFilesStorage(location=root, base_url="/static/")
+            files = {"css/site.css": b"body { color: #333; }\n" * 40, "css/tiny.css": b"a{}",
+                     "img/x.png": b"\x89PNG" + b"\0" * 1000}
+            for name, data in files.items():
+                Path(root, name).parent.mkdir(parents=True, exist_ok=True)
+                Path(root, name).write_bytes(data)
+            list(storage.post_process({name: (storage, name) for name in files}))
+
+            hashed = storage.stored_name("css/site.css")
+            self.assertNotEqual(hashed, "css/site.css")
+            suffixes = [".gz", ".br"] if brotli is not None else [".gz"]
+            for name in ("css/site.css", hashed):
+                for suffix in suffixes:
+                    self.assertTrue(Path(root, name + suffix).exists(), name + suffix)
+            # мелкие и уже сжатые файлы не трогаем
+            written = {p.name for p in Path(root).rglob("*") if p.suffix in (".gz", ".br")}
+            self.assertFalse({n for n in written if n.startswith(("tiny", "x."))})
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class AsyncViewsTests(TestCase):
+    def setUp(self):
+        from unittest import mock
+
+        self.showcase, _logo = make_dataset(3, "as")
+        Showcase.objects.filter(pk=self.showcase.pk).update(slug="main")
+        self.user = get_user_model().objects.create_user("as", password="x", is_staff=True)
+        for name in ("record_impressions", "arecord_impressions"):
+            patcher = mock.patch(f"cards.views.{name}")
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def both(self, name, path, *args, **params):
+        """Ответы sync- и async-версии вьюхи на один и тот же запрос, каждый — на холодном кэше."""
+        from asgiref.sync import async_to_sync
+        from django.core.cache import cache
+        from django.test import RequestFactory
+
+        from cards import views
+
+        async def auser():
+            return self.user
+
+        responses = []
+        for view in (getattr(views, name), async_to_sync(getattr(views, f"{name}_async"))):
+            cache.clear()
+            local_cache.clear()
+            request = RequestFactory().get(path, params, HTTP_HOST=HOST)
+            request.user, request.auser = self.user, auser
+            responses.append(view(request, *args))
+        return responses
+
+    def test_same_responses(self):
+        sync, async_ = self.both("index", "/")
+        self.assertEqual((sync.status_code, sync["Location"]), (async_.status_code, async_["Location"]))
+        sync, async_ = self.both("showcase_detail", "/main/", "main")
+        self.assertEqual(sync.status_code, 200)
+        self.assertEqual(sync.content, async_.content)
+        for name, params in (("showcases_suggest", {"q": "as"}), ("logos_search", {"q": "as-logo"})):
+            with self.subTest(view=name):
+                sync, async_ = self.both(name, "/x/", **params)
+                self.assertEqual(sync.content, async_.content)
+                self.assertIn(b'"results": [{', sync.content)
+
+
+class CardUrlTests(TestCase):
+    def setUp(self):
+        self.showcase, _logo = make_dataset(2, "u")
+
+    def test_save_without_url_change_skips_showcase(self):
+        card = Card.objects.get(pk=self.showcase.cards.first().pk)
+        card.active = False
+        with self.assertNumQueries(1):
+            card.save()
+        card.btn_url = "https://other.example/go"
+        card.save()
+        self.assertEqual(Card.objects.get(pk=card.pk).full_btn_url, "https://other.example/go?aff_id=1")
+
+    def test_extra_params_change_recomputes_all_cards(self):
+        sc = Showcase.objects.get(pk=self.showcase.pk)
+        sc.extra_params = "aff_id=9&sub=x"
+        sc.save()
+        self.assertEqual(set(sc.cards.values_list("full_btn_url", flat=True)),
+                         {"https://partner.example/apply?aff_id=9&sub=x"})
+
+
+class DomainRoutingTests(TestCase):
+    def test_any_save_syncs_domain_rows(self):
+        other = "xn--80aatfbqgidf6l.xn--p1ai"
+        sc = Showcase.objects.create(name="r", slug="r", domains="сподручно.рф")
+        self.assertEqual(list(sc.domain_rows.values_list("host", flat=True)), [HOST])
+
+        sc = Showcase.objects.get(pk=sc.pk)
+        sc.domains = other
+        sc.save()
+        self.assertEqual(list(sc.domain_rows.values_list("host", flat=True)), [other])
+        with self.assertNumQueries(1):  # домены не менялись — только UPDATE витрины
+            sc.save(update_fields=["name"])
+
+
+class HostNormalizationTests(TestCase):
+    def test_repeat_host_is_a_cache_hit(self):
+        from cards.utils.host import HostCache
+
+        cache = HostCache(maxsize=2)
+        self.assertEqual(cache.get("Сподручно.РФ"), (HOST, "сподручно.рф"))
+        self.assertEqual(cache.get("Сподручно.РФ"), (HOST, "сподручно.рф"))
+        self.assertEqual(cache.get("bad..host"), ("bad..host", "bad..host"))
+        cache.get("example.com")
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 3, "size": 2})
+
+    def test_showcase_domains(self):
+        sc = Showcase(domains=f"сподручно.рф, {HOST}\nexample.com")
+        self.assertEqual(sc.domains_ascii_set(), {HOST, "example.com"})
+        self.assertEqual(sc.domains_list(), ["сподручно.рф", "сподручно.рф", "example.com"])
+        self.assertTrue(sc.matches_host("СПОДРУЧНО.РФ"))
+        self.assertFalse(sc.matches_host("example.org"))
+
+
+class ThemeRegistryTests(TestCase):
+    def test_theme_without_index_is_reported(self):
+        from cards.utils import themes
+
+        with tempfile.TemporaryDirectory() as root:
+            (Path(root) / "broken").mkdir()
+            registry = themes.ThemeRegistry(root)
+            registry.reload()
+            self.assertEqual(registry.choices(), [("", themes.DEFAULT_LABEL)])
+            self.assertEqual(registry.problems, [("broken", "нет index.html")])
+
+    def test_broken_templates_are_skipped(self):
+        from django.conf import settings
+
+        from cards.utils import themes
+
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp) / "themes"
+            for name, source in (("badload", "{% load no_such_tags %}"), ("ok", "ok")):
+                (root / name).mkdir(parents=True)
+                (root / name / "index.html").write_text(source)
+            registry = themes.ThemeRegistry(root)
+            # загрузчик не видит каталог: TemplateDoesNotExist для обеих тем
+            with self.assertLogs(themes.log, "WARNING"):
+                registry.reload()
+            self.assertEqual([name for name, _ in registry.problems], ["badload", "ok"])
+            self.assertIn("шаблон не найден", registry.problems[0][1])
+
+            templates = [{**settings.TEMPLATES[0], "DIRS": [tmp]}]
+            with override_settings(TEMPLATES=templates):
+                registry.reload()
+            self.assertEqual(registry.names(), ["ok"])
+            self.assertEqual([name for name, _ in registry.problems], ["badload"])
+            self.assertIn("ошибка в шаблоне", registry.problems[0][1])
+
+    def test_unknown_theme_falls_back_to_default(self):
+        self.assertEqual(Showcase(template="loanpath").theme_template, "themes/loanpath/index.html")
+        self.assertEqual(Showcase(template="missing").theme_template, "index.html")
+
+
+def _make_test(name, pattern, prefix):
+    def test(self):
+        self.check_budget(name, pattern, prefix)
+    test.__name__ = f"test_{name}"
+    return test
+
+
+for _prefix, _patterns in (("public", urls.urlpatterns), ("admin", admin_urls.urlpatterns)):
+    for _pattern in _patterns:
+        setattr(QueryBudgetTests, f"test_{_pattern.name}", _make_test(_pattern.name, _pattern, _prefix))
@@ -1,7 +1,17 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# под ASGI (SERVER_PROFILE=uvicorn) публичные страницы обслуживают async-версии
+if settings.CARDS_ASYNC_VIEWS:
+    index, showcase_detail = views.index_async, views.showcase_detail_async
+else:
+    index, showcase_detail = views.index, views.showcase_detail
+
 urlpatterns = [
-    path("", views.index, name="index"),
-    path("<slug:slug>/", views.showcase_detail, name="showcase_detail"),
+    path("", index, name="index"),
+    path("go/<int:card_id>/", views.card_go, name="card_go"),
+    path("metrics", views.metrics, name="metrics"),  # без слэша — не пересекается с <slug>/
+    path("imp", views.impression, name="impression"),  # маяк показа страниц из статического экспорта
+    path("<slug:slug>/", showcase_detail, name="showcase_detail"),
 ]
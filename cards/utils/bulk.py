@@ -0,0 +1,182 @@
+# cards/utils/bulk.py
+"""
+Массовые операции админки: над карточками витрины (cards_bulk, cards_reorder)
+и клонирование витрин на домены (showcases_clone, showcase_duplicate).
+
+Всё пишется пачкой — update()/bulk_update()/bulk_create() в одной транзакции.
+Эти методы не зовут save() и post_save, поэтому:
+- full_btn_url считается здесь же (по extra_params витрины-получателя);
+- кэш публички и статический экспорт сбрасываются один раз после коммита (_invalidate),
+  затронутые витрины экспорт перерисовывает в фоне (export.changed).
+Удаление идёт через QuerySet.delete(): каскад на StatBucket и сигналы post_delete
+Django отрабатывает сам.
+"""
+import operator
+from collections import defaultdict
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Q
+
+from cards.models import Card, Showcase, ShowcaseDomain
+from . import export
+from .cache import bump_version
+
+ACTIONS = ("activate", "deactivate", "delete", "move", "copy")
+SLUG_MAX = Showcase._meta.get_field("slug").max_length
+
+
+def _invalidate(*showcase_ids):
+    transaction.on_commit(bump_version)
+    if export.is_enabled():
+        ids = set(showcase_ids)
+        transaction.on_commit(lambda: export.changed(ids))
+
+
+def set_active(showcase, ids, active):
+    """Включает/выключает выбранные карточки одним UPDATE; возвращает их число."""
+    with transaction.atomic():
+        n = Card.objects.filter(showcase=showcase, pk__in=ids).exclude(active=active).update(active=active)
+        if n:
+            _invalidate(showcase.pk)
+    return n
+
+
+def delete(showcase, ids):
+    with transaction.atomic():
+        _total, per_model = Card.objects.filter(showcase=showcase, pk__in=ids).delete()
+    return per_model.get(Card._meta.label, 0)
+
+
+def reorder(showcase, ordered_ids):
+    """
+    Переставляет карточки в порядке ordered_ids (обычно — одна страница списка).
+    Остальные карточки витрины остаются на своих местах; order_index
+    всей витрины нормализуется в 0..n-1, записываются только изменившиеся.
+    """
+    with transaction.atomic():
+        cards = list(
+            Card.objects.select_for_update()
+            .filter(showcase=showcase).only("pk", "order_index").order_by("order_index", "id")
+        )
+        by_pk = {c.pk: c for c in cards}
+        moved = [by_pk[pk] for pk in dict.fromkeys(ordered_ids) if pk in by_pk]
+        # места, которые занимали переставляемые карточки, заполняются в новом порядке
+        slots = iter(moved)
+        moved_pks = {c.pk for c in moved}
+        sequence = [next(slots) if c.pk in moved_pks else c for c in cards]
+
+        changed = []
+        for i, card in enumerate(sequence):
+            if card.order_index != i:
+                card.order_index = i
+                changed.append(card)
+        if changed:
+            Card.objects.bulk_update(changed, ["order_index"], batch_size=500)
+            _invalidate(showcase.pk)
+    return len(changed)
+
+
+def transfer(showcase, ids, target, copy=False):
+    """
+    Переносит (или копирует) выбранные карточки в витрину target, в конец её списка.
+    Ссылки пересчитываются под extra_params target; возвращает число карточек.
+    """
+    with transaction.atomic():
+        cards = list(Card.objects.filter(showcase=showcase, pk__in=ids).order_by("order_index", "id"))
+        if not cards or (target.pk == showcase.pk and not copy):
+            return 0
+        last = (Card.objects.filter(showcase=target).order_by("-order_index")
+                .values_list("order_index", flat=True).first())
+        start = 0 if last is None else last + 1
+        for i, c in enumerate(cards):
+            c.showcase = target
+            c.order_index = start + i
+            c.full_btn_url = c.compute_full_btn_url(target.extra_params)
+        if copy:
+            for c in cards:
+                c.pk = None
+                c.clicks = 0
+            Card.objects.bulk_create(cards)
+            _invalidate(target.pk)
+        else:
+            Card.objects.bulk_update(cards, ["showcase", "order_index", "full_btn_url"], batch_size=500)
+            _invalidate(showcase.pk, target.pk)
+    return len(cards)
+
+
+def _free_slug(base, domains, hosts, taken_text, taken_hosts):
+    """Первый свободный из base, base-2, base-3…; занятое сразу помечается."""
+    n = 1
+    while True:
+        slug = base if n == 1 else f"{base[:SLUG_MAX - len(str(n)) - 1]}-{n}"
+        if (domains, slug) not in taken_text and not any((h, slug) in taken_hosts for h in hosts):
+            taken_text.add((domains, slug))
+            taken_hosts.update((h, slug) for h in hosts)
+            return slug
+        n += 1
+
+
+def clone_showcases(sources, hosts=None, slug_suffix=""):
+    """
+    Копирует витрины вместе с карточками одной транзакцией, всё — bulk_create.
+    hosts=None — по копии каждой витрины на её же доменах (кнопка «Дублировать»);
+    иначе — по копии каждой витрины на каждый домен из hosts (punycode).
+    Занятые slug'и выбираются одним запросом: копия получает первый свободный
+    из base, base-2, base-3… — ни uniq_showcase_per_domain, ни пара (домен, slug)
+    в роутинге не пересекаются с существующими витринами.
+    Возвращает список новых витрин.
+    """
+    plan = []  # (источник, поле domains копии, её домены, базовый slug)
+    for src in sources:
+        base = f"{src.slug}{slug_suffix}" if src.slug else src.slug
+        if hosts is None:
+            plan.append((src, src.domains, src.domains_ascii_set(), base))
+        else:
+            plan.extend((src, h, {h}, base) for h in hosts)
+    if not plan:
+        return []
+
+    with transaction.atomic():
+        taken_text, taken_hosts = set(), set()
+        prefixes = {base[:SLUG_MAX - 4] for *_, base in plan if base}
+        if prefixes:
+            cond = reduce(operator.or_, (Q(slug__startswith=p) for p in prefixes))
+            for sc in Showcase.objects.filter(cond).only("slug", "domains"):
+                taken_text.add((sc.domains, sc.slug))
+                taken_hosts.update((h, sc.slug) for h in sc.domains_ascii_set())
+
+        clones = [
+            Showcase(
+                name=src.name,
+                slug=_free_slug(base, domains, clone_hosts, taken_text, taken_hosts) if base else base,
+                extra_params=src.extra_params,
+                domains=domains,
+                template=src.template,
+            )
+            for src, domains, clone_hosts, base in plan
+        ]
+        Showcase.objects.bulk_create(clones)
+        ShowcaseDomain.objects.bulk_create([
+            ShowcaseDomain(showcase=clone, host=h)
+            for clone, (_src, _domains, clone_hosts, _base) in zip(clones, plan)
+            for h in sorted(clone_hosts)
+        ])
+
+        cards_by_source = defaultdict(list)
+        for c in Card.objects.filter(showcase__in=[src.pk for src in sources]).order_by("order_index", "id"):
+            cards_by_source[c.showcase_id].append(c)
+        fields = [f.attname for f in Card._meta.concrete_fields if not f.primary_key]
+        new_cards = []
+        for clone, (src, *_rest) in zip(clones, plan):
+            for c in cards_by_source[src.pk]:
+                card = Card(**{name: getattr(c, name) for name in fields})
+                card.showcase = clone
+                card.clicks = 0
+                card.full_btn_url = c.compute_full_btn_url(clone.extra_params)
+                new_cards.append(card)
+        Card.objects.bulk_create(new_cards, batch_size=500)
+        # новые витрины могли стать главными для домена — сбрасываем кэш публички
+        # и рисуем их в статический экспорт
+        _invalidate(*[clone.pk for clone in clones])
+    return clones
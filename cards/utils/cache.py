@@ -0,0 +1,190 @@
+# cards/utils/cache.py
+"""
+Двухуровневый кэш для публичных выборок (роутинг домен → витрина, витрина + карточки).
+
+1-й уровень — LRU в памяти процесса (у каждого gunicorn-воркера свой) с TTL.
+2-й уровень — общий кэш Django (settings.CACHES: file/locmem локально, Redis/memcached в проде).
+
+Для async-вьюх (профиль uvicorn, см. entrypoint.sh) есть acontent_version()
+и aget_or_build(): тот же LRU, общий кэш — через aget/aset.
+
+Инвалидация — по версии: все ключи содержат текущий номер версии контента,
+который лежит в общем кэше. Сигналы save/delete у Showcase/Card/Logo увеличивают
+версию, и на следующем запросе каждый воркер на каждой ноде видит новые ключи.
+Данным с другим поводом для сброса заводится свой счётчик (current_version/bump
+и get_or_build(..., version=...)) — так версионирован индекс логотипов
+(cards/utils/logoindex.py).
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+
+VERSION_KEY = "cards:content-version"
+LAST_WRITE_KEY = "cards:last-write"
+
+_MISSING = object()
+
+# «холодный» режим профилирования (cards/utils/profiling.py): кэш не читаем, только пишем
+_bypass = ContextVar("cards_cache_bypass", default=False)
+
+
+@contextmanager
+def bypass_reads():
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class LocalLRU:
+    """Простой потокобезопасный LRU с TTL для кэша внутри процесса."""
+
+    def __init__(self, maxsize=512, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=_MISSING):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < now:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+local_cache = LocalLRU(
+    maxsize=_setting("CARDS_CACHE_LOCAL_SIZE", 512),
+    ttl=_setting("CARDS_CACHE_LOCAL_TTL", 30),
+)
+
+
+def shared_cache():
+    return caches[_setting("CARDS_CACHE_ALIAS", "default")]
+
+
+def _fresh_version():
+    # время в мс, а не 1: если ключ версии вытеснили из общего кэша,
+    # новая версия не совпадёт ни с одним старым ключом
+    return int(time.time() * 1000)
+
+
+def current_version(version_key):
+    """Текущее значение счётчика версии version_key в общем кэше (создаётся при первом обращении)."""
+    cache = shared_cache()
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, _fresh_version(), None)
+        version = cache.get(version_key) or _fresh_version()
+    return version
+
+
+def bump(version_key):
+    """Увеличивает счётчик версии version_key: ключи со старой версией больше не читаются."""
+    cache = shared_cache()
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        cache.set(version_key, _fresh_version(), None)
+
+
+def content_version():
+    """Текущая версия контента публички."""
+    return current_version(VERSION_KEY)
+
+
+async def acontent_version():
+    cache = shared_cache()
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, _fresh_version(), None)
+        version = await cache.aget(VERSION_KEY) or _fresh_version()
+    return version
+
+
+def bump_version():
+    """Инвалидирует все закэшированные выборки во всех воркерах."""
+    bump(VERSION_KEY)
+    # время записи — роутер реплик (cards/routers.py) не читает с них сразу после правок
+    shared_cache().set(LAST_WRITE_KEY, time.time(), None)
+
+
+def seconds_since_write():
+    """Сколько секунд назад менялся контент (None — неизвестно, с запуска не менялся)."""
+    written = shared_cache().get(LAST_WRITE_KEY)
+    return None if written is None else time.time() - written
+
+
+def get_or_build(key, builder, version=None):
+    """
+    Достаёт значение по ключу из LRU процесса, затем из общего кэша;
+    если нигде нет — вызывает builder() и раскладывает результат по обоим уровням.
+    None тоже кэшируется (например, «витрины для домена нет»).
+    version — своя версия вместо версии контента (см. current_version/bump).
+    """
+    if version is None:
+        version = content_version()
+    full_key = f"cards:{key}:v{version}"
+    bypass = _bypass.get()
+
+    value = _MISSING if bypass else local_cache.get(full_key)
+    if value is not _MISSING:
+        return value
+
+    cache = shared_cache()
+    value = _MISSING if bypass else cache.get(full_key, _MISSING)
+    if value is _MISSING:
+        value = builder()
+        cache.set(full_key, value, _setting("CARDS_CACHE_SHARED_TTL", 300))
+
+    local_cache.set(full_key, value)
+    return value
+
+
+async def aget_or_build(key, builder):
+    """Async-вариант get_or_build: builder — корутинная функция."""
+    full_key = f"cards:{key}:v{await acontent_version()}"
+    bypass = _bypass.get()
+
+    value = _MISSING if bypass else local_cache.get(full_key)
+    if value is not _MISSING:
+        return value
+
+    cache = shared_cache()
+    value = _MISSING if bypass else await cache.aget(full_key, _MISSING)
+    if value is _MISSING:
+        value = await builder()
+        await cache.aset(full_key, value, _setting("CARDS_CACHE_SHARED_TTL", 300))
+
+    local_cache.set(full_key, value)
+    return value
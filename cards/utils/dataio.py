@@ -0,0 +1,414 @@
+# cards/utils/dataio.py
+"""
+Выгрузка и загрузка витрин с карточками и ссылками на логотипы (CSV/JSON).
+
+Выгрузка (data_export) — потоком: витрины и карточки читаются двумя
+.iterator() по возрастанию id витрины и сливаются на ходу, так что память
+не зависит от числа строк. CSV — одна строка на карточку (витрина без карточек —
+одна строка без полей карточки); JSON — список витрин с вложенными карточками.
+Под ASGI генератор отдаётся через aiter_chunks(): синхронный итератор Django
+собрал бы целиком в память.
+
+Загрузка (data_import, manage.py import_data) — в два шага:
+- plan_import() проверяет строки по правилам ShowcaseForm/CardForm и считает
+  diff с базой, ничего не записывая (это и есть dry-run);
+- apply_import() пишет план пачками bulk_create/bulk_update в одной транзакции.
+Строка с id обновляет существующую запись, без id — создаёт новую. Колонки,
+которых нет в файле, не трогаются. Логотип ищется по logo_id, затем по logo_name;
+сами картинки не загружаются.
+"""
+import csv
+import itertools
+import json
+import re
+from dataclasses import dataclass, field
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from cards.models import Card, Logo, Showcase, ShowcaseDomain
+from . import export
+from .cache import bump_version
+from .host import canonical_host
+from .themes import registry as theme_registry
+
+SHOWCASE_FIELDS = ("name", "slug", "domains", "template", "extra_params")
+CARD_FIELDS = ("title", "price", "rate_line", "age_line", "btn_text", "btn_url",
+               "fine_print", "order_index", "active")
+COLUMNS = ["showcase_id", *(f"showcase_{f}" for f in SHOWCASE_FIELDS),
+           "card_id", *CARD_FIELDS, "logo_id", "logo_name", "logo_image"]
+CHUNK = 2000
+BATCH = 500
+
+TRUE = {"1", "true", "yes", "on", "да", "вкл"}
+FALSE = {"0", "false", "no", "off", "нет", "выкл"}
+
+
+# ---------- выгрузка ----------
+
+def iter_showcases():
+    """(витрина, её карточки) по всем витринам; в памяти — карточки одной витрины."""
+    showcases = Showcase.objects.order_by("pk").iterator(chunk_size=CHUNK)
+    cards = (Card.objects.filter(showcase__isnull=False).select_related("logo")
+             .order_by("showcase_id", "order_index", "pk").iterator(chunk_size=CHUNK))
+    card = next(cards, None)
+    for sc in showcases:
+        group = []
+        while card is not None and card.showcase_id <= sc.pk:
+            if card.showcase_id == sc.pk:
+                group.append(card)
+            card = next(cards, None)
+        yield sc, group
+
+
+def _domains(sc):
+    return [label for _host, label in sc.domains_pairs()]
+
+
+def _showcase_dict(sc):
+    return {"id": sc.pk, "name": sc.name, "slug": sc.slug, "domains": _domains(sc),
+            "template": sc.template, "extra_params": sc.extra_params}
+
+
+def _card_dict(c):
+    out = {"id": c.pk, **{f: getattr(c, f) for f in CARD_FIELDS}}
+    out["logo"] = {"id": c.logo.pk, "name": c.logo.name, "image": c.logo.image.name} if c.logo else None
+    return out
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: writerow() возвращает готовую строку."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv():
+    writer = csv.writer(_Echo())
+    # BOM — чтобы Excel открыл UTF-8 без мастера импорта
+    yield "\ufeff" + writer.writerow(COLUMNS)
+    for sc, cards in iter_showcases():
+        head = [sc.pk, sc.name, sc.slug or "", " ".join(_domains(sc)), sc.template, sc.extra_params]
+        if not cards:
+            yield writer.writerow(head)
+        for c in cards:
+            values = [int(c.active) if f == "active" else getattr(c, f) for f in CARD_FIELDS]
+            logo = [c.logo.pk, c.logo.name, c.logo.image.name] if c.logo else ["", "", ""]
+            yield writer.writerow([*head, c.pk, *values, *logo])
+
+
+def stream_json():
+    yield "["
+    for i, (sc, cards) in enumerate(iter_showcases()):
+        item = {**_showcase_dict(sc), "cards": [_card_dict(c) for c in cards]}
+        yield ("," if i else "") + "\n" + json.dumps(item, ensure_ascii=False)
+    yield "\n]\n"
+
+
+async def aiter_chunks(chunks, batch=100):
+    """
+    Async-итератор поверх синхронного генератора выгрузки для StreamingHttpResponse
+    под ASGI. Куски забираются пачками по batch, всегда в одном потоке
+    (thread_sensitive) — там же соединение с БД, на котором идёт .iterator().
+    """
+    it = iter(chunks)
+    take = sync_to_async(lambda: list(itertools.islice(it, batch)))
+    while part := await take():
+        yield "".join(part)
+
+
+# ---------- загрузка ----------
+
+def read_rows(stream, fmt):
+    """Строки файла как словари колонок COLUMNS; "_line" — где строка в файле."""
+    if fmt == "json":
+        yield from _flatten(json.load(stream))
+        return
+    reader = csv.DictReader(stream)
+    for row in reader:
+        row = {k.strip(): v for k, v in row.items() if k}
+        row["_line"] = f"строка {reader.line_num}"
+        yield row
+
+
+def _flatten(data):
+    if not isinstance(data, list):
+        raise ValueError("JSON: ожидается список витрин")
+    for i, sc in enumerate(data, 1):
+        base = {"showcase_id": sc.get("id")}
+        for f in SHOWCASE_FIELDS:
+            if f in sc:
+                value = sc[f]
+                base[f"showcase_{f}"] = " ".join(value) if isinstance(value, list) else value
+        cards = sc.get("cards") or []
+        if not cards:
+            yield {**base, "_line": f"витрина №{i}"}
+        for j, c in enumerate(cards, 1):
+            row = {**base, "card_id": c.get("id"), "_line": f"витрина №{i}, карточка №{j}"}
+            row.update({f: c[f] for f in CARD_FIELDS if f in c})
+            if "logo" in c:
+                logo = c["logo"] or {}
+                row["logo_id"], row["logo_name"] = logo.get("id"), logo.get("name")
+            yield row
+
+
+def _text(value):
+    return "" if value is None else str(value).strip()
+
+
+def _int(value):
+    value = _text(value)
+    return int(value) if value else None
+
+
+def _bool(value):
+    value = _text(value).lower()
+    if value in TRUE:
+        return True
+    if value in FALSE:
+        return False
+    raise ValueError(f"не понимаю «{value}» как да/нет")
+
+
+@dataclass
+class ImportPlan:
+    new_showcases: list = field(default_factory=list)
+    changed_showcases: list = field(default_factory=list)
+    new_cards: list = field(default_factory=list)       # (карточка, витрина)
+    changed_cards: list = field(default_factory=list)   # (карточка, витрина)
+    domain_rows: list = field(default_factory=list)     # (витрина, домены) — новые и сменившие домены
+    params_changed: list = field(default_factory=list)  # витрины с новыми extra_params
+    diff: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def summary(self):
+        return (f"витрин: новых {len(self.new_showcases)}, изменено {len(self.changed_showcases)}; "
+                f"карточек: новых {len(self.new_cards)}, изменено {len(self.changed_cards)}")
+
+
+def _validation_messages(exc):
+    if hasattr(exc, "message_dict"):
+        return [f"{k}: {' '.join(v)}" for k, v in exc.message_dict.items()]
+    return exc.messages
+
+
+def plan_import(rows):
+    """Проверяет строки и считает изменения; в базу не пишет."""
+    from cards.forms import build_domain_choices, normalize_btn_url, normalize_slug
+
+    plan = ImportPlan()
+    rows = list(rows)
+    allowed = {h for h, _label in build_domain_choices()}
+    themes = set(theme_registry.names())
+
+    groups = {}
+    for row in rows:
+        try:
+            sid = _int(row.get("showcase_id"))
+            cid = _int(row.get("card_id"))
+            lid = _int(row.get("logo_id"))
+        except ValueError:
+            plan.errors.append(f"{row['_line']}: id должен быть числом")
+            continue
+        row["showcase_id"], row["card_id"], row["logo_id"] = sid, cid, lid
+        key = ("id", sid) if sid else ("new", _text(row.get("showcase_slug")) or _text(row.get("showcase_name")),
+                                       _text(row.get("showcase_domains")))
+        groups.setdefault(key, []).append(row)
+
+    # всё нужное из базы — по запросу на модель
+    showcases = Showcase.objects.in_bulk([k[1] for k in groups if k[0] == "id"])
+    cards = Card.objects.in_bulk([r["card_id"] for r in rows if r.get("card_id")])
+    logos = Logo.objects.in_bulk([r["logo_id"] for r in rows if r.get("logo_id")])
+    names = {_text(r.get("logo_name")) for r in rows if not r.get("logo_id") and _text(r.get("logo_name"))}
+    logos_by_name = {}
+    for logo in Logo.objects.filter(name__in=names).order_by("-pk"):
+        logos_by_name[logo.name] = logo
+
+    planned = []  # (витрина, ключ) — для проверки uniq_showcase_per_domain
+    for key, group in groups.items():
+        first = group[0]
+        where = first["_line"]
+        if key[0] == "id":
+            sc = showcases.get(key[1])
+            if sc is None:
+                plan.errors.append(f"{where}: витрина id={key[1]} не найдена")
+                continue
+        else:
+            sc = Showcase()
+        before = {f: getattr(sc, f) for f in SHOWCASE_FIELDS} if sc.pk else None
+
+        errors = []
+        if "showcase_name" in first or not sc.pk:
+            sc.name = _text(first.get("showcase_name"))
+            if not sc.name:
+                errors.append("у витрины нет названия")
+        if "showcase_slug" in first or not sc.pk:
+            sc.slug = normalize_slug(first.get("showcase_slug"), sc.name)
+        if "showcase_template" in first:
+            sc.template = _text(first.get("showcase_template"))
+            # проверяем только то, что меняется: старые данные могли не пройти бы форму
+            changed = before is None or sc.template != before["template"]
+            if changed and sc.template and sc.template not in themes:
+                errors.append(f"нет темы «{sc.template}»")
+        if "showcase_extra_params" in first:
+            sc.extra_params = _text(first.get("showcase_extra_params"))
+        hosts = None
+        if "showcase_domains" in first or not sc.pk:
+            hosts = {canonical_host(h) for h in re.split(r"[\s,]+", _text(first.get("showcase_domains"))) if h}
+            if not sc.pk or hosts != sc.domains_ascii_set():
+                unknown = hosts - allowed if allowed else set()
+                if unknown:
+                    errors.append(f"домены не из DOMAINS_ALLOWED: {', '.join(sorted(unknown))}")
+                sc.domains = "\n".join(sorted(hosts))
+                plan.domain_rows.append((sc, hosts))
+        try:
+            sc.full_clean(exclude=["domains"], validate_unique=False, validate_constraints=False)
+        except ValidationError as e:
+            errors.extend(_validation_messages(e))
+        if errors:
+            plan.errors.extend(f"{where}: {msg}" for msg in errors)
+            continue
+
+        if before is None:
+            plan.new_showcases.append(sc)
+            plan.diff.append(f"+ витрина «{sc.name}» /{sc.slug}/ на {', '.join(sorted(hosts)) or '—'}")
+        else:
+            changes = [f"{f}: {before[f]!r} → {getattr(sc, f)!r}"
+                       for f in SHOWCASE_FIELDS if before[f] != getattr(sc, f)]
+            if changes:
+                plan.changed_showcases.append(sc)
+                plan.diff.append(f"~ витрина {sc.pk}: " + "; ".join(changes))
+                if before["extra_params"] != sc.extra_params:
+                    plan.params_changed.append(sc)
+        planned.append(sc)
+
+        for row in group:
+            _plan_card(plan, row, sc, cards, logos, logos_by_name, normalize_btn_url)
+
+    _check_unique(plan, planned)
+    return plan
+
+
+def _plan_card(plan, row, sc, cards, logos, logos_by_name, normalize_btn_url):
+    cid = row.get("card_id")
+    if not cid and not _text(row.get("title")):
+        return  # строка только с витриной
+    where = row["_line"]
+    if cid:
+        card = cards.get(cid)
+        if card is None:
+            plan.errors.append(f"{where}: карточка id={cid} не найдена")
+            return
+    else:
+        card = Card()
+    before = {f: getattr(card, f) for f in (*CARD_FIELDS, "showcase_id", "logo_id")} if card.pk else None
+
+    errors = []
+    for f in ("title", "rate_line", "age_line", "btn_text", "fine_print"):
+        if f in row:
+            setattr(card, f, _text(row[f]))
+    if "btn_url" in row:
+        card.btn_url = normalize_btn_url(_text(row["btn_url"]))
+    for f in ("price", "order_index"):
+        if f in row:
+            try:
+                value = _int(row[f])
+            except ValueError:
+                errors.append(f"{f}: нужно целое число")
+                continue
+            setattr(card, f, value if value is not None else Card._meta.get_field(f).default)
+    if "active" in row and _text(row["active"]):
+        try:
+            card.active = _bool(row["active"])
+        except ValueError as e:
+            errors.append(f"active: {e}")
+    if row.get("logo_id"):
+        card.logo = logos.get(row["logo_id"])
+        if card.logo is None:
+            errors.append(f"логотип id={row['logo_id']} не найден")
+    elif "logo_name" in row:
+        name = _text(row["logo_name"])
+        card.logo = logos_by_name.get(name) if name else None
+        if name and card.logo is None:
+            errors.append(f"логотип «{name}» не найден")
+    try:
+        card.full_clean(exclude=["showcase", "logo", "full_btn_url"],
+                        validate_unique=False, validate_constraints=False)
+    except ValidationError as e:
+        errors.extend(_validation_messages(e))
+    if errors:
+        plan.errors.extend(f"{where}: {msg}" for msg in errors)
+        return
+
+    if before is None:
+        plan.new_cards.append((card, sc))
+        plan.diff.append(f"+ карточка «{card.title}» в витрине «{sc.name}»")
+        return
+    after = {f: getattr(card, f) for f in (*CARD_FIELDS, "logo_id")}
+    after["showcase_id"] = sc.pk
+    changes = [f"{f}: {before[f]!r} → {after[f]!r}" for f in after if before[f] != after[f]]
+    if changes:
+        plan.changed_cards.append((card, sc))
+        plan.diff.append(f"~ карточка {card.pk}: " + "; ".join(changes))
+
+
+def _check_unique(plan, planned):
+    """uniq_showcase_per_domain (domains, slug) — одной выборкой по затронутым slug'ам."""
+    slugs = {sc.slug for sc in planned if sc.slug is not None}
+    if not slugs:
+        return
+    owners = {}
+    for pk, domains, slug in Showcase.objects.filter(slug__in=slugs).values_list("pk", "domains", "slug"):
+        owners.setdefault((domains, slug), set()).add(pk)
+    for sc in planned:
+        if sc.pk:
+            for pks in owners.values():
+                pks.discard(sc.pk)
+    for sc in planned:
+        if sc.slug is None:
+            continue
+        taken = owners.setdefault((sc.domains, sc.slug), set())
+        if taken:
+            plan.errors.append(f"витрина «{sc.name}»: slug /{sc.slug}/ на этих доменах уже занят")
+        taken.add(sc.pk or id(sc))
+
+
+def apply_import(plan):
+    """Пишет план пачками в одной транзакции; сигналов нет — кэш сбрасываем сами."""
+    if not plan.ok:
+        raise ValueError("в плане импорта есть ошибки")
+    with transaction.atomic():
+        Showcase.objects.bulk_create(plan.new_showcases, batch_size=BATCH)
+        if plan.changed_showcases:
+            Showcase.objects.bulk_update(plan.changed_showcases, SHOWCASE_FIELDS, batch_size=BATCH)
+        if plan.domain_rows:
+            ShowcaseDomain.objects.filter(showcase__in=[sc.pk for sc, _hosts in plan.domain_rows]).delete()
+            ShowcaseDomain.objects.bulk_create(
+                [ShowcaseDomain(showcase=sc, host=h) for sc, hosts in plan.domain_rows for h in sorted(hosts)],
+                batch_size=BATCH,
+            )
+
+        affected = {sc.pk for sc, _hosts in plan.domain_rows}
+        affected.update(sc.pk for sc in plan.changed_showcases)
+        affected.update(card.showcase_id for card, _sc in plan.changed_cards)  # откуда переносим
+        for card, sc in (*plan.new_cards, *plan.changed_cards):
+            card.showcase = sc
+            card.full_btn_url = card.compute_full_btn_url(sc.extra_params)
+        Card.objects.bulk_create([card for card, _sc in plan.new_cards], batch_size=BATCH)
+        if plan.changed_cards:
+            Card.objects.bulk_update([card for card, _sc in plan.changed_cards],
+                                     [*CARD_FIELDS, "showcase", "logo", "full_btn_url"], batch_size=BATCH)
+        # остальные карточки витрин со сменившимися метками
+        for sc in plan.params_changed:
+            sc.recompute_card_urls()
+
+        affected.update(sc.pk for _card, sc in (*plan.new_cards, *plan.changed_cards))
+        transaction.on_commit(bump_version)
+        if export.is_enabled():
+            transaction.on_commit(lambda: export.changed(affected))
+    return plan.summary()
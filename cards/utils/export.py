@@ -0,0 +1,274 @@
+# cards/utils/export.py
+"""
+Статический экспорт витрин: каждая пара (домен, slug) рендерится в
+<STATIC_EXPORT_ROOT>/<host>/<slug>/index.html (+ .gz/.br), и nginx отдаёт
+её через try_files, не доходя до gunicorn.
+
+Экспорт инкрементальный: по каждой витрине хранится отпечаток (поля витрины,
+активные карточки, их логотипы, исходник темы) в <root>/.export-state.json —
+перерисовываются только изменившиеся. При правках в админке сигналы после
+коммита сразу удаляют файлы затронутых витрин (invalidate), чтобы их отдавал
+Django, а не nginx со старым HTML, и через CARDS_EXPORT_DELAY секунд
+перерисовывают эти витрины в фоне (scheduler) — правки, пришедшие за это
+время, попадают в тот же прогон. Прогоны разных процессов сериализует
+flock на <root>/.export.lock.
+
+Страницу из экспорта отдаёт nginx, showcase_detail не вызывается — показ
+считает маяк: <img> перед </body> с подписанным списком карточек
+(вьюха impression).
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils.html import escape
+
+from cards.models import Card, ShowcaseDomain
+from .pagecache import build_page
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = ".export-state.json"
+LOCK_FILE = ".export.lock"
+IMPRESSION_SALT = "cards.impression"
+
+
+def export_root():
+    root = getattr(settings, "STATIC_EXPORT_ROOT", None)
+    return Path(root) if root else None
+
+
+def is_enabled():
+    """Экспорт включён, если каталог уже создан командой export_showcases."""
+    root = export_root()
+    return root is not None and (root / STATE_FILE).exists()
+
+
+def load_state(root):
+    try:
+        return json.loads((root / STATE_FILE).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_state(root, state):
+    tmp = root / (STATE_FILE + ".tmp")
+    tmp.write_text(json.dumps(state, ensure_ascii=False, indent=1), encoding="utf-8")
+    os.replace(tmp, root / STATE_FILE)
+
+
+@contextmanager
+def _locked(root):
+    with open(root / LOCK_FILE, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def impression_token(sc, cards):
+    return signing.dumps([sc.pk, [c.pk for c in cards]], salt=IMPRESSION_SALT, compress=True)
+
+
+def read_impression_token(token):
+    """(showcase_id, [card_id, ...]) из маяка или None для пустого/чужого токена."""
+    if not token:
+        return None
+    try:
+        showcase_id, card_ids = signing.loads(token, salt=IMPRESSION_SALT)
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+    return showcase_id, card_ids
+
+
+def _with_beacon(html, sc, cards):
+    url = f"{reverse('impression')}?t={impression_token(sc, cards)}"
+    tag = f'<img src="{escape(url)}" alt="" width="1" height="1" style="position:absolute;left:-9999px">'
+    pos = html.rfind("</body>")
+    return html + tag if pos < 0 else html[:pos] + tag + html[pos:]
+
+
+def fingerprint(sc, cards, hosts):
+    payload = {
+        "sc": [sc.name, sc.slug, sc.template, sc.extra_params, sorted(hosts)],
+        "tpl": sc.theme.digest,
+        "cards": [
+            [c.pk, c.title, c.price, c.rate_line, c.age_line, c.btn_text, c.full_btn_url,
+             c.fine_print, c.order_index,
+             [c.logo.pk, c.logo.name, c.logo.image.name, c.logo.width, c.logo.height, c.logo.variants]
+             if c.logo else None]
+            for c in cards
+        ],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _routes():
+    """(host, slug) → витрина, как её выберет showcase_detail: самая свежая."""
+    routes = {}
+    rows = (ShowcaseDomain.objects
+            .select_related("showcase")
+            .exclude(showcase__slug__isnull=True).exclude(showcase__slug="")
+            .order_by("showcase__created_at", "showcase__id"))
+    for row in rows:
+        routes[(row.host, row.showcase.slug)] = row.showcase
+    return routes
+
+
+def _page_path(root, host, slug):
+    return root / host / slug / "index.html"
+
+
+def _write_page(path, html):
+    entry = build_page(html)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for suffix, body in (("", entry["identity"]), (".gz", entry["gzip"]), (".br", entry["br"])):
+        if body is None:
+            continue
+        tmp = path.with_name(path.name + suffix + ".tmp")
+        tmp.write_bytes(body)
+        os.replace(tmp, path.with_name(path.name + suffix))
+
+
+def _remove_page(path):
+    for suffix in ("", ".gz", ".br"):
+        try:
+            path.with_name(path.name + suffix).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def export_all(root, force=False, log=None, showcase_ids=None):
+    """
+    Рендерит изменившиеся витрины (showcase_ids — только эти), удаляет файлы
+    исчезнувших. Возвращает (rendered, skipped, removed).
+    """
+    root.mkdir(parents=True, exist_ok=True)
+    with _locked(root):
+        return _export(root, force, log, showcase_ids)
+
+
+def _export(root, force, log, showcase_ids):
+    old_state = load_state(root)
+    only = None if showcase_ids is None else {str(pk) for pk in showcase_ids}
+    # остальные витрины при частичном прогоне остаются как были
+    state = {} if only is None else {k: v for k, v in old_state.items() if k not in only}
+    factory = RequestFactory()
+
+    by_showcase = {}
+    for (host, slug), sc in _routes().items():
+        if only is None or str(sc.pk) in only:
+            by_showcase.setdefault(sc.pk, (sc, []))[1].append(host)
+
+    cards_by_showcase = {}
+    for c in (Card.objects.filter(active=True, showcase_id__in=by_showcase.keys())
+              .select_related("logo").order_by("order_index", "id")):
+        cards_by_showcase.setdefault(c.showcase_id, []).append(c)
+
+    rendered = skipped = 0
+    for pk, (sc, hosts) in by_showcase.items():
+        cards = cards_by_showcase.get(pk, [])
+        fp = fingerprint(sc, cards, hosts)
+        files = [str(_page_path(root, h, sc.slug).relative_to(root)) for h in sorted(hosts)]
+        prev = None if force else old_state.get(str(pk))
+        if prev and prev["fp"] == fp and prev["files"] == files \
+                and all((root / f).exists() for f in files):
+            state[str(pk)] = prev
+            skipped += 1
+            continue
+
+        for host in sorted(hosts):
+            request = factory.get(f"/{sc.slug}/", HTTP_HOST=host)
+            html = sc.theme.template.render({"showcase": sc, "cards": cards}, request)
+            html = _with_beacon(html, sc, cards)
+            _write_page(_page_path(root, host, sc.slug), html)
+        state[str(pk)] = {"fp": fp, "files": files}
+        rendered += 1
+        if log:
+            log(f"{sc.slug}: {', '.join(sorted(hosts))}")
+
+    # файлы витрин, которых больше нет (или сменился домен/slug)
+    keep = {f for entry in state.values() for f in entry["files"]}
+    removed = 0
+    for key, entry in old_state.items():
+        if only is not None and key not in only:
+            continue
+        for f in entry["files"]:
+            if f not in keep:
+                _remove_page(root / f)
+                removed += 1
+
+    save_state(root, state)
+    return rendered, skipped, removed
+
+
+def invalidate(showcase_ids=None):
+    """
+    Удаляет экспортированные файлы указанных витрин (None — всех),
+    чтобы запросы ушли в Django до следующего прогона export_showcases.
+    """
+    if not is_enabled():
+        return
+    root = export_root()
+    state = load_state(root)
+    keys = state.keys() if showcase_ids is None else [str(pk) for pk in showcase_ids]
+    for key in keys:
+        for f in state.get(key, {}).get("files", []):
+            _remove_page(root / f)
+
+
+class ExportScheduler:
+    """
+    Перерисовка витрин после правок: id копятся, первый вызов schedule()
+    заводит таймер на delay секунд, по нему всё накопленное уходит
+    в export_all(showcase_ids=...) в фоновом потоке. delay <= 0 — выключено.
+    """
+
+    def __init__(self, delay=2.0):
+        self.delay = delay
+        self._ids = set()
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def schedule(self, showcase_ids):
+        if self.delay <= 0:
+            return
+        with self._lock:
+            self._ids.update(showcase_ids)
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self.run)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def run(self):
+        with self._lock:
+            ids, self._ids, self._timer = self._ids, set(), None
+        if not ids or not is_enabled():
+            return
+        try:
+            export_all(export_root(), showcase_ids=ids)
+        except Exception:
+            logger.exception("Не удалось перерисовать экспорт витрин %s", sorted(ids))
+        finally:
+            if threading.current_thread() is not threading.main_thread():
+                connections.close_all()
+
+
+scheduler = ExportScheduler(getattr(settings, "CARDS_EXPORT_DELAY", 2.0))
+
+
+def changed(showcase_ids):
+    """После коммита правки: убрать устаревшие файлы сейчас, перерисовать — чуть позже."""
+    invalidate(showcase_ids)
+    scheduler.schedule(showcase_ids)
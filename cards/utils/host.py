@@ -1,16 +1,112 @@
 # cards/utils/host.py
+"""
+Нормализация доменов: punycode (ascii, lower) для сравнения и ссылок,
+unicode — для подписей. Единственное место, где зовётся idna.
+
+idna.encode(..., uts46=True) дорогой, поэтому результат для каждой строки
+запоминается в ограниченном LRU (CARDS_HOST_CACHE_SIZE) со счётчиками
+попаданий/промахов; домены из DOMAINS_ALLOWED считаются заранее (warm() из
+CardsConfig.ready). Повторный хост — поиск в словаре.
+"""
+import re
+import threading
+from collections import OrderedDict
+
 import idna
+from django.conf import settings
+
+from .timing import timed
+
+SPLIT_RE = re.compile(r"[\s,]+")
+
+
+class HostCache:
+    """Потокобезопасный LRU: исходная строка -> (ascii, unicode)."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, host):
+        with self._lock:
+            pair = self._data.get(host)
+            if pair is not None:
+                self.hits += 1
+                self._data.move_to_end(host)
+                return pair
+            self.misses += 1
+        pair = _convert(host)
+        with self._lock:
+            self._data[host] = pair
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return pair
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+
+def _convert(host):
+    try:
+        ascii_host = idna.encode(host, uts46=True).decode("ascii").lower()
+    except Exception:
+        return host.lower(), host
+    try:
+        return ascii_host, idna.decode(ascii_host)
+    except Exception:
+        return ascii_host, host
+
+
+host_cache = HostCache(getattr(settings, "CARDS_HOST_CACHE_SIZE", 1024))
+
+
+def normalize(host):
+    """(punycode lower, unicode-подпись); невалидный хост — (host.lower(), host)."""
+    return host_cache.get(host)
+
+
+def to_ascii(host):
+    return host_cache.get(host)[0]
+
+
+def to_unicode(host):
+    return host_cache.get(host)[1]
+
+
+def split_domains(text):
+    """Домены из текстового поля (через запятую/пробел/переносы)."""
+    return [h for h in SPLIT_RE.split(text or "") if h]
+
+
+def ascii_set(text):
+    return {to_ascii(h) for h in split_domains(text)}
+
+
+def warm(hosts=None):
+    """Заранее считает хосты (по умолчанию — settings.DOMAINS_ALLOWED)."""
+    if hosts is None:
+        hosts = getattr(settings, "DOMAINS_ALLOWED", []) or []
+    for h in hosts:
+        h = (h or "").strip().lower()
+        if h:
+            normalize(h)
+
 
 def canonical_host(request_or_host: str):
     """
     Принимает request или строку-хост. Возвращает ascii (punycode), lower.
     """
-    if hasattr(request_or_host, "get_host"):
-        host = request_or_host.get_host().split(":")[0]
-    else:
-        host = str(request_or_host).split(":")[0]
-
-    try:
-        return idna.encode(host, uts46=True).decode("ascii").lower()
-    except Exception:
-        return host.lower()
+    with timed("host"):
+        if hasattr(request_or_host, "get_host"):
+            host = request_or_host.get_host().split(":")[0]
+        else:
+            host = str(request_or_host).split(":")[0]
+        return to_ascii(host)
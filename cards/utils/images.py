@@ -0,0 +1,119 @@
+# cards/utils/images.py
+"""
+Уменьшенные варианты картинок (WebP/AVIF нескольких ширин):
+- логотипы — генерируются один раз при загрузке, чтобы сетки карточек
+  и список логотипов в админке не тянули многомегабайтные оригиналы;
+- картинки тем из static/ — командой build_static_images (см. responsive_manifest()).
+"""
+import hashlib
+import io
+import json
+import posixpath
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.contrib.staticfiles import finders
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from .media import save_once
+
+# каталог (внутри static/) для вариантов картинок тем и их манифеста
+RESPONSIVE_DIR = "_responsive"
+RESPONSIVE_MANIFEST = f"{RESPONSIVE_DIR}/manifest.json"
+
+# формат → (расширение, параметры сохранения Pillow)
+VARIANT_FORMATS = {
+    "avif": ("avif", {"quality": 60}),
+    "webp": ("webp", {"quality": 82, "method": 6}),
+}
+
+
+def variant_formats():
+    """Форматы, которые умеет текущая сборка Pillow (AVIF есть не везде)."""
+    wanted = getattr(settings, "LOGO_VARIANT_FORMATS", ("avif", "webp"))
+    return [fmt for fmt in wanted if fmt in VARIANT_FORMATS and features.check(fmt)]
+
+
+def target_widths(original_width):
+    """Ширины вариантов не больше оригинала; для мелких картинок — одна, родная."""
+    widths = sorted(getattr(settings, "LOGO_VARIANT_WIDTHS", (80, 160, 320)))
+    out = [w for w in widths if w < original_width]
+    if not out or out[-1] < original_width <= widths[-1]:
+        out.append(original_width)
+    return out
+
+
+def open_image(fp):
+    """Открывает картинку с учётом EXIF-поворота и приводит к RGB/RGBA."""
+    img = Image.open(fp)
+    img = ImageOps.exif_transpose(img)
+    img.load()
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+    return img
+
+
+def resize_to_width(img, w):
+    width, height = img.size
+    if w == width:
+        return img
+    return img.resize((w, max(1, round(height * w / width))), Image.LANCZOS)
+
+
+def encode(img, fmt, **params):
+    """Кодирует картинку в байты указанного формата (avif/webp/jpeg/png)."""
+    if fmt in VARIANT_FORMATS:
+        params = {**VARIANT_FORMATS[fmt][1], **params}
+    if fmt == "jpeg" and img.mode == "RGBA":
+        img = img.convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format=fmt.upper(), **params)
+    return buf.getvalue()
+
+
+def make_variants(field_file, prefix="logos/variants"):
+    """
+    Читает картинку из ImageField и сохраняет её варианты в default_storage.
+    Возвращает (width, height, variants), где variants — список
+    {"w": ширина, "fmt": формат, "name": путь в storage}.
+    В имени варианта — хэш его байтов: под одним именем всегда одно содержимое
+    (immutable-кэш в nginx), одинаковый вариант пишется один раз.
+    """
+    field_file.open("rb")
+    try:
+        img = open_image(field_file)
+    finally:
+        field_file.close()
+
+    width, height = img.size
+    stem = posixpath.splitext(posixpath.basename(field_file.name))[0]
+    variants = []
+    for w in target_widths(width):
+        resized = resize_to_width(img, w)
+        for fmt in variant_formats():
+            ext = VARIANT_FORMATS[fmt][0]
+            data = encode(resized, fmt)
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            name = save_once(f"{prefix}/{stem}-{w}-{digest}.{ext}", ContentFile(data))
+            variants.append({"w": w, "fmt": fmt, "name": name})
+    return width, height, variants
+
+
+_manifest_cache = {"mtime": None, "data": {}}
+
+
+def responsive_manifest():
+    """
+    Манифест вариантов картинок тем: {"img/hero-card.jpg": {"width", "height",
+    "variants": [{"w", "fmt", "path"}]}}. Перечитывается, только если файл поменялся.
+    """
+    path = finders.find(RESPONSIVE_MANIFEST)
+    if not path:
+        return {}
+    mtime = Path(path).stat().st_mtime
+    if _manifest_cache["mtime"] != mtime:
+        _manifest_cache["data"] = json.loads(Path(path).read_text(encoding="utf-8"))
+        _manifest_cache["mtime"] = mtime
+    return _manifest_cache["data"]
@@ -0,0 +1,321 @@
+# cards/utils/loadtest.py
+"""
+Нагрузочный прогон публички и админки на синтетических данных
+(manage.py loadtest_seed / manage.py loadtest).
+
+Данные: N витрин × M карточек, витрины разложены по K доменам из
+DOMAINS_ALLOWED (punycode, без localhost/IP), плюс L логотипов. Всё
+синтетическое помечено префиксом SEED_PREFIX в slug/названии, повторный
+засев с --clear удаляет прошлый.
+
+Прогон: каждый сценарий (главная домена, витрина, списки и автокомплиты
+админки) крутится заданное время в нескольких потоках:
+- с --url — по HTTP к запущенному серверу (gunicorn любого профиля) с
+  настоящим заголовком Host и сессией служебного пользователя;
+- без --url — в процессе через django.test.Client: без сети и сервера,
+  удобно сравнивать изменения кода, но всё упирается в GIL.
+SQL-запросы на запрос считаются отдельно, в процессе, на той же БД:
+«холодный» — сразу после сброса версии кэша, «тёплый» — повторный.
+БД — та, что в settings: SQLite по умолчанию, Postgres — DB_ENGINE=postgres.
+"""
+import hashlib
+import http.client
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from importlib import import_module
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image, ImageDraw
+
+from cards.models import Card, Logo, Showcase, ShowcaseDomain
+from .cache import bump_version, local_cache
+from .images import encode
+from .media import hashed_name, save_once
+from .pagination import paginate
+from .themes import registry as theme_registry
+from .urls import build_partner_url
+
+SEED_PREFIX = "lt-"
+ADMIN_PER_PAGE = 10  # per_page списка витрин по умолчанию (views.showcases_admin)
+LOADTEST_USER = "loadtest"
+
+
+# ---------- данные ----------
+
+def seed_hosts(count):
+    """Первые count доменов из DOMAINS_ALLOWED (punycode, без дублей и локалок)."""
+    from cards.forms import build_domain_choices
+
+    return [host for host, _label in build_domain_choices()][:count]
+
+
+def clear_seed():
+    """Удаляет всё, что создал seed(). Возвращает (витрин, логотипов)."""
+    with transaction.atomic():
+        _, deleted = Showcase.objects.filter(slug__startswith=SEED_PREFIX).delete()
+        logos = list(Logo.objects.filter(name__startswith=SEED_PREFIX))
+        for logo in logos:
+            logo.image.delete(save=False)
+        Logo.objects.filter(pk__in=[logo.pk for logo in logos]).delete()
+    return deleted.get(Showcase._meta.label, 0), len(logos)
+
+
+LOGO_SIZE = (320, 120)
+
+
+def _logo_png(rnd, label):
+    img = Image.new("RGB", LOGO_SIZE, tuple(rnd.randrange(40, 220) for _ in range(3)))
+    ImageDraw.Draw(img).text((16, 48), label, fill=(255, 255, 255))
+    return encode(img, "png")
+
+
+def seed(showcases, cards, domains, logos, variants=False, seed_value=0):
+    """
+    Создаёт синтетические витрины/карточки/логотипы пачками (bulk_create),
+    сигналы не срабатывают — версия кэша сбрасывается один раз в конце.
+    """
+    rnd = random.Random(seed_value)
+    hosts = seed_hosts(domains)
+    if not hosts:
+        raise ValueError("В DOMAINS_ALLOWED нет доменов для засева")
+    themes = theme_registry.names() or [""]
+
+    with transaction.atomic():
+        logo_objs = []
+        for i in range(logos):
+            name = f"{SEED_PREFIX}logo-{i}"
+            data = _logo_png(rnd, name)
+            # bulk_create минует Logo.save(): хэш, размеры и имя файла — здесь
+            digest = hashlib.sha256(data).hexdigest()
+            logo = Logo(name=name, sha256=digest, width=LOGO_SIZE[0], height=LOGO_SIZE[1])
+            logo.image.name = save_once(hashed_name(digest, f"{name}.png"), ContentFile(data))
+            logo_objs.append(logo)
+        Logo.objects.bulk_create(logo_objs)
+
+        sc_objs = []
+        for i in range(showcases):
+            sc_hosts = {hosts[i % len(hosts)]}
+            if len(hosts) > 1 and i % 3 == 0:  # часть витрин — сразу на двух доменах
+                sc_hosts.add(hosts[(i + 1) % len(hosts)])
+            sc_objs.append(Showcase(
+                name=f"{SEED_PREFIX}{i} Займы онлайн",
+                slug=f"{SEED_PREFIX}{i}",
+                domains="\n".join(sorted(sc_hosts)),
+                template=rnd.choice(themes),
+                extra_params=f"aff_id={i}&sub=loadtest",
+            ))
+        Showcase.objects.bulk_create(sc_objs)
+
+        ShowcaseDomain.objects.bulk_create(
+            [ShowcaseDomain(showcase=sc, host=h) for sc in sc_objs for h in sc.domains.splitlines()],
+            batch_size=1000,
+        )
+
+        card_objs = []
+        for sc in sc_objs:
+            for j in range(cards):
+                btn_url = f"https://partner{rnd.randrange(50)}.example.com/apply"
+                card_objs.append(Card(
+                    showcase=sc,
+                    title=f"МФО {j}",
+                    price=rnd.randrange(1, 100) * 1000,
+                    btn_url=btn_url,
+                    full_btn_url=build_partner_url(btn_url, sc.extra_params),
+                    logo=rnd.choice(logo_objs) if logo_objs else None,
+                    order_index=j,
+                    active=rnd.random() > 0.1,
+                ))
+        Card.objects.bulk_create(card_objs, batch_size=1000)
+
+    if variants:
+        for logo in logo_objs:
+            logo.build_variants()
+    bump_version()
+    return {"showcases": len(sc_objs), "cards": len(card_objs), "logos": len(logo_objs), "domains": hosts}
+
+
+# ---------- сценарии ----------
+
+@dataclass
+class Target:
+    path: str
+    host: str = "localhost"
+    auth: bool = False
+
+
+def _public_targets():
+    rows = list(ShowcaseDomain.objects
+                .filter(showcase__slug__startswith=SEED_PREFIX)
+                .values_list("host", "showcase__slug"))
+    if not rows:
+        raise ValueError("Нет синтетических данных — сначала manage.py loadtest_seed")
+    return rows
+
+
+def _admin_list_targets(max_pages=20):
+    """Первые max_pages страниц списка витрин — по курсорам, как их выдаёт сам список."""
+    from cards.views import SHOWCASES_ORDER
+
+    url = reverse("showcases_admin")
+    targets, cursor = [Target(url, auth=True)], None
+    while len(targets) < max_pages:
+        cursor = paginate(Showcase.objects.all(), SHOWCASES_ORDER, ADMIN_PER_PAGE, cursor).next_cursor
+        if cursor is None:
+            break
+        targets.append(Target(f"{url}?{urlencode({'cursor': cursor})}", auth=True))
+    return targets
+
+
+def build_scenarios():
+    """{имя сценария: список Target}; из списка на каждый запрос берётся случайный."""
+    rows = _public_targets()
+    hosts = sorted({host for host, _slug in rows})
+    showcase_ids = list(Showcase.objects.filter(slug__startswith=SEED_PREFIX).values_list("pk", flat=True))
+    queries = ["", "lt", "за", "lt-1", "займы", "нет-такого"]
+
+    return {
+        "index": [Target(reverse("index"), host) for host in hosts],
+        "detail": [Target(reverse("showcase_detail", args=[slug]), host) for host, slug in rows],
+        "admin_list": _admin_list_targets(),
+        "admin_cards": [Target(reverse("cards_admin", args=[pk]), auth=True) for pk in showcase_ids],
+        "admin_logos": [Target(reverse("logos_admin"), auth=True)],
+        "suggest": [Target(f"{reverse('showcases_suggest')}?{urlencode({'q': q})}", auth=True) for q in queries],
+        "logos_search": [Target(f"{reverse('logos_search')}?{urlencode({'q': q})}", auth=True) for q in ("", "lt", "logo-1")],
+    }
+
+
+def loadtest_user():
+    user, _ = get_user_model().objects.get_or_create(
+        username=LOADTEST_USER, defaults={"is_staff": True, "is_active": True},
+    )
+    return user
+
+
+def session_cookie(user):
+    """Сессия служебного пользователя в БД — для HTTP-прогона админки."""
+    store = import_module(settings.SESSION_ENGINE).SessionStore()
+    store[SESSION_KEY] = str(user.pk)
+    store[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+    store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    store.save()
+    return f"{settings.SESSION_COOKIE_NAME}={store.session_key}"
+
+
+# ---------- отправка запросов ----------
+
+def http_sender(base_url, cookie):
+    parts = urlsplit(base_url)
+    conn_cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+
+    def send(target):
+        conn = conn_cls(parts.hostname, parts.port, timeout=30)
+        headers = {"Host": target.host, "Accept-Encoding": "gzip, br", "Connection": "close"}
+        if target.auth:
+            headers["Cookie"] = cookie
+        try:
+            conn.request("GET", target.path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        finally:
+            conn.close()
+
+    return send
+
+
+def client_sender(user):
+    client = Client(HTTP_ACCEPT_ENCODING="gzip, br")
+    client.force_login(user)
+
+    def send(target):
+        return client.get(target.path, HTTP_HOST=target.host).status_code
+
+    return send
+
+
+# ---------- измерение ----------
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+@dataclass
+class Result:
+    name: str
+    duration: float
+    latencies: list = field(default_factory=list)
+    errors: int = 0
+    sql_cold: float = 0.0
+    sql_warm: float = 0.0
+
+    @property
+    def requests(self):
+        return len(self.latencies)
+
+    @property
+    def rps(self):
+        return self.requests / self.duration if self.duration else 0.0
+
+    def ms(self, p):
+        return percentile(self.latencies, p) * 1000
+
+
+def run_load(name, targets, make_sender, duration, concurrency, seed_value=0):
+    """Крутит запросы к случайным targets в concurrency потоках duration секунд."""
+    result = Result(name, duration)
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(n):
+        rnd = random.Random(seed_value + n)
+        send = make_sender()
+        latencies, errors = [], 0
+        while time.perf_counter() < deadline:
+            target = rnd.choice(targets)
+            started = time.perf_counter()
+            try:
+                ok = send(target) < 400
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+        with lock:
+            result.latencies.extend(latencies)
+            result.errors += errors
+
+    threads = [threading.Thread(target=worker, args=(n,), daemon=True) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    result.latencies.sort()
+    return result
+
+
+def count_queries(targets, user, sample=10):
+    """Среднее число SQL на запрос: (холодный кэш, тёплый кэш) в процессе."""
+    send = client_sender(user)
+    cold = warm = 0
+    picked = targets[:sample]
+    for target in picked:
+        bump_version()
+        local_cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            send(target)
+        cold += len(ctx.captured_queries)
+        with CaptureQueriesContext(connection) as ctx:
+            send(target)
+        warm += len(ctx.captured_queries)
+    return cold / len(picked), warm / len(picked)
@@ -0,0 +1,49 @@
+# cards/utils/logoindex.py
+"""
+Индекс всех логотипов для выбора в форме карточки (admin_card_form.html):
+JSON {"version", "logos": [[id, name, url миниатюры], ...]}, отсортированный по имени.
+
+Браузер качает его один раз и фильтрует сам — поиск по нажатиям клавиш
+не ходит на сервер. Индекс версионирован отдельно от контента публички:
+версию поднимают только сигналы Logo (cards/signals.py). URL в форме
+содержит версию (?v=...), такой ответ кэшируется как immutable; без версии —
+ETag и 304.
+"""
+import json
+
+from .cache import bump, current_version, get_or_build
+
+INDEX_VERSION_KEY = "cards:logo-index-version"
+
+
+def index_version():
+    """Текущая версия индекса из общего кэша (создаётся при первом обращении)."""
+    return current_version(INDEX_VERSION_KEY)
+
+
+def bump_index_version():
+    bump(INDEX_VERSION_KEY)
+
+
+def _thumb_url(logo):
+    """Самый маленький WebP-вариант, иначе оригинал."""
+    storage = logo.image.storage
+    webp = [v for v in logo.variants or [] if v["fmt"] == "webp"]
+    if webp:
+        return storage.url(min(webp, key=lambda v: v["w"])["name"])
+    return logo.image.url if logo.image else ""
+
+
+def build_index(version):
+    from cards.models import Logo
+
+    logos = Logo.objects.order_by("name", "id").only("id", "name", "image", "variants")
+    payload = {"version": version, "logos": [[logo.pk, logo.name, _thumb_url(logo)] for logo in logos]}
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def get_index(version=None):
+    """Байты JSON-индекса для версии version (по умолчанию — текущей); строится один раз на версию."""
+    if version is None:
+        version = index_version()
+    return get_or_build("logo-index", lambda: build_index(version), version=version)
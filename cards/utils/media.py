@@ -0,0 +1,91 @@
+# cards/utils/media.py
+"""
+Файлы логотипов по хэшу содержимого и уборка осиротевших файлов в media/.
+
+- Оригинал лежит в logos/<sha256>.<ext>, варианты — в logos/variants/<sha256>-<w>-<хэш варианта>.<ext>
+  (cards/utils/images.py). Имя однозначно определяет содержимое, поэтому
+  одинаковый файл хранится один раз, а nginx отдаёт такие URL с
+  Cache-Control: immutable (deploy/nginx.conf).
+- Повторная загрузка того же файла не создаёт второй Logo (LogoForm).
+- Один файл может принадлежать нескольким Logo, поэтому ни удаление логотипа,
+  ни пересборка вариантов файлы не трогают — осиротевшие файлы собирает
+  manage.py gc_media (referenced_names() + walk()). Повторно использованный
+  файл получает свежий mtime (touch), чтобы gc_media не удалил его, пока
+  строка нового Logo ещё не закоммичена.
+"""
+import hashlib
+import os
+import posixpath
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.db import models
+
+LOGO_DIR = "logos"
+CHUNK = 64 * 1024
+
+
+def file_sha256(f):
+    """sha256 файла (File/UploadedFile/FieldFile) по кускам; позиция возвращается в начало."""
+    digest = hashlib.sha256()
+    f.seek(0)
+    for chunk in f.chunks(CHUNK):
+        digest.update(chunk)
+    f.seek(0)
+    return digest.hexdigest()
+
+
+def hashed_name(digest, filename, directory=LOGO_DIR):
+    ext = posixpath.splitext(filename)[1].lower()
+    return f"{directory}/{digest}{ext}"
+
+
+def logo_upload_to(instance, filename):
+    """upload_to для Logo.image: sha256 считает Logo.save() до записи файла."""
+    return hashed_name(instance.sha256 or file_sha256(instance.image), filename)
+
+
+def touch(name, storage=default_storage):
+    """Обновляет mtime файла: gc_media не трогает файлы моложе --min-age."""
+    try:
+        os.utime(storage.path(name))
+    except (NotImplementedError, FileNotFoundError):
+        pass
+
+
+def save_once(name, content, storage=default_storage):
+    """Кладёт файл под именем name, если его там ещё нет (имя — от хэша содержимого)."""
+    if storage.exists(name):
+        touch(name, storage)
+        return name
+    return storage.save(name, content)
+
+
+def referenced_names():
+    """
+    Все файлы, на которые ссылаются строки БД: значения FileField/ImageField
+    всех моделей и варианты логотипов (Logo.variants).
+    """
+    from cards.models import Logo
+
+    names = set()
+    for model in apps.get_models():
+        fields = [f.attname for f in model._meta.concrete_fields if isinstance(f, models.FileField)]
+        if fields:
+            for row in model._default_manager.values_list(*fields).iterator(chunk_size=2000):
+                names.update(name for name in row if name)
+    for variants in Logo.objects.values_list("variants", flat=True).iterator(chunk_size=2000):
+        names.update(v["name"] for v in variants or [] if v.get("name"))
+    return names
+
+
+def walk(directory, storage=default_storage):
+    """Пути всех файлов под directory — генератором, каталог за каталогом."""
+    try:
+        dirs, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield posixpath.join(directory, name)
+    for sub in dirs:
+        yield from walk(posixpath.join(directory, sub), storage)
@@ -0,0 +1,173 @@
+# cards/utils/metrics.py
+"""
+Гистограммы времени запросов для /metrics (формат Prometheus text 0.0.4).
+
+Каждый воркер копит гистограммы в памяти и раз в CARDS_METRICS_FLUSH_INTERVAL
+секунд пишет снимок в CARDS_METRICS_DIR/<pid>.json. /metrics складывает
+снимки всех воркеров — так скрейпер видит сумму, а не случайный воркер.
+Снимки умерших воркеров остаются, пока не устареют (METRICS_STALE_AFTER):
+счётчики при этом не уменьшаются.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+
+# границы корзин, секунды
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+METRICS_STALE_AFTER = 24 * 3600
+
+HELP = {
+    "cards_request_duration_seconds": ("histogram", "Время обработки запроса Django."),
+    "cards_request_phase_seconds": ("histogram", "Время фаз запроса: host, resolve, db, render."),
+    "cards_db_queries_total": ("counter", "SQL-запросов, выполненных при обработке запросов."),
+    "cards_host_cache_total": ("counter", "Обращения к кэшу нормализации доменов: hit/miss."),
+}
+
+
+class Registry:
+    def __init__(self, interval=10.0):
+        self.interval = interval
+        self._hist = {}      # (метрика, labels) -> [счётчики по корзинам + +Inf, сумма]
+        self._counters = {}  # (метрика, labels) -> число
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def observe(self, metric, labels, value):
+        key = (metric, tuple(sorted(labels.items())))
+        idx = bisect_left(BUCKETS, value)
+        with self._lock:
+            row = self._hist.get(key)
+            if row is None:
+                row = self._hist[key] = [[0] * (len(BUCKETS) + 1), 0.0]
+            row[0][idx] += 1
+            row[1] += value
+        self._ensure_flusher()
+
+    def inc(self, metric, labels, n=1):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def snapshot(self):
+        from .host import host_cache
+
+        with self._lock:
+            snap = {
+                "hist": [[m, [list(kv) for kv in labels], counts[:], total]
+                         for (m, labels), (counts, total) in self._hist.items()],
+                "counters": [[m, [list(kv) for kv in labels], n]
+                             for (m, labels), n in self._counters.items()],
+            }
+        stats = host_cache.stats()
+        snap["counters"] += [["cards_host_cache_total", [["result", result]], stats[key]]
+                             for result, key in (("hit", "hits"), ("miss", "misses"))]
+        return snap
+
+    def write_snapshot(self):
+        directory = metrics_dir()
+        if directory is None:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{os.getpid()}.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.snapshot()), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def _ensure_flusher(self):
+        # как у StatsBuffer: поток стартует лениво, уже после fork'а воркера
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._run, name="metrics-flusher", daemon=True)
+            self._flusher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.write_snapshot()
+            except OSError:
+                pass
+
+
+def metrics_dir():
+    path = getattr(settings, "CARDS_METRICS_DIR", None)
+    return Path(path) if path else None
+
+
+registry = Registry(interval=getattr(settings, "CARDS_METRICS_FLUSH_INTERVAL", 10.0))
+atexit.register(registry.write_snapshot)
+
+
+def collect():
+    """Складывает снимки всех воркеров (свой — свежий, из памяти)."""
+    snapshots = [registry.snapshot()]
+    directory = metrics_dir()
+    if directory is not None and directory.exists():
+        own = f"{os.getpid()}.json"
+        now = time.time()
+        for path in directory.glob("*.json"):
+            if path.name == own:
+                continue
+            try:
+                if now - path.stat().st_mtime > METRICS_STALE_AFTER:
+                    path.unlink()
+                    continue
+                snapshots.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue
+
+    hist, counters = {}, {}
+    for snap in snapshots:
+        for metric, labels, counts, total in snap["hist"]:
+            key = (metric, tuple(tuple(kv) for kv in labels))
+            row = hist.setdefault(key, [[0] * len(counts), 0.0])
+            row[0] = [a + b for a, b in zip(row[0], counts)]
+            row[1] += total
+        for metric, labels, n in snap["counters"]:
+            key = (metric, tuple(tuple(kv) for kv in labels))
+            counters[key] = counters.get(key, 0) + n
+    return hist, counters
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs):
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+
+
+def render_prometheus():
+    hist, counters = collect()
+    lines = []
+    by_metric = {}
+    for (metric, labels), row in sorted(hist.items()):
+        by_metric.setdefault(metric, []).append((labels, row))
+    for (metric, labels), n in sorted(counters.items()):
+        by_metric.setdefault(metric, []).append((labels, n))
+
+    for metric, rows in by_metric.items():
+        kind, help_text = HELP.get(metric, ("untyped", metric))
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for labels, row in rows:
+            if kind != "histogram":
+                lines.append(f"{metric}{{{_labels(labels)}}} {row}")
+                continue
+            counts, total = row
+            cumulative = 0
+            for le, n in zip([*map(str, BUCKETS), "+Inf"], counts):
+                cumulative += n
+                lines.append(f"{metric}_bucket{{{_labels((*labels, ('le', le)))}}} {cumulative}")
+            lines.append(f"{metric}_sum{{{_labels(labels)}}} {total:.6f}")
+            lines.append(f"{metric}_count{{{_labels(labels)}}} {cumulative}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,93 @@
+# cards/utils/pagecache.py
+"""
+Кэш готового HTML публичных страниц витрин.
+
+Ключ — (canonical host, slug, тема, версия контента); query string в ключ
+не входит, поэтому utm_* и прочие метки рекламы не плодят копии.
+Вместе с исходным HTML сразу храним gzip и (если установлен пакет brotli)
+br-варианты — на горячем пути остаётся только выбрать нужный по Accept-Encoding.
+Сброс — общей версией контента (см. cards/utils/cache.py и cards/signals.py).
+"""
+import gzip
+import hashlib
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+from .cache import aget_or_build, get_or_build
+
+try:
+    import brotli
+except ImportError:  # brotli — необязательная зависимость
+    brotli = None
+
+
+def build_page(html: str) -> dict:
+    body = html.encode("utf-8")
+    entry = {
+        "etag": '"%s"' % hashlib.md5(body).hexdigest(),
+        "identity": body,
+        "gzip": gzip.compress(body, compresslevel=9, mtime=0),
+        "br": None,
+    }
+    if brotli is not None:
+        entry["br"] = brotli.compress(body, mode=brotli.MODE_TEXT)
+    return entry
+
+
+def _accepted_encodings(request) -> set[str]:
+    out = set()
+    for part in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        out.add(token.strip().lower())
+    return out
+
+
+def page_response(request, entry: dict) -> HttpResponse:
+    if request.META.get("HTTP_IF_NONE_MATCH") == entry["etag"]:
+        response = HttpResponseNotModified()
+        response["ETag"] = entry["etag"]
+        return response
+
+    accepted = _accepted_encodings(request)
+    if entry["br"] is not None and "br" in accepted:
+        response = HttpResponse(entry["br"])
+        response["Content-Encoding"] = "br"
+    elif "gzip" in accepted:
+        response = HttpResponse(entry["gzip"])
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(entry["identity"])
+
+    response["Content-Length"] = str(len(response.content))
+    response["ETag"] = entry["etag"]
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
+
+
+def cached_page(request, host, slug, theme, context):
+    """
+    Отдаёт страницу из кэша, при промахе рендерит уже скомпилированный шаблон
+    темы (cards/utils/themes.py) и сохраняет все варианты.
+    """
+    entry = get_or_build(
+        f"page:{host}:{slug}:{theme.template_name}",
+        lambda: build_page(theme.template.render(context, request)),
+    )
+    return page_response(request, entry)
+
+
+async def acached_page(request, host, slug, theme, context):
+    """
+    Async-вариант cached_page. Шаблон рендерится прямо в event loop,
+    поэтому в context должно быть всё уже выбрано из БД (карточки с логотипами).
+    """
+    async def build():
+        return build_page(theme.template.render(context, request))
+
+    entry = await aget_or_build(f"page:{host}:{slug}:{theme.template_name}", build)
+    return page_response(request, entry)
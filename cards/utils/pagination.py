@@ -0,0 +1,163 @@
+# cards/utils/pagination.py
+"""
+Курсорная (keyset) пагинация для списков админки и JSON-автокомплитов.
+
+Paginator делает COUNT(*) и OFFSET на каждой странице — на глубоких страницах
+и при прокрутке Select2 это скан всей таблицы. Здесь страница выбирается
+условием «после ключа последней строки» по тому же ORDER BY, что и список
+(индекс + LIMIT), без COUNT.
+
+Курсор — подписанный токен (django.core.signing) с направлением и значениями
+полей сортировки граничной строки; чужой или испорченный курсор даёт первую
+страницу. Последнее поле сортировки должно быть уникальным (id).
+"""
+import datetime
+
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connections, router
+from django.db.models import Q
+
+
+class CursorPage:
+    """Страница списка: object_list, next_cursor/prev_cursor (None — дальше нет)."""
+
+    def __init__(self, object_list, per_page, next_cursor=None, prev_cursor=None, estimated_total=None):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.estimated_total = estimated_total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _salt(model, ordering):
+    return f"cards.cursor:{model._meta.label_lower}:{','.join(ordering)}"
+
+
+def _dump(value):
+    return value.isoformat() if isinstance(value, (datetime.date, datetime.datetime)) else value
+
+
+def encode_cursor(model, ordering, direction, obj):
+    values = [_dump(getattr(obj, f.lstrip("-"))) for f in ordering]
+    return signing.dumps([direction, values], salt=_salt(model, ordering))
+
+
+def decode_cursor(model, ordering, token):
+    """(направление "n"/"p", значения полей) или (None, None) для пустого/плохого курсора."""
+    if not token:
+        return None, None
+    try:
+        direction, values = signing.loads(token, salt=_salt(model, ordering))
+        if direction not in ("n", "p") or len(values) != len(ordering):
+            raise ValueError(direction)
+        values = [model._meta.get_field(f.lstrip("-")).to_python(v) for f, v in zip(ordering, values)]
+    except (signing.BadSignature, ValidationError, ValueError, TypeError):
+        return None, None
+    return direction, values
+
+
+def _after(ordering, values, backward):
+    """Строки строго после (или до — backward) ключа values в порядке ordering."""
+    cond = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip("-")
+        op = "lt" if field.startswith("-") != backward else "gt"
+        step = Q(**{f"{name}__{op}": values[i]})
+        for prev, value in zip(ordering[:i], values[:i]):
+            step &= Q(**{prev.lstrip("-"): value})
+        cond |= step
+    return cond
+
+
+def _flip(field):
+    return field[1:] if field.startswith("-") else f"-{field}"
+
+
+def estimated_count(model):
+    """
+    Примерное число строк таблицы без COUNT(*): reltuples в Postgres,
+    sqlite_stat1 (после ANALYZE) в SQLite. None — оценки нет.
+    """
+    table = model._meta.db_table
+    connection = connections[router.db_for_read(model)]
+    try:
+        with connection.cursor() as cur:
+            if connection.vendor == "postgresql":
+                cur.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            elif connection.vendor == "sqlite":
+                cur.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            else:
+                return None
+            row = cur.fetchone()
+    except DatabaseError:
+        return None  # в SQLite без ANALYZE таблицы sqlite_stat1 нет
+    if row is None:
+        return None
+    n = int(str(row[0]).split()[0])
+    return n if n >= 0 else None
+
+
+def paginate(qs, ordering, per_page, cursor=None, estimate=False):
+    """
+    Страница qs в порядке ordering (например ("-created_at", "-id")) после/до курсора.
+    Один запрос: LIMIT per_page + 1 — лишняя строка говорит, есть ли страница дальше.
+    estimate=True — ещё и estimated_count() для всей таблицы.
+    """
+    ordering = tuple(ordering)
+    model = qs.model
+    direction, values = decode_cursor(model, ordering, cursor)
+    backward = direction == "p"
+    if values is not None:
+        qs = qs.filter(_after(ordering, values, backward))
+    order = [_flip(f) for f in ordering] if backward else list(ordering)
+    rows = list(qs.order_by(*order)[:per_page + 1])
+    extra = len(rows) > per_page
+    rows = rows[:per_page]
+    if backward:
+        rows.reverse()
+
+    has_next = extra if not backward else True
+    has_prev = values is not None if not backward else extra
+    return CursorPage(
+        rows,
+        per_page,
+        next_cursor=encode_cursor(model, ordering, "n", rows[-1]) if rows and has_next else None,
+        prev_cursor=encode_cursor(model, ordering, "p", rows[0]) if rows and has_prev else None,
+        estimated_total=estimated_count(model) if estimate else None,
+    )
+
+
+# Выдача по релевантности (cards/utils/search.py) не упорядочена по полям —
+# keyset там невозможен, курсор хранит смещение. Глубина ограничена самим поиском.
+
+def encode_offset(key, offset):
+    return signing.dumps(offset, salt=f"cards.offset:{key}")
+
+
+def decode_offset(key, token):
+    if not token:
+        return 0
+    try:
+        offset = signing.loads(token, salt=f"cards.offset:{key}")
+    except signing.BadSignature:
+        return 0
+    return offset if isinstance(offset, int) and offset >= 0 else 0
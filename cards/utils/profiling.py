@@ -0,0 +1,177 @@
+# cards/utils/profiling.py
+"""
+Профилирование отдельного запроса по требованию персонала (cards/middleware.py).
+
+Запрос с заголовком «X-Profile: 1» или параметром «?_profile=1» от staff-пользователя
+выполняется под cProfile, параллельно поток-сэмплер снимает стеки раз в
+CARDS_PROFILE_SAMPLE_INTERVAL секунд. В CARDS_PROFILE_DIR сохраняются:
+- <name>.pstats    — для pstats/snakeviz;
+- <name>.collapsed — «свёрнутые» стеки для flamegraph.pl/speedscope;
+- <name>.json      — метаданные для страницы /admin/profiles/.
+Хранится не больше CARDS_PROFILE_KEEP профилей, старые удаляются.
+Значение «cold» (X-Profile: cold, ?_profile=cold) дополнительно отключает
+чтение из кэша публичных выборок — видно настоящий путь до БД и рендера.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+SUFFIXES = (".pstats", ".collapsed", ".json")
+NAME_RE = re.compile(r"^[\w-]+$")
+
+# cProfile в процессе может быть включён только один
+_active = threading.Lock()
+
+
+def profile_dir():
+    return Path(getattr(settings, "CARDS_PROFILE_DIR", "/tmp/project_dj_profiles"))
+
+
+def requested_mode(request):
+    """None, "on" или "cold" — по заголовку X-Profile или параметру _profile."""
+    value = (request.META.get("HTTP_X_PROFILE") or request.GET.get("_profile") or "").strip().lower()
+    if not value or value in ("0", "off", "false"):
+        return None
+    return "cold" if value == "cold" else "on"
+
+
+class StackSampler(threading.Thread):
+    """Раз в interval секунд снимает стек заданного потока (для collapsed-файла)."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _short_path(filename):
+    for marker in ("site-packages/", str(settings.BASE_DIR) + "/"):
+        idx = filename.find(marker)
+        if idx >= 0:
+            return filename[idx + len(marker):]
+    return os.path.basename(filename)
+
+
+class RequestProfile:
+    """cProfile + сэмплер вокруг обработки одного запроса."""
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident(),
+                                    getattr(settings, "CARDS_PROFILE_SAMPLE_INTERVAL", 0.002))
+        self.started = None
+        self.duration = 0.0
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.sampler.start()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.sampler.stop()
+        self.duration = time.perf_counter() - self.started
+
+    def save(self, request, response, view, user):
+        directory = profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        now = timezone.now()
+        label = re.sub(r"[^\w-]+", "-", view)
+        name = f"{now:%Y%m%d-%H%M%S%f}-{label}-{uuid.uuid4().hex[:6]}"
+
+        self.profiler.dump_stats(str(directory / f"{name}.pstats"))
+        (directory / f"{name}.collapsed").write_text(
+            "".join(f"{stack} {n}\n" for stack, n in self.sampler.stacks.most_common()),
+            encoding="utf-8",
+        )
+        meta = {
+            "name": name,
+            "view": view,
+            "method": request.method,
+            "path": request.get_full_path(),
+            "host": request.get_host(),
+            "user": user.get_username(),
+            "status": response.status_code,
+            "created": now.isoformat(),
+            "duration_ms": round(self.duration * 1000, 2),
+            "samples": sum(self.sampler.stacks.values()),
+        }
+        (directory / f"{name}.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        rotate(directory)
+        return name
+
+
+def rotate(directory=None, keep=None):
+    """Оставляет keep самых свежих профилей (по умолчанию CARDS_PROFILE_KEEP)."""
+    directory = directory or profile_dir()
+    keep = keep if keep is not None else getattr(settings, "CARDS_PROFILE_KEEP", 50)
+    metas = sorted(directory.glob("*.json"), key=lambda p: p.name, reverse=True)
+    for meta in metas[keep:]:
+        for suffix in SUFFIXES:
+            try:
+                meta.with_suffix(suffix).unlink()
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(view=None):
+    """Метаданные профилей, свежие сверху; view — фильтр по имени вьюхи."""
+    directory = profile_dir()
+    if not directory.exists():
+        return []
+    out = []
+    for path in sorted(directory.glob("*.json"), key=lambda p: p.name, reverse=True):
+        try:
+            meta = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        if view is None or meta.get("view") == view:
+            out.append(meta)
+    return out
+
+
+def profile_path(name, suffix):
+    if not NAME_RE.match(name) or suffix not in SUFFIXES:
+        return None
+    path = profile_dir() / f"{name}{suffix}"
+    return path if path.exists() else None
+
+
+def stats_text(name, sort="cumulative", limit=40):
+    """Текстовый отчёт pstats (топ функций) для страницы профиля."""
+    path = profile_path(name, ".pstats")
+    if path is None:
+        return None
+    out = io.StringIO()
+    stats = pstats.Stats(str(path), stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
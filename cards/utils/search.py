@@ -0,0 +1,212 @@
+# cards/utils/search.py
+"""
+Поиск для автокомплитов админки (showcases_suggest, logos_search).
+
+- Postgres: pg_trgm, GIN-индексы по выражению SEARCH_SQL (миграция 0017);
+  подходят строки с вхождением запроса или похожие (word_similarity, оператор <%),
+  сортировка — сначала начинающиеся с запроса, затем по похожести.
+- SQLite: FTS5-таблицы с tokenize='trigram' (<таблица>_fts, rowid = id),
+  их синхронизируют триггеры — в том числе при bulk_create/update(), мимо save().
+  Миграция, пересоздающая таблицу, теряет триггеры — их восстанавливает
+  ensure_sqlite_triggers() на post_migrate.
+  Подходят строки с вхождением запроса, порядок — bm25; если вхождений нет
+  (опечатка), ищем по отдельным триграммам и оставляем похожие не меньше SIMILARITY.
+- Запрос короче 3 символов или база без этих индексов — icontains, как раньше.
+
+Имя и slug витрины ищутся вместе; кириллический запрос дополнительно ищется
+в транслите («займ» находит slug zaimy-…), ё приравнивается к е.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.db.models import Case, IntegerField, Q, When
+
+from cards.models import Logo, Showcase
+
+MIN_TRIGRAM = 3
+SIMILARITY = 0.5
+FUZZY_CANDIDATES = 200
+
+# текст, по которому ищем: таблица -> SQL-выражение (одно и то же в индексе и в запросе)
+SEARCH_SQL = {
+    "cards_showcase": "translate(lower(name || ' ' || coalesce(slug, '')), 'ё', 'е')",
+    "cards_logo": "translate(lower(name), 'ё', 'е')",
+}
+# то же для триггеров SQLite: регистр FTS5 trigram сворачивает сам
+SQLITE_SEARCH_SQL = {
+    "cards_showcase": "replace(replace({row}.name || ' ' || coalesce({row}.slug, ''), 'ё', 'е'), 'Ё', 'Е')",
+    "cards_logo": "replace(replace({row}.name, 'ё', 'е'), 'Ё', 'Е')",
+}
+SQLITE_WATCH = {"cards_showcase": "name, slug", "cards_logo": "name"}
+
+TRANSLIT = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ж": "zh", "з": "z", "и": "i",
+    "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t",
+    "у": "u", "ф": "f", "х": "h", "ц": "c", "ч": "ch", "ш": "sh", "щ": "sch", "ъ": "", "ы": "y",
+    "ь": "", "э": "e", "ю": "yu", "я": "ya",
+}
+CYRILLIC = re.compile("[а-я]")
+
+
+def normalize(q):
+    return " ".join(q.lower().replace("ё", "е").split())
+
+
+def variants(q):
+    """Запрос и его транслит (для кириллицы); «й» — и как i, и как y."""
+    q = normalize(q)
+    out = [q]
+    if CYRILLIC.search(q):
+        for short_i in ("i", "y"):
+            lat = "".join(TRANSLIT.get(ch, short_i if ch == "й" else ch) for ch in q)
+            if lat not in out:
+                out.append(lat)
+    return out
+
+
+def trigrams(text):
+    """Триграммы слов, как у pg_trgm: каждое слово дополняется пробелами."""
+    out = set()
+    for word in re.findall(r"\w+", text.lower()):
+        padded = f"  {word} "
+        out.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return out
+
+
+def similarity(q, text):
+    """Доля триграмм запроса, нашедшихся в тексте (приближение word_similarity)."""
+    grams = trigrams(q)
+    return len(grams & trigrams(text)) / len(grams) if grams else 0.0
+
+
+def _escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+_fts_ready = {}
+
+
+def _backend(connection):
+    vendor = connection.vendor
+    if vendor == "postgresql":
+        return "postgresql"
+    if vendor == "sqlite":
+        key = connection.settings_dict["NAME"]
+        if key not in _fts_ready:
+            with connection.cursor() as cur:
+                cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cards_logo_fts'")
+                _fts_ready[key] = cur.fetchone() is not None
+        return "sqlite" if _fts_ready[key] else None
+    return None
+
+
+def ensure_sqlite_triggers(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    post_migrate: AlterField в SQLite пересоздаёт таблицу, и её триггеры
+    пропадают вместе со старой. Если FTS-таблица есть, а триггеров нет —
+    создаём их заново и переиндексируем таблицу целиком.
+    """
+    conn = connections[using]
+    if conn.vendor != "sqlite":
+        return
+    with conn.cursor() as cur:
+        for table, text in SQLITE_SEARCH_SQL.items():
+            fts = f"{table}_fts"
+            cur.execute("SELECT name FROM sqlite_master WHERE name IN (%s, %s)", [fts, f"{fts}_ai"])
+            found = {row[0] for row in cur.fetchall()}
+            if fts not in found or f"{fts}_ai" in found:
+                continue
+            new = text.format(row="new")
+            cur.execute(f"DROP TRIGGER IF EXISTS {fts}_au")
+            cur.execute(f"DROP TRIGGER IF EXISTS {fts}_ad")
+            cur.execute(f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+                        f"INSERT INTO {fts} (rowid, text) VALUES (new.id, {new}); END")
+            cur.execute(f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {SQLITE_WATCH[table]} ON {table} BEGIN "
+                        f"UPDATE {fts} SET text = {new} WHERE rowid = old.id; END")
+            cur.execute(f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+                        f"DELETE FROM {fts} WHERE rowid = old.id; END")
+            cur.execute(f"DELETE FROM {fts}")
+            cur.execute(f"INSERT INTO {fts} (rowid, text) SELECT id, {text.format(row=table)} FROM {table}")
+
+
+def _pg_ids(connection, table, qs, limit, offset):
+    expr = SEARCH_SQL[table]
+    where = " OR ".join([f"{expr} LIKE %s", f"%s <%% {expr}"] * len(qs))
+    params = [p for q in qs for p in (f"%{_escape_like(q)}%", q)]
+    order = ", ".join(f"word_similarity(%s, {expr})" for _q in qs)
+    sql = (f"SELECT id FROM {table} WHERE {where} "
+           f"ORDER BY ({expr} LIKE %s) DESC, GREATEST({order}, 0) DESC, id DESC "
+           f"LIMIT %s OFFSET %s")
+    params += [f"{_escape_like(qs[0])}%", *qs, limit, offset]
+    with connection.cursor() as cur:
+        cur.execute(sql, params)
+        return [row[0] for row in cur.fetchall()]
+
+
+def _fts_phrase(value):
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _sqlite_ids(connection, table, qs, limit, offset):
+    fts = f"{table}_fts"
+    with connection.cursor() as cur:
+        cur.execute(
+            f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s ORDER BY rank, rowid DESC LIMIT %s OFFSET %s",
+            [" OR ".join(_fts_phrase(q) for q in qs), limit, offset],
+        )
+        ids = [row[0] for row in cur.fetchall()]
+        if ids or offset:
+            return ids
+        # вхождений нет (опечатка) — кандидаты по отдельным триграммам, похожесть считаем в Python
+        grams = {w[i:i + 3] for q in qs for w in re.findall(r"\w+", q) for i in range(len(w) - 2)}
+        if not grams:
+            return []
+        cur.execute(
+            f"SELECT rowid, text FROM {fts} WHERE {fts} MATCH %s ORDER BY rank LIMIT %s",
+            [" OR ".join(_fts_phrase(g) for g in sorted(grams)), FUZZY_CANDIDATES],
+        )
+        scored = [(max(similarity(q, text) for q in qs), rowid) for rowid, text in cur.fetchall()]
+    scored = sorted((s for s in scored if s[0] >= SIMILARITY), key=lambda s: (-s[0], -s[1]))
+    return [rowid for _score, rowid in scored[:limit]]
+
+
+def search_ids(model, q, limit, offset=0):
+    """
+    id подходящих объектов model (Showcase или Logo) в порядке релевантности,
+    либо None — если индексного поиска нет (короткий запрос, другая СУБД).
+    """
+    qs = variants(q)
+    if len(qs[0]) < MIN_TRIGRAM:
+        return None
+    # та же БД, из которой потом читаются объекты (реплика, см. cards/routers.py)
+    connection = connections[router.db_for_read(model)]
+    backend = _backend(connection)
+    table = model._meta.db_table
+    if backend == "postgresql":
+        return _pg_ids(connection, table, qs, limit, offset)
+    if backend == "sqlite":
+        return _sqlite_ids(connection, table, qs, limit, offset)
+    return None
+
+
+def _fallback(model, q):
+    if model is Showcase:
+        return (Showcase.objects
+                .filter(Q(name__icontains=q) | Q(slug__icontains=q))
+                .annotate(priority=Case(
+                    When(name__istartswith=q, then=0),
+                    When(slug__istartswith=q, then=0),
+                    default=1,
+                    output_field=IntegerField(),
+                ))
+                .order_by("priority", "name"))
+    return Logo.objects.filter(name__icontains=q).order_by("name")
+
+
+def search(model, q, limit, offset=0):
+    """Объекты model по запросу q: срез [offset:offset + limit] в порядке релевантности."""
+    ids = search_ids(model, q, limit, offset)
+    if ids is None:
+        return list(_fallback(model, q)[offset:offset + limit])
+    found = model.objects.in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found]
@@ -0,0 +1,217 @@
+# cards/utils/stats.py
+"""
+Буфер показов и переходов по карточкам.
+
+Показы (showcase_detail) и клики (/go/<card_id>/) копятся в памяти процесса,
+агрегированные по (витрина, карточка, домен, час), и пишутся в БД пачкой,
+когда набралось CARDS_CLICK_BUFFER_SIZE событий или прошло
+CARDS_CLICK_FLUSH_INTERVAL секунд. Одна пачка — одна транзакция:
+- Card.clicks — F()-инкременты, один UPDATE на группу с одинаковым числом кликов;
+- StatBucket (часовые корзины) — по одному UPDATE ... + n на ключ,
+  INSERT только для новых корзин.
+События удалённых за это время карточек и витрин отбрасываются до записи
+(иначе INSERT корзины падал бы на внешнем ключе и пачка не писалась бы никогда).
+Если запись всё же не удалась, события возвращаются в буфер — не больше
+CARDS_STATS_MAX_REQUEUE ключей, остальное теряется с записью в лог.
+Сворачивание часовых корзин в дневные — команда compact_stats.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from cards.routers import primary_only
+
+logger = logging.getLogger(__name__)
+
+
+def hour_start(dt=None):
+    dt = dt or timezone.now()
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+class StatsBuffer:
+    def __init__(self, max_pending=100, interval=5.0, max_requeue=10000):
+        self.max_pending = max_pending
+        self.interval = interval
+        self.max_requeue = max_requeue
+        self._counts = defaultdict(lambda: [0, 0])  # key -> [impressions, clicks]
+        self._pending = 0
+        self._started_at = None
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def add(self, showcase_id, card_ids, domain, impressions=0, clicks=0, flush=True):
+        """
+        Учитывает событие. Возвращает True, если пора сбросить буфер;
+        при flush=False сброс остаётся вызывающему (async-вьюхи делают его
+        в потоке, а не в event loop).
+        """
+        bucket = hour_start()
+        with self._lock:
+            for card_id in card_ids:
+                row = self._counts[(showcase_id, card_id, domain, bucket)]
+                row[0] += impressions
+                row[1] += clicks
+            self._pending += 1
+            if self._started_at is None:
+                self._started_at = time.monotonic()
+            due = (self._pending >= self.max_pending
+                   or time.monotonic() - self._started_at >= self.interval)
+        self._ensure_flusher()
+        if due and flush:
+            self.flush()
+        return due
+
+    def _take(self):
+        with self._lock:
+            counts, self._counts = self._counts, defaultdict(lambda: [0, 0])
+            self._pending = 0
+            self._started_at = None
+        return counts
+
+    def flush(self):
+        """Пишет накопленное в БД; при ошибке возвращает события в буфер."""
+        counts = self._take()
+        if not counts:
+            return 0
+        try:
+            # flush зовут и из запроса публички, где чтения разрешены с реплик
+            with primary_only():
+                return write_stats(counts)
+        except Exception:
+            logger.exception("Не удалось записать статистику (%s ключей), вернём в буфер", len(counts))
+            with self._lock:
+                room = max(self.max_requeue - len(self._counts), 0)
+                if len(counts) > room:
+                    logger.error("Буфер статистики переполнен: отброшено %s ключей", len(counts) - room)
+                for key, (imp, clk) in list(counts.items())[:room]:
+                    row = self._counts[key]
+                    row[0] += imp
+                    row[1] += clk
+                self._pending += len(counts)
+                if self._started_at is None:
+                    self._started_at = time.monotonic()
+            return 0
+
+    def _ensure_flusher(self):
+        # фоновый поток стартует лениво — уже в воркере, после fork'а gunicorn
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._run, name="stats-flusher", daemon=True)
+            self._flusher.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            close_old_connections()
+            self.flush()
+
+
+def add_to_bucket(period, bucket, showcase_id, card_id, domain, impressions, clicks):
+    """Атомарно прибавляет счётчики к корзине, создавая её при необходимости."""
+    from cards.models import StatBucket
+
+    lookup = dict(period=period, bucket=bucket, showcase_id=showcase_id,
+                  card_id=card_id, domain=domain)
+    increments = dict(impressions=F("impressions") + impressions, clicks=F("clicks") + clicks)
+    if StatBucket.objects.filter(**lookup).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            StatBucket.objects.create(impressions=impressions, clicks=clicks, **lookup)
+    except IntegrityError:
+        # корзину успел создать другой воркер
+        StatBucket.objects.filter(**lookup).update(**increments)
+
+
+def _drop_deleted(counts):
+    """Оставляет ключи, чьи карточка и витрина ещё есть в БД (по запросу на модель)."""
+    from cards.models import Card, Showcase
+
+    card_ids = set(Card.objects.filter(pk__in={k[1] for k in counts}).values_list("pk", flat=True))
+    showcase_ids = set(Showcase.objects.filter(pk__in={k[0] for k in counts}).values_list("pk", flat=True))
+    alive = {k: v for k, v in counts.items() if k[1] in card_ids and k[0] in showcase_ids}
+    if len(alive) < len(counts):
+        logger.warning("Статистика удалённых карточек/витрин отброшена: %s ключей", len(counts) - len(alive))
+    return alive
+
+
+def write_stats(counts):
+    """
+    counts: {(showcase_id, card_id, domain, hour): [impressions, clicks]}.
+    Возвращает число записанных ключей.
+    """
+    from cards.models import Card, StatBucket
+
+    counts = _drop_deleted(counts)
+    clicks_by_card = defaultdict(int)
+    for (_, card_id, _, _), (_, clk) in counts.items():
+        if clk:
+            clicks_by_card[card_id] += clk
+    by_increment = defaultdict(list)
+    for card_id, n in clicks_by_card.items():
+        by_increment[n].append(card_id)
+
+    with transaction.atomic():
+        for n, ids in by_increment.items():
+            Card.objects.filter(pk__in=ids).update(clicks=F("clicks") + n)
+        for (showcase_id, card_id, domain, bucket), (imp, clk) in counts.items():
+            add_to_bucket(StatBucket.HOUR, bucket, showcase_id, card_id, domain, imp, clk)
+    return len(counts)
+
+
+stats_buffer = StatsBuffer(
+    max_pending=getattr(settings, "CARDS_CLICK_BUFFER_SIZE", 100),
+    interval=getattr(settings, "CARDS_CLICK_FLUSH_INTERVAL", 5.0),
+    max_requeue=getattr(settings, "CARDS_STATS_MAX_REQUEUE", 10000),
+)
+atexit.register(stats_buffer.flush)
+
+
+def record_click(showcase_id, card_id, domain):
+    stats_buffer.add(showcase_id, [card_id], domain, clicks=1)
+
+
+def record_impressions(showcase_id, card_ids, domain):
+    if card_ids:
+        stats_buffer.add(showcase_id, card_ids, domain, impressions=1)
+
+
+async def arecord_impressions(showcase_id, card_ids, domain):
+    if card_ids and stats_buffer.add(showcase_id, card_ids, domain, impressions=1, flush=False):
+        await sync_to_async(stats_buffer.flush)()
+
+
+def card_stats(showcase_id):
+    """
+    {card_id: {"impressions", "clicks", "ctr"}} для карточек витрины — один запрос.
+    Корзины берутся по карточке, а не по StatBucket.showcase: у перенесённой
+    в другую витрину карточки (bulk.transfer, импорт) история идёт вместе с ней,
+    как и счётчик Card.clicks.
+    """
+    from cards.models import StatBucket
+
+    out = {}
+    rows = (StatBucket.objects
+            .filter(card__showcase_id=showcase_id)
+            .values("card_id")
+            .annotate(impressions=Sum("impressions"), clicks=Sum("clicks")))
+    for r in rows:
+        imp, clk = r["impressions"] or 0, r["clicks"] or 0
+        out[r["card_id"]] = {
+            "impressions": imp,
+            "clicks": clk,
+            "ctr": (clk * 100.0 / imp) if imp else None,
+        }
+    return out
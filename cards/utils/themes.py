@@ -0,0 +1,119 @@
+# cards/utils/themes.py
+"""
+Реестр тем витрин (cards/templates/themes/<имя>/index.html).
+
+Собирается один раз в CardsConfig.ready(): каталоги тем обходятся при старте,
+шаблоны компилируются сразу, поэтому ни форма витрины, ни публичная страница
+не ходят по файловой системе и не ищут шаблон загрузчиком на каждый запрос.
+Тема без index.html, с ошибкой в шаблоне или невидимая загрузчику шаблонов
+в реестр не попадает (старт приложения это не останавливает), а
+`manage.py check` показывает её как предупреждение (cards.W001).
+
+Перезагрузка — registry.reload(): при DEBUG её вызывает автоперезагрузчик
+runserver, когда меняется файл темы; в проде новые темы подхватываются
+перезапуском воркеров (gunicorn HUP).
+"""
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.core import checks
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader import get_template
+
+log = logging.getLogger(__name__)
+
+THEMES_DIR = Path(__file__).resolve().parent.parent / "templates" / "themes"
+DEFAULT_TEMPLATE = "index.html"
+DEFAULT_LABEL = "Авто (общий шаблон)"
+LABELS = {"green": "Зелёный", "blue": "Синий"}
+
+
+@dataclass(frozen=True)
+class Theme:
+    name: str            # значение Showcase.template; "" — общий шаблон
+    label: str
+    template_name: str
+    template: object     # скомпилированный шаблон бэкенда (render(context, request))
+    digest: str          # sha256 исходника — для отпечатков статического экспорта
+
+
+def _compile(name, template_name, label):
+    template = get_template(template_name)
+    source = Path(template.origin.name).read_bytes()
+    return Theme(name, label, template_name, template, hashlib.sha256(source).hexdigest())
+
+
+class ThemeRegistry:
+    def __init__(self, root=THEMES_DIR):
+        self.root = Path(root)
+        self._themes = {}
+        self._default = None
+        self.problems = []   # (имя темы, причина) — для manage.py check
+        self._lock = threading.Lock()
+
+    def reload(self):
+        """Заново обходит каталог тем и компилирует шаблоны."""
+        themes, problems = {}, []
+        if self.root.exists():
+            for d in sorted(self.root.iterdir()):
+                if not d.is_dir() or d.name.startswith("_"):
+                    continue
+                if not (d / "index.html").is_file():
+                    problems.append((d.name, "нет index.html"))
+                    continue
+                try:
+                    themes[d.name] = _compile(d.name, f"themes/{d.name}/index.html",
+                                              LABELS.get(d.name, d.name))
+                except TemplateSyntaxError as exc:
+                    # сюда же — {% load %} несуществующей библиотеки тегов
+                    problems.append((d.name, f"ошибка в шаблоне: {exc}"))
+                except TemplateDoesNotExist as exc:
+                    # файл есть в каталоге, но загрузчик шаблонов его не видит
+                    problems.append((d.name, f"шаблон не найден: {exc}"))
+        default = _compile("", DEFAULT_TEMPLATE, DEFAULT_LABEL)
+        for name, reason in problems:
+            log.warning("Тема %s пропущена: %s", name, reason)
+        with self._lock:
+            self._themes, self._default, self.problems = themes, default, problems
+
+    def _ensure(self):
+        if self._default is None:
+            self.reload()
+
+    def get(self, name):
+        """Тема по имени; неизвестная или пустая — общий шаблон index.html."""
+        self._ensure()
+        return self._themes.get(name or "", self._default)
+
+    def names(self):
+        self._ensure()
+        return list(self._themes)
+
+    def choices(self):
+        self._ensure()
+        return [("", self._default.label)] + [(t.name, t.label) for t in self._themes.values()]
+
+
+registry = ThemeRegistry()
+
+
+def reload_on_change(sender, file_path, **kwargs):
+    """
+    Обработчик autoreload.file_changed (runserver): правка шаблона — перечитать реестр.
+    Загрузчики Django к этому моменту уже сброшены (template_changed подключён раньше).
+    """
+    path = Path(file_path)
+    if path.suffix != ".py" and path.is_relative_to(registry.root.parent):
+        registry.reload()
+
+
+def check_themes(app_configs=None, **kwargs):
+    registry._ensure()
+    return [
+        checks.Warning(f"Тема «{name}» не загружена: {reason}",
+                       obj=str(registry.root / name), id="cards.W001")
+        for name, reason in registry.problems
+    ]
@@ -0,0 +1,100 @@
+# cards/utils/timing.py
+"""
+Замеры фаз запроса для Server-Timing и метрик (см. cards/middleware.py).
+
+Текущие замеры лежат в contextvar — он виден и в sync-вьюхах, и в async
+(sync_to_async копирует контекст в поток). Фазы:
+- host    — canonical_host();
+- resolve — поиск витрины по домену/slug (вместе с кэшем);
+- db      — время SQL, через execute_wrapper на каждом подключении;
+- render  — рендер шаблонов, через бэкенд TimedDjangoTemplates.
+Вне запроса (команды, фоновые потоки) всё это ничего не делает.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.template.backends.django import DjangoTemplates
+
+_current = ContextVar("cards_request_timings", default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.phases = {}   # фаза -> секунды
+        self.queries = 0
+        self._active = set()
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+def start_request():
+    """Начинает замер; возвращает (timings, token) — token для finish_request()."""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def timed(phase):
+    """Прибавляет время блока к фазе текущего запроса; вложенные одноимённые не считаются дважды."""
+    timings = _current.get()
+    if timings is None or phase in timings._active:
+        yield
+        return
+    timings._active.add(phase)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings._active.discard(phase)
+        timings.add(phase, time.perf_counter() - started)
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add("db", time.perf_counter() - started)
+        timings.queries += 1
+
+
+def install_db_wrapper(sender, connection, **kwargs):
+    """Обработчик connection_created: вешает замер SQL на новое подключение."""
+    if db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_execute_wrapper)
+
+
+class _TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    @property
+    def origin(self):
+        return self.template.origin
+
+    def render(self, context=None, request=None):
+        with timed("render"):
+            return self.template.render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Обычный бэкенд Django-шаблонов, но render() попадает в фазу render."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
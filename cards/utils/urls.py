@@ -0,0 +1,36 @@
+# cards/utils/urls.py
+from urllib.parse import urlencode, urlparse, urlunparse, parse_qsl
+
+
+def build_partner_url(btn_url: str, extra_params: str = "") -> str:
+    """
+    Возвращает полную ссылку на партнёра:
+    - если схема отсутствует — добавляем https://
+    - приклеиваем параметры из showcase.extra_params
+    """
+    raw = (btn_url or "").strip()
+    if not raw:
+        return ""
+
+    # если пользователь вводит partner.ru/path — добавим схему
+    p = urlparse(raw)
+    if not p.scheme:
+        raw = "https://" + raw.lstrip("/")
+        p = urlparse(raw)
+
+    # если всё ещё нет netloc (например, '/path') — считаем, что ссылка некорректна
+    if not p.netloc:
+        return raw  # можно вернуть "" если хочешь скрывать кнопку
+
+    # текущие query-параметры из ссылки
+    query = dict(parse_qsl(p.query, keep_blank_values=True))
+
+    # приклеим доп. метки из витрины
+    extra = (extra_params or "").strip().lstrip("?&")
+    if extra:
+        extra_qs = dict(parse_qsl(extra, keep_blank_values=True))
+        query.update(extra_qs)
+
+    # соберём назад
+    p = p._replace(query=urlencode(query, doseq=True))
+    return urlunparse(p)
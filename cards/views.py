@@ -1,15 +1,28 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.handlers.asgi import ASGIRequest
 from .models import Card, Showcase, Logo
-from .forms import CardForm, ShowcaseForm, build_domain_choices, LogoForm
-from django.views.decorators.http import require_POST
-from django.http import Http404
+from .forms import CardForm, DataImportForm, ShowcaseForm, ShowcaseCloneForm, build_domain_choices, LogoForm
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import condition, require_POST
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import urlencode
 from cards.utils.host import canonical_host
+from cards.utils.cache import aget_or_build, get_or_build
+from cards.utils.pagecache import acached_page, cached_page
+from cards.utils.timing import timed
+from cards.utils.metrics import render_prometheus
+from cards.utils.pagination import decode_offset, encode_offset, paginate
+from cards.utils import bulk, dataio, export, logoindex, profiling, search
+from cards.utils.stats import arecord_impressions, record_click, record_impressions, card_stats
 from django.shortcuts import get_object_or_404, redirect
 from .models import Showcase
 from config import settings
-import idna
+import csv
+import io
+import ipaddress
 from django.http import JsonResponse
 from django.db.models import Q, Case, When, IntegerField
 
@@ -17,33 +30,56 @@ from django.db.models import Q, Case, When, IntegerField
 
 
 
-def _domains_ascii_set(domains_text: str) -> set[str]:
-    """Разбираем TextField с доменами (запятые/переносы), приводим к punycode ascii, lower."""
-    raw = (domains_text or "").replace(",", "\n")
-    out = set()
-    for line in raw.splitlines():
-        h = line.strip()
-        if not h:
-            continue
-        try:
-            out.add(idna.encode(h, uts46=True).decode("ascii").lower())
-        except Exception:
-            out.add(h.lower())
-    return out
+# ---------- публичка ----------
+def _main_slug_qs(host):
+    # одна выборка по индексу ShowcaseDomain.host: сначала "main", затем самая свежая
+    return (Showcase.objects
+            .filter(domain_rows__host=host)
+            .order_by(
+                Case(When(slug__iexact="main", then=0), default=1, output_field=IntegerField()),
+                "-created_at", "-id",
+            )
+            .values_list("slug", flat=True))
 
-def _showcase_matches_host(showcase: Showcase, ascii_host: str) -> bool:
-    return ascii_host.lower() in _domains_ascii_set(showcase.domains)
+
+def _main_slug_for_host(host):
+    return _main_slug_qs(host).first()
+
+
+def _active_cards_qs(sc):
+    return (sc.cards.filter(active=True)
+            .select_related("logo")
+            .order_by("order_index", "id"))
+
+
+def _showcase_with_cards(host, slug):
+    """(витрина, список активных карточек) для пары домен+slug или None."""
+    qs = Showcase.objects.filter(slug=slug).order_by("-created_at", "-id")
+    sc = qs.filter(domain_rows__host=host).first()
+    if sc is None and settings.DEBUG:
+        sc = qs.first()
+    if sc is None:
+        return None
+    return sc, list(_active_cards_qs(sc))
+
+
+async def _ashowcase_with_cards(host, slug):
+    qs = Showcase.objects.filter(slug=slug).order_by("-created_at", "-id")
+    sc = await qs.filter(domain_rows__host=host).afirst()
+    if sc is None and settings.DEBUG:
+        sc = await qs.afirst()
+    if sc is None:
+        return None
+    return sc, [c async for c in _active_cards_qs(sc)]
 
 
-# ---------- публичка ----------
 def index(request):
     host = canonical_host(request)
-    qs = Showcase.objects.order_by("-created_at", "-id")
-    candidates = [s for s in qs if s.matches_host(host)]
-    if not candidates:
+    with timed("resolve"):
+        slug = get_or_build(f"index:{host}", lambda: _main_slug_for_host(host))
+    if slug is None:
         raise Http404("Витрина для этого домена не настроена")
-    sc = next((s for s in candidates if (s.slug or "").lower() == "main"), candidates[0])
-    return redirect("showcase_detail", slug=sc.slug)
+    return redirect("showcase_detail", slug=slug)
 
 
 
@@ -72,21 +108,90 @@ def showcase_add(request):
 
 def showcase_detail(request, slug):
     host = canonical_host(request)
-    qs = Showcase.objects.filter(slug=slug).order_by("-created_at", "-id")
-    sc = next((s for s in qs if s.matches_host(host)), None)
-    if sc is None:
-        if settings.DEBUG and qs.exists():
-            sc = qs.first()
-        else:
-            raise Http404("Витрина не найдена для этого домена")
-    cards = (sc.cards.filter(active=True)
-             .select_related("logo")
-             .order_by("order_index", "id"))
-    template_name = f"themes/{sc.template}/index.html" if sc.template else "index.html"
-    return render(request, template_name, {"showcase": sc, "cards": cards})
+    with timed("resolve"):
+        found = get_or_build(f"detail:{host}:{slug}", lambda: _showcase_with_cards(host, slug))
+    if found is None:
+        raise Http404("Витрина не найдена для этого домена")
+    sc, cards = found
+    record_impressions(sc.pk, [c.pk for c in cards], host)
+    return cached_page(request, host, slug, sc.theme, {"showcase": sc, "cards": cards})
+
+
+# async-версии для ASGI (SERVER_PROFILE=uvicorn, см. entrypoint.sh и cards/urls.py):
+# те же ключи кэша, что и у sync-вьюх, ORM — через async-API, без потока на запрос
+async def index_async(request):
+    host = canonical_host(request)
+    with timed("resolve"):
+        slug = await aget_or_build(f"index:{host}", lambda: _main_slug_qs(host).afirst())
+    if slug is None:
+        raise Http404("Витрина для этого домена не настроена")
+    return redirect("showcase_detail", slug=slug)
+
+
+async def showcase_detail_async(request, slug):
+    host = canonical_host(request)
+    with timed("resolve"):
+        found = await aget_or_build(f"detail:{host}:{slug}", lambda: _ashowcase_with_cards(host, slug))
+    if found is None:
+        raise Http404("Витрина не найдена для этого домена")
+    sc, cards = found
+    await arecord_impressions(sc.pk, [c.pk for c in cards], host)
+    return await acached_page(request, host, slug, sc.theme, {"showcase": sc, "cards": cards})
+
+
+def card_go(request, card_id):
+    """Редирект на партнёра; клик уходит в буфер и пишется в БД пачкой."""
+    found = get_or_build(
+        f"go:{card_id}",
+        lambda: (Card.objects.filter(pk=card_id, active=True)
+                 .values_list("full_btn_url", "showcase_id").first()),
+    )
+    if not found or not found[0]:
+        raise Http404("Карточка не найдена")
+    url, showcase_id = found
+    if showcase_id:
+        record_click(showcase_id, card_id, canonical_host(request))
+    return redirect(url)
+
+
+@never_cache
+def impression(request):
+    """
+    Маяк показа: страницы из статического экспорта отдаёт nginx, поэтому
+    показ считает <img> в их HTML (cards/utils/export.py) — без запросов к БД.
+    """
+    found = export.read_impression_token(request.GET.get("t"))
+    if found:
+        showcase_id, card_ids = found
+        record_impressions(showcase_id, card_ids, canonical_host(request))
+    return HttpResponse(status=204)
+
+
+def _metrics_allowed(request):
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    try:
+        addr = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(addr in ipaddress.ip_network(net, strict=False) for net in settings.CARDS_METRICS_ALLOWED_IPS)
+
+
+def metrics(request):
+    """Гистограммы времени запросов в формате Prometheus (см. cards/utils/metrics.py)."""
+    if not _metrics_allowed(request):
+        raise Http404()
+    return HttpResponse(render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 # ---------- админка ----------
+# порядок списков — он же ключ курсора (cards/utils/pagination.py)
+SHOWCASES_ORDER = ("-created_at", "-id")
+CARDS_ORDER = ("order_index", "id")
+LOGOS_ORDER = ("-id",)
+LOGOS_SEARCH_ORDER = ("name", "id")
+
+
 @login_required
 def showcases_admin(request):
     q = (request.GET.get("q") or "").strip()
@@ -100,8 +205,7 @@ def showcases_admin(request):
     if q:
         qs = qs.filter(Q(name__icontains=q) | Q(slug__icontains=q))
 
-    qs = qs.order_by("-created_at", "-id")
-    page_obj = Paginator(qs, per_page).get_page(request.GET.get("page"))
+    page_obj = paginate(qs, SHOWCASES_ORDER, per_page, request.GET.get("cursor"), estimate=not q)
 
     return render(
         request,
@@ -115,64 +219,69 @@ def showcases_admin(request):
     )
 
 
+def _suggest_list(q):
+    if q:
+        return search.search(Showcase, q, 10)
+    return list(Showcase.objects.order_by("-created_at")[:10])
+
+
+def _suggest_item(s):
+    return {"id": s.id, "name": s.name, "slug": s.slug, "label": f"{s.name} ({s.slug})"}
+
+
 @login_required
 def showcases_suggest(request):
     q = (request.GET.get("q") or "").strip()
-    qs = Showcase.objects.all()
+    data = [_suggest_item(s) for s in _suggest_list(q)]
+    return JsonResponse({"results": data})
 
-    if q:
-        qs = (qs
-              .filter(Q(name__icontains=q) | Q(slug__icontains=q))
-              .annotate(priority=Case(
-                  When(name__istartswith=q, then=0),
-                  When(slug__istartswith=q, then=0),
-                  default=1,
-                  output_field=IntegerField(),
-              ))
-              .order_by("priority", "name"))
-    else:
-        qs = qs.order_by("-created_at")
 
-    data = [
-        {"id": s.id, "name": s.name, "slug": s.slug, "label": f"{s.name} ({s.slug})"}
-        for s in qs[:10]
-    ]
+@login_required
+async def showcases_suggest_async(request):
+    q = (request.GET.get("q") or "").strip()
+    data = [_suggest_item(s) for s in await sync_to_async(_suggest_list)(q)]
     return JsonResponse({"results": data})
 
 
 @login_required
 def cards_admin(request, pk):
     showcase = get_object_or_404(Showcase, pk=pk)
-    qs = showcase.cards.order_by("order_index", "id")
-    page_obj = Paginator(qs, 20).get_page(request.GET.get("page"))
+    qs = showcase.cards.select_related("logo")
+    page_obj = paginate(qs, CARDS_ORDER, 20, request.GET.get("cursor"))
+    stats = card_stats(showcase.pk)
+    for c in page_obj.object_list:
+        c.stats = stats.get(c.pk)
     return render(request, "admin_cards.html", {"showcase": showcase, "page_obj": page_obj})
 
 
 
-from django.db import transaction
 
 
 @login_required
 @require_POST  # если делаешь кнопкой-формой; можно убрать, если хочешь GET
 def showcase_duplicate(request, pk):
     src = get_object_or_404(Showcase, pk=pk)
-    # глубокое копирование + карточки
-    new = Showcase.objects.get(pk=src.pk)
-    new.pk = None
-    if new.slug:
-        new.slug = f"{new.slug}-copy"
-    new.save()
-
-    # копируем карточки
-    cards = list(src.cards.all())
-    for c in cards:
-        old_id = c.pk
-        c.pk = None
-        c.showcase = new
-        c.save()
+    # копия на тех же доменах; slug — первый свободный из <slug>-copy, <slug>-copy-2, …
+    bulk.clone_showcases([src], slug_suffix="-copy")
     return redirect("showcases_admin")
 
 
+@login_required
+def showcases_clone(request):
+    """Раскатка отмеченных витрин (с карточками) на выбранные домены одним запросом."""
+    if request.method == "POST":
+        form = ShowcaseCloneForm(request.POST)
+        if form.is_valid():
+            bulk.clone_showcases(form.cleaned_data["showcases"], form.cleaned_data["domains"])
+            return redirect("showcases_admin")
+        ids = request.POST.getlist("showcases")
+    else:
+        ids = request.GET.getlist("ids")
+        form = ShowcaseCloneForm(initial={"showcases": ids})
+    selected = Showcase.objects.filter(pk__in=_int_list(ids)).order_by("name")
+    return render(request, "admin_showcases_clone.html", {"form": form, "selected": selected})
+
+
 
 @login_required
 @require_POST
@@ -180,7 +289,7 @@ def card_toggle(request, pk, cid):
     showcase = get_object_or_404(Showcase, pk=pk)
     card = get_object_or_404(Card, pk=cid, showcase=showcase)
     card.active = not card.active
-    card.save()
+    card.save(update_fields=["active"])
     return redirect("cards_admin", pk=showcase.pk)
 
 
@@ -201,7 +310,7 @@ def card_add(request, pk):
 @login_required
 def card_edit(request, pk, cid):
     showcase = get_object_or_404(Showcase, pk=pk)
-    card = get_object_or_404(Card, pk=cid, showcase=showcase)
+    card = get_object_or_404(Card.objects.select_related("logo"), pk=cid, showcase=showcase)
     if request.method == "POST":
         form = CardForm(request.POST, request.FILES, instance=card, showcase=showcase)
         if form.is_valid():
@@ -221,6 +330,50 @@ def card_delete(request, pk, cid):
     return redirect("cards_admin", pk=showcase.pk)
 
 
+def _int_list(values):
+    out = []
+    for v in values:
+        for part in str(v).split(","):
+            if part.strip().isdigit():
+                out.append(int(part))
+    return out
+
+
+@login_required
+@require_POST
+def cards_bulk(request, pk):
+    """Действие над отмеченными карточками: вкл/выкл, удалить, перенести/скопировать в витрину."""
+    showcase = get_object_or_404(Showcase, pk=pk)
+    action = request.POST.get("action")
+    ids = _int_list(request.POST.getlist("ids"))
+    if action not in bulk.ACTIONS:
+        return HttpResponseBadRequest("Неизвестное действие")
+
+    if action in ("activate", "deactivate"):
+        bulk.set_active(showcase, ids, action == "activate")
+    elif action == "delete":
+        bulk.delete(showcase, ids)
+    else:
+        target_id = _int_list([request.POST.get("target", "")])
+        target = get_object_or_404(Showcase, pk=target_id[0]) if target_id else None
+        if target is None:
+            return HttpResponseBadRequest("Не выбрана витрина")
+        bulk.transfer(showcase, ids, target, copy=action == "copy")
+
+    url = reverse("cards_admin", kwargs={"pk": showcase.pk})
+    cursor = request.POST.get("cursor", "")
+    return redirect(f"{url}?{urlencode({'cursor': cursor})}" if cursor else url)
+
+
+@login_required
+@require_POST
+def cards_reorder(request, pk):
+    """Новый порядок карточек после drag-and-drop: order=id1,id2,… (fetch из admin_cards.html)."""
+    showcase = get_object_or_404(Showcase, pk=pk)
+    changed = bulk.reorder(showcase, _int_list(request.POST.getlist("order")))
+    return JsonResponse({"changed": changed})
+
+
 @login_required
 def showcase_edit(request, pk):
     showcase = get_object_or_404(Showcase, pk=pk)
@@ -244,9 +397,45 @@ def showcase_delete(request, pk):
 
 
 @login_required
-def logos_admin(request):
-    qs = Logo.objects.order_by("-id")
+def data_export(request):
+    """Все витрины с карточками потоком: ?format=csv (по умолчанию) или json."""
+    fmt = "json" if request.GET.get("format") == "json" else "csv"
+    if fmt == "json":
+        content, content_type = dataio.stream_json(), "application/json; charset=utf-8"
+    else:
+        content, content_type = dataio.stream_csv(), "text/csv; charset=utf-8"
+    if isinstance(request, ASGIRequest):
+        # синхронный итератор под ASGI Django собирает целиком (sync_to_async(list))
+        content = dataio.aiter_chunks(content)
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="showcases.{fmt}"'
+    return response
+
+
+@login_required
+def data_import(request):
+    """Загрузка CSV/JSON: сначала diff (dry-run), затем запись пачками."""
+    plan = applied = None
+    if request.method == "POST":
+        form = DataImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data["file"]
+            fmt = "json" if upload.name.lower().endswith(".json") else "csv"
+            try:
+                stream = io.TextIOWrapper(upload, encoding="utf-8-sig", newline="")
+                plan = dataio.plan_import(dataio.read_rows(stream, fmt))
+            except (ValueError, csv.Error, UnicodeDecodeError) as e:
+                form.add_error("file", f"Не удалось прочитать файл: {e}")
+            else:
+                if plan.ok and not form.cleaned_data["dry_run"]:
+                    applied = dataio.apply_import(plan)
+    else:
+        form = DataImportForm()
+    return render(request, "admin_data_import.html", {"form": form, "plan": plan, "applied": applied})
+
 
+@login_required
+def logos_admin(request):
     # безопасно читаем per_page из GET
     try:
         per_page = int(request.GET.get("per_page", 20))
@@ -254,9 +443,7 @@ def logos_admin(request):
         per_page = 20
     per_page = max(8, min(per_page, 200))  # от 8 до 200
 
-    page_number = request.GET.get("page")
-    paginator = Paginator(qs, per_page)
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(Logo.objects.all(), LOGOS_ORDER, per_page, request.GET.get("cursor"), estimate=True)
 
     return render(
         request,
@@ -285,21 +472,86 @@ def logo_delete(request, pk):
     return redirect("logos_admin")
 
 
+def _logos_search_page(q, cursor, per_page=20):
+    """Логотипы для Select2 и курсор следующей порции (None — больше нет)."""
+    if not q:
+        page = paginate(Logo.objects.all(), LOGOS_SEARCH_ORDER, per_page, cursor)
+        return page.object_list, page.next_cursor
+    # по релевантности: курсор — смещение; берём на одну запись больше — она и есть "more"
+    offset = decode_offset(f"logos:{q}", cursor)
+    logos = search.search(Logo, q, per_page + 1, offset)
+    more = len(logos) > per_page
+    return logos[:per_page], encode_offset(f"logos:{q}", offset + per_page) if more else None
+
+
+def _logo_item(logo):
+    return {"id": str(logo.pk), "text": logo.name or f"Логотип #{logo.pk}", "img": (logo.image.url if logo.image else "")}
+
+
 @login_required
 def logos_search(request):
     q = (request.GET.get("q") or "").strip()
-    page = int(request.GET.get("page") or 1)
-    per_page = 20
+    logos, cursor = _logos_search_page(q, request.GET.get("cursor"))
+    results = [_logo_item(logo) for logo in logos]
+    return JsonResponse({"results": results, "pagination": {"more": cursor is not None, "cursor": cursor}})
 
-    qs = Logo.objects.all().order_by("name")
-    if q:
-        qs = qs.filter(name__icontains=q)
 
-    paginator = Paginator(qs, per_page)
-    page_obj = paginator.get_page(page)
+@login_required
+async def logos_search_async(request):
+    q = (request.GET.get("q") or "").strip()
+    logos, cursor = await sync_to_async(_logos_search_page)(q, request.GET.get("cursor"))
+    results = [_logo_item(logo) for logo in logos]
+    return JsonResponse({"results": results, "pagination": {"more": cursor is not None, "cursor": cursor}})
+
+
+
+def _logos_index_etag(request):
+    return f"logos-{logoindex.index_version()}"
+
 
-    results = [
-        {"id": str(logo.pk), "text": logo.name or f"Логотип #{logo.pk}", "img": (logo.image.url if logo.image else "")}
-        for logo in page_obj.object_list
-    ]
-    return JsonResponse({"results": results, "pagination": {"more": page_obj.has_next()}})
+@login_required
+@condition(etag_func=_logos_index_etag)
+def logos_index(request):
+    """Все логотипы одним JSON для выбора в форме карточки; фильтрует браузер."""
+    version = str(logoindex.index_version())
+    response = HttpResponse(logoindex.get_index(version), content_type="application/json")
+    if request.GET.get("v") == version:
+        # URL с версией не меняется, пока не изменится какой-нибудь Logo
+        response["Cache-Control"] = "private, max-age=31536000, immutable"
+    else:
+        response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+# ---------- профили запросов (cards/utils/profiling.py) ----------
+@login_required
+def profiles_admin(request):
+    view = (request.GET.get("view") or "").strip() or None
+    all_profiles = profiling.list_profiles()
+    views = {}
+    for meta in all_profiles:
+        views[meta["view"]] = views.get(meta["view"], 0) + 1
+    profiles = [m for m in all_profiles if view is None or m["view"] == view]
+    return render(request, "admin_profiles.html", {
+        "profiles": profiles,
+        "views": sorted(views.items()),
+        "current_view": view,
+    })
+
+
+@login_required
+def profile_detail(request, name):
+    sort = request.GET.get("sort") if request.GET.get("sort") in ("cumulative", "tottime", "ncalls") else "cumulative"
+    report = profiling.stats_text(name, sort=sort)
+    if report is None:
+        raise Http404("Профиль не найден")
+    meta = next((m for m in profiling.list_profiles() if m["name"] == name), {"name": name})
+    return render(request, "admin_profile_detail.html", {"meta": meta, "report": report, "sort": sort})
+
+
+@login_required
+def profile_download(request, name, kind):
+    path = profiling.profile_path(name, f".{kind}")
+    if path is None:
+        raise Http404("Профиль не найден")
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=path.name)
@@ -44,11 +44,14 @@ DOMAINS_ALLOWED = [
 ]
 
 MIDDLEWARE = [
+    "cards.middleware.TimingMiddleware",  # Server-Timing персоналу + /metrics; первым — меряет всё остальное
+    "cards.middleware.ReplicaMiddleware",  # чтение с реплик БД для публички (cards/routers.py)
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "cards.middleware.ProfilerMiddleware",  # X-Profile / ?_profile= от staff, после аутентификации
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -57,7 +60,7 @@ ROOT_URLCONF = "config.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "cards.utils.timing.TimedDjangoTemplates",  # DjangoTemplates + замер рендера
         "DIRS": [],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -72,20 +75,53 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "config.wsgi.application"
+ASGI_APPLICATION = "config.asgi.application"
+
+# профиль сервера из entrypoint.sh: sync | gthread | uvicorn.
+# Под uvicorn (ASGI) публичные страницы и JSON-автокомплиты — async-вьюхи.
+SERVER_PROFILE = os.getenv("SERVER_PROFILE", "sync")
+CARDS_ASYNC_VIEWS = os.getenv("CARDS_ASYNC_VIEWS", "1" if SERVER_PROFILE == "uvicorn" else "0") == "1"
 
 DB_ENGINE = os.getenv("DB_ENGINE", "sqlite")
 
+# Реплики только для чтения (cards/routers.py): через запятую,
+# для Postgres — host[:port], для SQLite — пути к файлам-копиям.
+DB_REPLICAS = [x.strip() for x in os.getenv("DB_REPLICAS", "").split(",") if x.strip()]
+
 if DB_ENGINE == "postgres":
-    DATABASES = {
-        "default": {
+    def _pg_database(host, port):
+        db = {
             "ENGINE": "django.db.backends.postgresql",
             "NAME": os.getenv("DB_NAME"),
             "USER": os.getenv("DB_USER"),
             "PASSWORD": os.getenv("DB_PASS"),
-            "HOST": os.getenv("DB_HOST","db"),
-            "PORT": os.getenv("DB_PORT","5432"),
+            "HOST": host,
+            "PORT": port,
         }
-    }
+        if os.getenv("DB_POOL", "1") == "1":
+            # пул psycopg3 в каждом воркере (нужен psycopg[pool]); CONN_MAX_AGE с ним — 0
+            pool = {
+                "min_size": int(os.getenv("DB_POOL_MIN", "1")),
+                "max_size": int(os.getenv("DB_POOL_MAX", "10")),
+                "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+            }
+            try:
+                from psycopg_pool import ConnectionPool
+                # проверка соединения перед выдачей из пула (psycopg_pool >= 3.2)
+                pool["check"] = ConnectionPool.check_connection
+            except (ImportError, AttributeError):
+                pass
+            db["OPTIONS"] = {"pool": pool}
+        else:
+            db["CONN_MAX_AGE"] = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+            db["CONN_HEALTH_CHECKS"] = True
+        return db
+
+    DATABASES = {"default": _pg_database(os.getenv("DB_HOST", "db"), os.getenv("DB_PORT", "5432"))}
+    for i, replica in enumerate(DB_REPLICAS, 1):
+        host, _, port = replica.partition(":")
+        DATABASES[f"replica{i}"] = {**_pg_database(host, port or "5432"), "TEST": {"MIRROR": "default"}}
 
 else:  # SQLite по умолчанию
     DATABASES = {
@@ -94,6 +130,85 @@ else:  # SQLite по умолчанию
             "NAME": BASE_DIR / "db.sqlite3",
         }
     }
+    for i, replica in enumerate(DB_REPLICAS, 1):
+        DATABASES[f"replica{i}"] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": replica,
+            "TEST": {"MIRROR": "default"},
+        }
+
+DATABASE_ROUTERS = ["cards.routers.ReplicaRouter"]
+CARDS_DB_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+# какие вьюхи читают с реплик: публичка и поиск (JSON-автокомплиты админки)
+CARDS_DB_REPLICA_VIEWS = ["index", "showcase_detail", "logos_search", "showcases_suggest", "logos_index"]
+# сколько секунд после правки контента все читают с primary (отставание реплик)
+CARDS_DB_REPLICA_LAG = float(os.getenv("CARDS_DB_REPLICA_LAG", "5"))
+# сколько секунд после своего POST клиент читает с primary (read-your-writes)
+CARDS_DB_STICKY_SECONDS = int(os.getenv("CARDS_DB_STICKY_SECONDS", "10"))
+
+# Общий кэш (2-й уровень кэша публичных выборок, см. cards/utils/cache.py).
+# Локально — файловый (виден всем воркерам), в проде — Redis или memcached
+# (нужны пакеты redis / pymemcache).
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "file")
+
+if CACHE_BACKEND == "redis":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("CACHE_URL", "redis://redis:6379/1"),
+        }
+    }
+elif CACHE_BACKEND == "memcached":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+            "LOCATION": os.getenv("CACHE_URL", "memcached:11211"),
+        }
+    }
+elif CACHE_BACKEND == "locmem":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.getenv("CACHE_DIR", "/tmp/project_dj_cache"),
+        }
+    }
+
+# 1-й уровень — LRU внутри процесса
+CARDS_CACHE_LOCAL_SIZE = int(os.getenv("CARDS_CACHE_LOCAL_SIZE", "512"))
+CARDS_CACHE_LOCAL_TTL = int(os.getenv("CARDS_CACHE_LOCAL_TTL", "30"))
+CARDS_CACHE_SHARED_TTL = int(os.getenv("CARDS_CACHE_SHARED_TTL", "300"))
+
+# кэш нормализации доменов (punycode/unicode, cards/utils/host.py)
+CARDS_HOST_CACHE_SIZE = int(os.getenv("CARDS_HOST_CACHE_SIZE", "1024"))
+
+# буфер показов и кликов /go/<card_id>/ (см. cards/utils/stats.py)
+CARDS_CLICK_BUFFER_SIZE = int(os.getenv("CARDS_CLICK_BUFFER_SIZE", "100"))
+CARDS_CLICK_FLUSH_INTERVAL = float(os.getenv("CARDS_CLICK_FLUSH_INTERVAL", "5"))
+# сколько ключей (витрина, карточка, домен, час) держать в буфере после неудачной записи
+CARDS_STATS_MAX_REQUEUE = int(os.getenv("CARDS_STATS_MAX_REQUEUE", "10000"))
+
+# метрики времени запросов (cards/middleware.py, /metrics): снимки воркеров и кто может читать
+CARDS_METRICS_DIR = os.getenv("CARDS_METRICS_DIR", "/tmp/project_dj_metrics")
+CARDS_METRICS_FLUSH_INTERVAL = float(os.getenv("CARDS_METRICS_FLUSH_INTERVAL", "10"))
+# Server-Timing в ответах всем, а не только персоналу (отладка, нагрузочные прогоны)
+CARDS_SERVER_TIMING = os.getenv("CARDS_SERVER_TIMING", "0") == "1"
+# По умолчанию только loopback: за nginx в compose REMOTE_ADDR любого клиента —
+# docker-адрес nginx из 172.16/12, так что частные сети сюда добавлять нельзя.
+# Сеть скрейпера задаётся явно, например CARDS_METRICS_ALLOWED_IPS=127.0.0.1,10.20.0.5/32.
+CARDS_METRICS_ALLOWED_IPS = [x.strip() for x in os.getenv(
+    "CARDS_METRICS_ALLOWED_IPS", "127.0.0.1,::1"
+).split(",") if x.strip()]
+
+# профили запросов по требованию (cards/utils/profiling.py, /admin/profiles/)
+CARDS_PROFILE_DIR = os.getenv("CARDS_PROFILE_DIR", "/tmp/project_dj_profiles")
+CARDS_PROFILE_KEEP = int(os.getenv("CARDS_PROFILE_KEEP", "50"))
+CARDS_PROFILE_SAMPLE_INTERVAL = float(os.getenv("CARDS_PROFILE_SAMPLE_INTERVAL", "0.002"))
 
 LANGUAGE_CODE = "ru"
 TIME_ZONE = "Europe/Moscow"
@@ -114,6 +229,21 @@ STATICFILES_DIRS = [BASE_DIR / "static"]        # ОТКУДА забирать
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# статический экспорт витрин для nginx (manage.py export_showcases)
+STATIC_EXPORT_ROOT = Path(os.getenv("STATIC_EXPORT_ROOT", BASE_DIR / "export"))
+# через сколько секунд после правки в админке перерисовать затронутые витрины (0 — только удалить файлы)
+CARDS_EXPORT_DELAY = float(os.getenv("CARDS_EXPORT_DELAY", "2"))
+
+# collectstatic: хэш в именах файлов + манифест + .gz/.br рядом (см. cards/storage.py)
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "cards.storage.CompressedManifestStaticFilesStorage"},
+}
+
+# варианты логотипов, генерируются при загрузке (cards/utils/images.py)
+LOGO_VARIANT_WIDTHS = (80, 160, 320)
+LOGO_VARIANT_FORMATS = ("avif", "webp")
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 LOGGING = {
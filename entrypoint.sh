@@ -15,9 +15,48 @@ PY
 # миграции и статика
 python manage.py migrate --noinput
 python manage.py collectstatic --noinput
+# статический HTML витрин для nginx (инкрементально; правки в админке
+# перерисовывают свои витрины в фоне, см. cards/utils/export.py)
+python manage.py export_showcases
 
-# запуск gunicorn
-exec gunicorn config.wsgi:application \
-  --bind 0.0.0.0:8000 \
-  --workers ${WORKERS:-3} \
-  --timeout ${TIMEOUT:-30}
+# запуск gunicorn, профиль SERVER_PROFILE:
+#   sync    — классические sync-воркеры (WSGI), по умолчанию;
+#   gthread — sync-вьюхи, но THREADS потоков на воркер: медленный запрос к БД
+#             занимает поток, а не весь воркер;
+#   uvicorn — ASGI через uvicorn-worker, публичные страницы и JSON-автокомплиты
+#             становятся async-вьюхами (CARDS_ASYNC_VIEWS, см. config/settings.py).
+#
+# Замер GET /main/ (1 vCPU, SQLite, CACHE_BACKEND=locmem, WORKERS=3, THREADS=8,
+# 32 одновременных клиента, 10 с), запросов/с:
+#   профиль   кэш прогрет   без кэша   без кэша + 20 мс на каждый SQL
+#   sync          501          18                16
+#   gthread       604          17                15
+#   uvicorn       141          20                13
+# Под ASGI каждый middleware на MiddlewareMixin и каждое обращение к кэшу/ORM —
+# переход в поток через sync_to_async, поэтому горячий (кэшированный) путь
+# медленнее; без кэша всё упирается в рендер шаблона и сжатие. По умолчанию
+# остаётся sync, uvicorn имеет смысл вместе с async-middleware и нативным
+# async-кэшем.
+case "${SERVER_PROFILE:-sync}" in
+  gthread)
+    exec gunicorn config.wsgi:application \
+      --bind 0.0.0.0:8000 \
+      --workers ${WORKERS:-3} \
+      --worker-class gthread \
+      --threads ${THREADS:-8} \
+      --timeout ${TIMEOUT:-30}
+    ;;
+  uvicorn)
+    exec gunicorn config.asgi:application \
+      --bind 0.0.0.0:8000 \
+      --workers ${WORKERS:-3} \
+      --worker-class uvicorn_worker.UvicornWorker \
+      --timeout ${TIMEOUT:-30}
+    ;;
+  *)
+    exec gunicorn config.wsgi:application \
+      --bind 0.0.0.0:8000 \
+      --workers ${WORKERS:-3} \
+      --timeout ${TIMEOUT:-30}
+    ;;
+esac